@@ -0,0 +1,89 @@
+"""
+Benchmark: recall@k, p50/p99 latency and memory footprint of the FAISS index types
+(flat, ivf_flat, hnsw, ivf_pq) on synthetic clustered vectors, using the exact flat index as ground truth.
+
+Run from the 'benchmarks' folder:
+python bench_ann_indexes.py --rows 200000 --dimension 384 --queries 500 --k 10
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+from fakes import latency_summary
+from faiss_index_store import build_faiss_index, tune_faiss_index
+
+# Search time settings swept for every approximate index type
+SWEEPS = {
+     "flat": [{}],
+     "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+     "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128)],
+     "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+}
+
+# Function to generate clustered vectors, closer to real embeddings than uniform noise
+def synthetic_vectors(rows, dimension, clusters=256, seed=0):
+     rng = np.random.default_rng(seed)
+     centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+     vectors = centers[rng.integers(0, clusters, rows)] + 0.3 * rng.standard_normal((rows, dimension)).astype(np.float32)
+     return np.ascontiguousarray(vectors, dtype=np.float32)
+
+# Function to measure recall@k and per-query latency of one index
+def measure(index, queries, truth, k):
+     latencies = []
+     found = []
+     for query in queries:
+          start = time.perf_counter()
+          _, ids = index.search(query[None, :], k)
+          latencies.append(time.perf_counter() - start)
+          found.append(ids[0])
+     recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+     return {"recall_at_k": float(recall), **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--rows", type=int, default=100_000)
+     parser.add_argument("--dimension", type=int, default=384)
+     parser.add_argument("--queries", type=int, default=500)
+     parser.add_argument("--k", type=int, default=10)
+     parser.add_argument("--nlist", type=int, default=1024)
+     parser.add_argument("--types", default="flat,ivf_flat,hnsw,ivf_pq")
+     args = parser.parse_args()
+
+     data = synthetic_vectors(args.rows, args.dimension)
+     queries = synthetic_vectors(args.queries, args.dimension, seed=1)
+
+     # Exact ground truth from the brute force index
+     exact = faiss.IndexFlatL2(args.dimension)
+     exact.add(data)
+     _, truth = exact.search(queries, args.k)
+
+     results = []
+     for index_type in args.types.split(","):
+          start = time.perf_counter()
+          index = build_faiss_index(args.dimension, index_type, n_train=len(data), nlist=args.nlist)
+          if not index.is_trained:
+               sample = data[np.random.default_rng(2).choice(len(data), min(len(data), 50_000), replace=False)]
+               index.train(sample)
+          index.add(data)
+          build_seconds = time.perf_counter() - start
+          memory_bytes = faiss.serialize_index(index).nbytes  # Serialized size is the in-memory footprint of the index data
+
+          for params in SWEEPS[index_type]:
+               tune_faiss_index(index, **params)
+               results.append({
+                    "index_type": index_type,
+                    **params,
+                    "build_seconds": build_seconds,
+                    "memory_mb": memory_bytes / 2**20,
+                    **measure(index, queries, truth, args.k),
+               })
+
+     print(json.dumps({"rows": args.rows, "dimension": args.dimension, "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+     main()
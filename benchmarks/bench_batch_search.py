@@ -0,0 +1,50 @@
+"""
+Benchmark: queries/sec of similarity_search_batch against a loop of single db.similarity_search calls.
+
+Run from the 'benchmarks' folder:
+python bench_batch_search.py --rows 20000 --queries 500 --k 4
+"""
+import json
+import time
+import argparse
+
+from fakes import HashEmbeddings, synthetic_words
+from langchain_community.vectorstores import FAISS
+from batch_search import similarity_search_batch
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--rows", type=int, default=20000)  # Size of the word catalog
+     parser.add_argument("--queries", type=int, default=500)  # Number of lookups
+     parser.add_argument("--k", type=int, default=4)
+     parser.add_argument("--call-latency", type=float, default=0.005)  # Simulated embedding round trip
+     args = parser.parse_args()
+
+     embeddings = HashEmbeddings(call_latency=args.call_latency)
+     db = FAISS.from_texts(synthetic_words(args.rows), embeddings)
+     queries = synthetic_words(args.queries, seed=1)
+
+     # Current path: one embedding call and one FAISS search per query
+     start = time.perf_counter()
+     single = [db.similarity_search_with_score(query, k=args.k) for query in queries]
+     single_seconds = time.perf_counter() - start
+
+     # Batched path: one embedding call and one FAISS search for all queries
+     start = time.perf_counter()
+     batch = similarity_search_batch(db, queries, k=args.k, symmetric=True)
+     batch_seconds = time.perf_counter() - start
+
+     same = all([doc.id for doc, _ in a] == [doc.id for doc, _ in b] for a, b in zip(single, batch))
+     print(json.dumps({
+          "rows": args.rows,
+          "queries": args.queries,
+          "single_qps": args.queries / single_seconds,
+          "batch_qps": args.queries / batch_seconds,
+          "speedup": single_seconds / batch_seconds,
+          "same_results": same,
+     }, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: aggregate questions on a large CSV, loading the whole file (DatasetRegistry + query plan)
+against the chunked mode of csv_analyzer (one pass with explicit dtypes, optionally with worker
+processes). Every mode runs in its own Python process, so that its peak memory (RSS) is measured alone.
+The CSV is a synthetic export shaped like data/employees.csv.
+
+Run from the 'benchmarks' folder (--rows 12000000 gives a file of about 1 GB):
+python bench_chunked_csv.py --rows 2000000 --processes 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import pandas as pd
+
+from fakes import SRC_DIR  # noqa: F401 (makes the modules of the "src" folder importable)
+from bench_dataset_registry import write_employees_csv
+
+QUESTIONS = [
+     "how many employees",
+     "What is the average salary?",
+     "total SALARY by DEPARTMENT_ID",
+     "max SALARY per JOB_ID where DEPARTMENT_ID = 50",
+     "how many employees by JOB_ID where SALARY >= 10000",
+     "minimum HIRE_DATE",
+     "median SALARY by DEPARTMENT_ID",
+]
+
+# Function to turn a result into JSON
+def to_json(result):
+     if isinstance(result, pd.Series):
+          return {str(key): to_json(value) for key, value in result.items()}
+     if isinstance(result, pd.Timestamp):
+          return str(result)
+     return float(result)
+
+# Function to get the peak memory of this process in MB (VmHWM restarts at exec, unlike ru_maxrss on Linux)
+def peak_rss_mb():
+     try:
+          with open("/proc/self/status") as f:
+               for line in f:
+                    if line.startswith("VmHWM:"):
+                         return int(line.split()[1]) / 1024
+     except OSError:
+          pass
+     return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+# Function to answer the questions in one mode (runs in a child process)
+def worker(mode, path, processes, chunksize):
+     start = time.perf_counter()
+     if mode == "load":
+          from dataset_registry import DatasetRegistry
+          from query_plan import answer_query
+          df = DatasetRegistry().load(path)
+          answers = [answer_query(df, question) for question in QUESTIONS]
+     else:
+          from chunked_csv import ChunkedCsv, answer_query_chunked
+          csv = ChunkedCsv(path, chunksize=chunksize)
+          answers = [answer_query_chunked(csv, question, processes=processes if mode == "processes" else None)
+                     for question in QUESTIONS]
+     seconds = time.perf_counter() - start
+     print(json.dumps({"seconds": seconds, "seconds_per_question": seconds / len(QUESTIONS), "peak_rss_mb": peak_rss_mb(),
+                       "worker_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+                       "results": [to_json(answer["result"]) for answer in answers]}))
+
+# Function to check the chunked results against the in-memory ones (medians within the sketch accuracy)
+def check(expected, results, relative_accuracy=0.01):
+     for question, a, b in zip(QUESTIONS, expected, results):
+          a, b = (a, b) if isinstance(a, dict) else ({"": a}, {"": b})
+          assert a.keys() == b.keys(), question
+          for key in a:
+               if question.startswith("median"):
+                    assert abs(a[key] - b[key]) <= relative_accuracy * abs(a[key]), (question, key, a[key], b[key])
+               else:
+                    assert a[key] == b[key], (question, key, a[key], b[key])
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--rows", type=int, default=2_000_000)
+     parser.add_argument("--processes", type=int, default=4)
+     parser.add_argument("--chunksize", type=int, default=200_000)
+     parser.add_argument("--worker", choices=["load", "chunked", "processes"])  # Internal: run one mode
+     parser.add_argument("--path")
+     args = parser.parse_args()
+
+     if args.worker:
+          worker(args.worker, args.path, args.processes, args.chunksize)
+          return
+
+     with tempfile.TemporaryDirectory() as tmp:
+          path = os.path.join(tmp, "employees.csv")
+          write_employees_csv(path, args.rows)
+          results = {"rows": args.rows, "csv_mb": os.path.getsize(path) / 2**20}
+          for mode in ["load", "chunked", "processes"]:
+               output = subprocess.run([sys.executable, __file__, "--worker", mode, "--path", path,
+                                        "--processes", str(args.processes), "--chunksize", str(args.chunksize)],
+                                       capture_output=True, text=True, check=True).stdout
+               results[mode] = json.loads(output.strip().splitlines()[-1])
+
+     for mode in ["chunked", "processes"]:
+          check(results["load"]["results"], results[mode]["results"])
+     for mode in ["load", "chunked", "processes"]:
+          del results[mode]["results"]
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
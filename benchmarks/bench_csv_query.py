@@ -0,0 +1,111 @@
+"""
+Benchmark: csv_analyzer (n4) on data/employees.csv, aggregate questions answered by the
+deterministic query plan (fast path) against the pandas agent loop. A scripted fake LLM
+with a fixed latency plays the agent (one tool call, then the final answer).
+Every fast-path answer is checked against a hand-written pandas expression, and questions
+the fast path does not support must fall back to the agent.
+
+Run from the 'benchmarks' folder:
+python bench_csv_query.py --latency 0.5
+"""
+import os
+import json
+import time
+import argparse
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+
+from fakes import SRC_DIR, latency_summary
+from n4_csv_insight_analyzer import csv_analyzer, DATASETS
+
+CSV_PATH = os.path.join(SRC_DIR, '..', 'data', 'employees.csv')
+
+# Supported questions and the pandas expression of their expected result
+FAST_PATH_QUESTIONS = [
+     ("average SALARY by DEPARTMENT_ID", lambda df: df.groupby("DEPARTMENT_ID")["SALARY"].mean()),
+     ("What is the average salary?", lambda df: df["SALARY"].mean()),
+     ("total salary per job id", lambda df: df.groupby("JOB_ID", observed=True)["SALARY"].sum()),
+     ("how many employees where JOB_ID is SH_CLERK", lambda df: int((df["JOB_ID"] == "SH_CLERK").sum())),
+     ("how many employees by DEPARTMENT_ID", lambda df: df.groupby("DEPARTMENT_ID").size()),
+     ("max SALARY per JOB_ID where DEPARTMENT_ID = 50",
+      lambda df: df[df["DEPARTMENT_ID"] == 50].groupby("JOB_ID", observed=True)["SALARY"].max()),
+     ("median salary for each department_id where salary > 3000",
+      lambda df: df[df["SALARY"] > 3000].groupby("DEPARTMENT_ID")["SALARY"].median()),
+     ("minimum HIRE_DATE", lambda df: df["HIRE_DATE"].min()),
+     ("sum of SALARY where JOB_ID is not SH_CLERK and MANAGER_ID = 124",
+      lambda df: df[(df["JOB_ID"] != "SH_CLERK") & (df["MANAGER_ID"] == 124)]["SALARY"].sum()),
+]
+
+# Questions the fast path must leave to the agent
+AGENT_QUESTIONS = [
+     "What is the average sales for 2023?",
+     "Who earns the most?",
+     "how many departments are there",
+     "average FIRST_NAME by JOB_ID",
+]
+
+
+class CountingFakeLLM(FakeListLLM):
+     """
+     Scripted ReAct answers (tool call, then final answer) with a latency per call, counting the calls.
+     """
+
+     calls: int = 0
+     latency: float = 0.0
+
+     def _call(self, *args, **kwargs):
+          self.calls += 1
+          time.sleep(self.latency)
+          return super()._call(*args, **kwargs)
+
+# Function to create the fake agent LLM
+def scripted_llm(latency):
+     return CountingFakeLLM(latency=latency, responses=[
+          "Thought: I should compute it with pandas.\nAction: python_repl_ast\nAction Input: df['SALARY'].mean()",
+          "Thought: I now know the final answer.\nFinal Answer: 6182.32",
+     ])
+
+# Function to ask questions and collect latencies and LLM calls
+def run(questions, llm, fast_path):
+     latencies, answers = [], []
+     calls_before = llm.calls
+     for question in questions:
+          start = time.perf_counter()
+          answers.append(csv_analyzer(CSV_PATH, question, llm=llm, fast_path=fast_path))
+          latencies.append(time.perf_counter() - start)
+     return answers, {"llm_calls_per_question": (llm.calls - calls_before) / len(questions), **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--latency", type=float, default=0.5)  # Seconds per LLM call of the agent
+     args = parser.parse_args()
+
+     df = DATASETS.load(CSV_PATH)
+     llm = scripted_llm(args.latency)
+     questions = [question for question, _ in FAST_PATH_QUESTIONS]
+
+     # Fast path: correct answers, no LLM call
+     answers, fast = run(questions, llm, fast_path=True)
+     for (question, expected), answer in zip(FAST_PATH_QUESTIONS, answers):
+          assert "plan" in answer, question
+          expected = expected(df)
+          if isinstance(expected, pd.Series):
+               pd.testing.assert_series_equal(answer["result"], expected, check_names=False, check_dtype=False)
+          else:
+               assert answer["result"] == expected, (question, answer["result"], expected)
+
+     # Same questions through the agent loop
+     _, agent = run(questions, llm, fast_path=False)
+
+     # Unsupported questions fall back to the agent
+     answers, fallback = run(AGENT_QUESTIONS, llm, fast_path=True)
+     assert all("plan" not in answer for answer in answers)
+
+     print(json.dumps({"fast_path": fast, "agent": agent, "fallback": fallback,
+                       "speedup_p50": agent["p50_ms"] / fast["p50_ms"]}, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: loading a CSV for every query (pd.read_csv, as csv_analyzer did) against DatasetRegistry:
+first load (parse + typing + Parquet copy), repeat loads (in memory) and reload after a
+restart (from the Parquet copy). The CSV is a synthetic export shaped like data/employees.csv.
+
+Run from the 'benchmarks' folder (--rows 12000000 gives a file of about 1 GB):
+python bench_dataset_registry.py --rows 1000000 --queries 5
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from fakes import SRC_DIR  # noqa: F401 (makes the modules of the "src" folder importable)
+from dataset_registry import DatasetRegistry
+
+# Function to write a synthetic employees export with the same columns and placeholders as data/employees.csv
+def write_employees_csv(path, rows, seed=0):
+     rng = np.random.default_rng(seed)
+     jobs = np.array(["SH_CLERK", "AD_ASST", "MK_MAN", "MK_REP", "HR_REP", "PR_REP", "IT_PROG", "FI_ACCOUNT", "SA_REP", "ST_CLERK"])
+     names = np.array(["Donald", "Douglas", "Jennifer", "Michael", "Pat", "Susan", "Hermann", "Shelley", "William", "Steven"])
+     months = np.array(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
+     commission = np.where(rng.random(rows) < 0.7, " - ", np.round(rng.integers(1, 5, rows) / 10, 1).astype(str))
+     pd.DataFrame({
+          "EMPLOYEE_ID": np.arange(100, 100 + rows),
+          "FIRST_NAME": rng.choice(names, rows),
+          "LAST_NAME": np.char.add("Name", (rng.integers(0, 100000, rows)).astype(str)),
+          "EMAIL": np.char.add("EMAIL", np.arange(rows).astype(str)),
+          "PHONE_NUMBER": np.char.add("650.507.", rng.integers(1000, 9999, rows).astype(str)),
+          "HIRE_DATE": [f"{d:02d}-{m}-{y:02d}" for d, m, y in zip(rng.integers(1, 28, rows), rng.choice(months, rows), rng.integers(0, 10, rows))],
+          "JOB_ID": rng.choice(jobs, rows),
+          "SALARY": rng.integers(2000, 25000, rows),
+          "COMMISSION_PCT": commission,
+          "MANAGER_ID": rng.integers(100, 130, rows),
+          "DEPARTMENT_ID": rng.choice([10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110], rows),
+     }).to_csv(path, index=False)
+
+# Function to time a call
+def timed(fn):
+     start = time.perf_counter()
+     result = fn()
+     return result, time.perf_counter() - start
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--rows", type=int, default=1_000_000)
+     parser.add_argument("--queries", type=int, default=5)  # Repeat queries on the same file
+     args = parser.parse_args()
+
+     with tempfile.TemporaryDirectory() as tmp:
+          path = os.path.join(tmp, "employees.csv")
+          write_employees_csv(path, args.rows)
+          results = {"rows": args.rows, "csv_mb": os.path.getsize(path) / 2**20}
+
+          # Before: every query parses the CSV
+          raw, seconds = timed(lambda: pd.read_csv(path))
+          results["read_csv_per_query_seconds"] = seconds
+          results["read_csv_memory_mb"] = raw.memory_usage(deep=True).sum() / 2**20
+          del raw
+
+          registry = DatasetRegistry(parquet_dir=os.path.join(tmp, "parquet"))
+          df, results["registry_first_load_seconds"] = timed(lambda: registry.load(path))
+          results["registry_memory_mb"] = registry.memory_bytes() / 2**20
+          repeats = [timed(lambda: registry.load(path))[1] for _ in range(args.queries)]
+          results["registry_repeat_load_ms"] = 1000 * sum(repeats) / len(repeats)
+
+          # After a restart: a new registry reloads the Parquet copy instead of parsing the CSV
+          restarted = DatasetRegistry(parquet_dir=os.path.join(tmp, "parquet"))
+          reloaded, results["registry_parquet_reload_seconds"] = timed(lambda: restarted.load(path))
+          assert reloaded.equals(df) and restarted.stats["csv_parses"] == 0
+          results["dtypes"] = {column: str(dtype) for column, dtype in df.dtypes.items()}
+          results["stats"] = registry.stats
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: recall@k and latency of vector search alone (get_similar_docs in n6) against the
+local BM25 index, their reciprocal rank fusion (hybrid) and the auto mode (BM25 alone for short
+exact-term queries), on a synthetic corpus of chunks that each mention one product code.
+
+Two query sets, one relevant chunk per query:
+exact   - "<product code> specs", where the hashed bag-of-words embeddings blur the rare code
+topical - words of the chunk, most of them replaced by synonyms that only the embeddings understand
+
+Run from the 'benchmarks' folder:
+python bench_hybrid_search.py --docs 20000 --queries 300 --k 5 --embed-latency 0.02
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from fakes import WordEmbeddings, latency_summary
+from lexical_index import BM25Index, hybrid_search
+
+PREFIXES = ["ZX", "QT", "MK", "RB", "LV", "PX", "TN", "GW"]
+
+
+class SynonymEmbeddings(WordEmbeddings):
+     """
+     Bag-of-words embeddings that map every synonym to its word (so they capture the meaning
+     of paraphrases, unlike BM25), with a fixed latency per call like a remote model.
+     """
+
+     def __init__(self, synonyms, dimension=256, latency=0.0):
+          super().__init__(dimension)
+          self.synonyms = synonyms
+          self.latency = latency
+
+     def embed_documents(self, texts):
+          time.sleep(self.latency)
+          return super().embed_documents([" ".join(self.synonyms.get(w, w) for w in text.split()) for text in texts])
+
+# Function to generate the chunks and the two query sets
+def corpus(docs, queries, vocabulary=3000, words=40, seed=0):
+     rng = np.random.default_rng(seed)
+     weights = 1 / np.arange(1, vocabulary + 1)  # Zipf-like word frequencies
+     weights /= weights.sum()
+     chunks, codes = [], []
+     for i in range(docs):
+          code = f"{PREFIXES[i % len(PREFIXES)]}-{10000 + i}"
+          body = [f"w{w}" for w in rng.choice(vocabulary, words, p=weights)]
+          chunks.append(Document(page_content=f"{' '.join(body[:words // 2])} {code} {' '.join(body[words // 2:])}",
+                                 metadata={"source": f"https://example.com/products/{i}"}))
+          codes.append(code)
+     targets = rng.choice(docs, queries, replace=False)
+     exact = [(f"{codes[i]} specs", i) for i in targets]
+     topical = []
+     for i in targets:
+          body = [w for w in chunks[i].page_content.split() if w.startswith("w")]
+          picked = rng.choice(body, 8, replace=False)
+          topical.append((" ".join("s" + w[1:] if rng.random() < 0.7 else w for w in picked), i))
+     synonyms = {f"s{w}": f"w{w}" for w in range(vocabulary)}
+     return chunks, exact, topical, synonyms
+
+# Function to measure recall@k and latency of one search function
+def measure(search, queries, chunks, k, embeddings):
+     calls_before = embeddings.calls
+     latencies, hits = [], 0
+     for query, target in queries:
+          start = time.perf_counter()
+          docs = search(query)
+          latencies.append(time.perf_counter() - start)
+          hits += any(doc.metadata["source"] == chunks[target].metadata["source"] for doc in docs[:k])
+     return {"recall_at_k": hits / len(queries), "embed_calls_per_query": (embeddings.calls - calls_before) / len(queries),
+             **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--docs", type=int, default=20000)
+     parser.add_argument("--queries", type=int, default=300)
+     parser.add_argument("--k", type=int, default=5)
+     parser.add_argument("--embed-latency", type=float, default=0.02)  # Seconds per embedding call
+     args = parser.parse_args()
+
+     chunks, exact, topical, synonyms = corpus(args.docs, args.queries)
+     embeddings = SynonymEmbeddings(synonyms)
+     db = FAISS.from_documents(chunks, embeddings)
+
+     start = time.perf_counter()
+     lexical_index = BM25Index(index_dir=None)
+     lexical_index.add_documents(chunks)
+     lexical_index.commit()
+     results = {"docs": args.docs, "k": args.k, "lexical_build_seconds": time.perf_counter() - start,
+                "lexical_index_mb": sum(a.nbytes for a in (lexical_index.offsets, lexical_index.doc_ids,
+                                                           lexical_index.term_freqs, lexical_index.doc_lengths)) / 2**20}
+
+     embeddings.latency = args.embed_latency
+     searches = {
+          "vector": lambda query: db.similarity_search(query, k=args.k),
+          "lexical": lambda query: hybrid_search(db, lexical_index, query, k=args.k, mode="lexical"),
+          "hybrid": lambda query: hybrid_search(db, lexical_index, query, k=args.k, mode="hybrid"),
+          "auto": lambda query: hybrid_search(db, lexical_index, query, k=args.k, mode="auto"),
+     }
+     for name, queries in (("exact", exact), ("topical", topical)):
+          results[name] = {mode: measure(search, queries, chunks, args.k, embeddings) for mode, search in searches.items()}
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
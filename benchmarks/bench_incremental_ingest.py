@@ -0,0 +1,70 @@
+"""
+Benchmark: full ingest of a synthetic website, then a re-run after a share of the pages
+changed and a few were removed. The re-run should do about that share of the work.
+
+Run from the 'benchmarks' folder:
+python bench_incremental_ingest.py --pages 10000 --changed 0.01 --removed 0.001
+"""
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import os
+
+from fakes import HashEmbeddings, SitemapServer
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from sitemap_crawler import SitemapCrawler
+from vector_upsert import VectorUpserter, InMemoryVectorBackend
+from incremental_ingest import IngestManifest, incremental_ingest
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--pages", type=int, default=10000)
+     parser.add_argument("--changed", type=float, default=0.01)  # Share of pages edited between the runs
+     parser.add_argument("--removed", type=float, default=0.001)  # Share of pages removed between the runs
+     parser.add_argument("--latency", type=float, default=0.002)
+     args = parser.parse_args()
+
+     workdir = tempfile.mkdtemp()
+     manifest_path = os.path.join(workdir, "manifest.json")
+     validators_path = os.path.join(workdir, "validators.json")
+     embeddings = HashEmbeddings(dimension=64)
+     backend = InMemoryVectorBackend()
+
+     def run(server):
+          requests_before, texts_before = server.requests, embeddings.texts
+          upserter = VectorUpserter(backend)
+          crawler = SitemapCrawler(max_connections=64, per_host=64, validators_path=validators_path)
+          start = time.perf_counter()
+          stats = asyncio.run(incremental_ingest(server.sitemap_url, IngestManifest(manifest_path),
+                                                 splitter.split_documents, embeddings, upserter, crawler=crawler))
+          stats.pop("stages")
+          return {**stats, "seconds": time.perf_counter() - start, "http_requests": server.requests - requests_before,
+                  "embedded_chunks": embeddings.texts - texts_before, "upserted": upserter.stats["upserted"]}
+
+     with SitemapServer(pages=args.pages, latency=args.latency) as server:
+          full = run(server)
+
+          # Edit and remove a share of the pages (edited pages get a new lastmod in the sitemap)
+          step = max(1, int(1 / args.changed))
+          for i in range(0, args.pages, step):
+               server.version[i] = 1
+          server.removed = set(range(1, args.pages, max(1, int(1 / args.removed))))
+          incremental = run(server)
+
+     print(json.dumps({
+          "pages": args.pages,
+          "full_run": full,
+          "incremental_run": incremental,
+          "work_ratio": incremental["embedded_chunks"] / max(1, full["embedded_chunks"]),
+          "time_ratio": incremental["seconds"] / full["seconds"],
+          "vectors_in_store": len(backend.vectors),
+     }, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: serial ingest (crawl everything -> split everything -> embed everything -> upsert everything)
+against the staged IngestPipeline, on a local synthetic website with simulated embedding and upsert latency.
+
+Run from the 'benchmarks' folder:
+python bench_ingest_pipeline.py --pages 2000 --latency 0.01 --text-latency 0.002 --upsert-latency 0.02
+"""
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+from fakes import HashEmbeddings, SitemapServer
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from sitemap_crawler import SitemapCrawler
+from ingest_pipeline import IngestPipeline
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+
+# Same splitting as data_splitter in n6_web_wise_assistant.py
+def split(docs):
+     return splitter.split_documents(docs)
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--pages", type=int, default=2000)
+     parser.add_argument("--latency", type=float, default=0.01)  # Server latency per page
+     parser.add_argument("--text-latency", type=float, default=0.002)  # Embedding cost per chunk
+     parser.add_argument("--upsert-latency", type=float, default=0.02)  # Vector store round trip per batch
+     parser.add_argument("--batch-size", type=int, default=64)
+     parser.add_argument("--memory", action="store_true")  # Also report peak traced memory of both runs
+     args = parser.parse_args()
+
+     def upsert(chunks, vectors):
+          time.sleep(args.upsert_latency)
+
+     embeddings = HashEmbeddings(text_latency=args.text_latency)
+
+     # Serial: every step materializes its full output before the next one starts
+     def serial(sitemap_url):
+          async def collect():
+               return [doc async for doc in SitemapCrawler(max_connections=32).crawl(sitemap_url)]
+
+          docs = asyncio.run(collect())
+          chunks = split(docs)
+          vectors = []
+          for i in range(0, len(chunks), args.batch_size):
+               vectors.extend(embeddings.embed_documents([c.page_content for c in chunks[i:i + args.batch_size]]))
+          for i in range(0, len(chunks), args.batch_size):
+               upsert(chunks[i:i + args.batch_size], vectors[i:i + args.batch_size])
+          return len(chunks)
+
+     # Pipelined: stages overlap and are connected by bounded queues
+     def pipelined(sitemap_url):
+          pipeline = IngestPipeline(split, embeddings, upsert, embed_batch_size=args.batch_size,
+                                    embed_workers=4, upsert_workers=4)
+          return asyncio.run(pipeline.run(SitemapCrawler(max_connections=32).crawl(sitemap_url)))
+
+     # Time a run, then repeat it under tracemalloc for its peak memory (tracemalloc slows the run down)
+     def measure(run, sitemap_url):
+          start = time.perf_counter()
+          result = run(sitemap_url)
+          seconds = time.perf_counter() - start
+          peak_mb = None
+          if args.memory:
+               tracemalloc.start()
+               run(sitemap_url)
+               peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+               tracemalloc.stop()
+          return result, seconds, peak_mb
+
+     with SitemapServer(pages=args.pages, latency=args.latency, words_per_page=600) as server:
+          chunk_count, serial_seconds, serial_peak = measure(serial, server.sitemap_url)
+          stages, pipeline_seconds, pipeline_peak = measure(pipelined, server.sitemap_url)
+
+     print(json.dumps({
+          "pages": args.pages,
+          "chunks": chunk_count,
+          "serial_seconds": serial_seconds,
+          "pipeline_seconds": pipeline_seconds,
+          "speedup": serial_seconds / pipeline_seconds,
+          "serial_peak_mb": serial_peak,
+          "pipeline_peak_mb": pipeline_peak,
+          "stages": stages,
+     }, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: overhead of the instrumentation layer on the hot paths of the pipelines, at several
+sample rates, against the same calls without instrumentation:
+bm25        - BM25 search of the local lexical index (n6), in a span
+query_plan  - csv_analyzer fast path (n4) on data/employees.csv, in a span
+llm         - call of a fake LLM with the callback handler (latency, token usage), 2 ms per call by default:
+              most of its fixed cost is the callback dispatch of LangChain, paid once per real API call
+embed       - InstrumentedEmbeddings around a fake embedding model (n1, n6)
+Spans are written to a temporary JSON lines trace file, as with INSTRUMENTATION_JSONL.
+The target is an overhead below 1% at the default sample rate of the hot paths.
+
+Run from the 'benchmarks' folder:
+python bench_instrumentation.py --calls 1000 --rounds 7
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from langchain_core.documents import Document
+
+from fakes import SRC_DIR, FakeLLM, HashEmbeddings, synthetic_words
+from lexical_index import BM25Index
+from query_plan import answer_query
+from dataset_registry import DatasetRegistry
+from instrumentation import MetricsRegistry, InstrumentationCallbackHandler, InstrumentedEmbeddings
+
+CSV_PATH = os.path.join(SRC_DIR, '..', 'data', 'employees.csv')
+
+# Function to build the workloads: (name, plain call, instrumented call factory taking a registry)
+def workloads(llm_latency, docs=5000, seed=0):
+     rng = np.random.default_rng(seed)
+     vocabulary = synthetic_words(3000)
+     index = BM25Index(index_dir=None)
+     index.add_documents([Document(page_content=" ".join(rng.choice(vocabulary, 40))) for _ in range(docs)])
+     index.commit()
+     queries = [" ".join(rng.choice(vocabulary, 3)) for _ in range(64)]
+     df = DatasetRegistry(parquet_dir=None).load(CSV_PATH)
+     llm = FakeLLM(latency=llm_latency)
+     embeddings = HashEmbeddings()
+     texts = ["chunk of text about " + " ".join(rng.choice(vocabulary, 20)) for _ in range(16)]
+
+     def bm25(i):
+          return index.search(queries[i % len(queries)], k=5)
+
+     def query_plan(i):
+          return answer_query(df, "average SALARY by DEPARTMENT_ID")
+
+     def in_span(fn, name):
+          def factory(registry):
+               def call(i):
+                    with registry.span(name, pipeline="bench"):
+                         return fn(i)
+               return call
+          return factory
+
+     def llm_factory(registry):
+          handler = [InstrumentationCallbackHandler(registry, pipeline="bench")]
+          return lambda i: llm.invoke(queries[i % len(queries)], config={"callbacks": handler})
+
+     def embed_factory(registry):
+          instrumented = InstrumentedEmbeddings(embeddings, registry, pipeline="bench")
+          return lambda i: instrumented.embed_documents(texts)
+
+     return [
+          ("bm25", bm25, in_span(bm25, "bm25_search")),
+          ("query_plan", query_plan, in_span(query_plan, "csv_analyzer")),
+          ("llm", lambda i: llm.invoke(queries[i % len(queries)]), llm_factory),
+          ("embed", lambda i: embeddings.embed_documents(texts), embed_factory),
+     ]
+
+# Function to time a number of calls
+def timed(call, calls):
+     start = time.perf_counter()
+     for i in range(calls):
+          call(i)
+     return time.perf_counter() - start
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--calls", type=int, default=1000)  # Calls per round and configuration
+     parser.add_argument("--rounds", type=int, default=7)  # Configurations are interleaved, the best round is kept
+     parser.add_argument("--llm-latency", type=float, default=0.002)  # Seconds per fake LLM call
+     parser.add_argument("--sample-rates", type=float, nargs="+", default=[1.0, 0.1, 0.01])
+     args = parser.parse_args()
+
+     results = {"calls": args.calls, "rounds": args.rounds}
+     with tempfile.TemporaryDirectory() as tmp:
+          for name, plain, factory in workloads(args.llm_latency):
+               registries = {rate: MetricsRegistry(jsonl_path=os.path.join(tmp, f"{name}_{rate}.jsonl"), sample_rate=rate)
+                             for rate in args.sample_rates}
+               configurations = {"plain": plain, **{rate: factory(registry) for rate, registry in registries.items()}}
+               for call in configurations.values():
+                    timed(call, min(args.calls, 100))  # Warm up
+               best = {key: float("inf") for key in configurations}
+               for _ in range(args.rounds):
+                    for key, call in configurations.items():
+                         best[key] = min(best[key], timed(call, args.calls))
+               for registry in registries.values():
+                    registry.flush()
+               results[name] = {"plain_us_per_call": best["plain"] / args.calls * 1e6}
+               for rate, registry in registries.items():
+                    with open(registry.jsonl_path) as f:
+                         spans = sum(1 for _ in f)
+                    results[name][f"sample_rate_{rate}"] = {
+                         "us_per_call": best[rate] / args.calls * 1e6,
+                         "overhead_us_per_call": (best[rate] - best["plain"]) / args.calls * 1e6,
+                         "overhead_pct": (best[rate] - best["plain"]) / best["plain"] * 100,
+                         "spans_written": spans,
+                    }
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
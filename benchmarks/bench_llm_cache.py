@@ -0,0 +1,94 @@
+"""
+Benchmark: LLM calls with and without SQLiteLLMCache, on a workload of repeated and
+near-duplicate prompts (like users asking the persona generator the same questions).
+A fake LLM with a fixed latency stands in for OpenAI, so no API key is needed.
+
+Run from the 'benchmarks' folder:
+python bench_llm_cache.py --requests 2000 --prompts 200 --latency 0.05
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from fakes import FakeLLM, WordEmbeddings, latency_summary
+from llm_cache import SQLiteLLMCache
+
+# Few-shot part shared by every prompt, like the examples of a persona in n2 (most of the text of the prompt)
+EXAMPLES = "\n".join(
+     f"     Question: What is experiment {i} about?\n     Response: Experiment {i} measures how the samples react to heat, "
+     f"light and pressure over several weeks in the laboratory." for i in range(4))
+
+# Function to build the workload: a few popular questions asked often, some of them reworded slightly
+def workload(requests, prompts, near_duplicate_rate, seed=0):
+     rng = random.Random(seed)
+     vocabulary = [f"word{i}" for i in range(500)]
+     base = [f"You are a Scientist, and Write a project report:\n     Here are some examples:\n{EXAMPLES}\n"
+             f"     Question: {' '.join(rng.sample(vocabulary, 8))}?\n     Response: " for _ in range(prompts)]
+     weights = [1 / (rank + 1) for rank in range(prompts)]  # Zipf-like popularity
+     queries = []
+     for index in rng.choices(range(prompts), weights=weights, k=requests):
+          prompt = base[index]
+          if rng.random() < near_duplicate_rate:
+               head, question = prompt.rsplit("Question:", 1)
+               prompt = head + "Question: tell me," + question
+          queries.append((index, prompt))
+     return base, queries
+
+# Function to run the workload through a model and collect its latencies
+def run(llm, queries):
+     latencies, responses = [], []
+     start = time.perf_counter()
+     for _, prompt in queries:
+          t0 = time.perf_counter()
+          responses.append(llm.invoke(prompt))
+          latencies.append(time.perf_counter() - t0)
+     elapsed = time.perf_counter() - start
+     return responses, {"llm_calls": llm.calls, "requests_per_second": len(queries) / elapsed, **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--requests", type=int, default=2000)
+     parser.add_argument("--prompts", type=int, default=200)  # Distinct prompts of the workload
+     parser.add_argument("--near-duplicates", type=float, default=0.2)  # Share of slightly reworded requests
+     parser.add_argument("--latency", type=float, default=0.05)  # Seconds per LLM call
+     args = parser.parse_args()
+
+     base, queries = workload(args.requests, args.prompts, args.near_duplicates)
+     results = {"requests": args.requests, "distinct_requests": len(set(queries))}
+     # Answers of every question, as asked or reworded
+     model = FakeLLM()
+     answers = {index: set() for index in range(len(base))}
+     for index, prompt in queries:
+          answers[index].add(model.invoke(prompt))
+
+     with tempfile.TemporaryDirectory() as tmp:
+          reference, results["no_cache"] = run(FakeLLM(latency=args.latency), queries)
+
+          cache = SQLiteLLMCache(os.path.join(tmp, "exact.sqlite"))
+          responses, results["exact_cache"] = run(FakeLLM(latency=args.latency, cache=cache.cache_option(0)), queries)
+          assert responses == reference  # Cached responses are the responses of the model
+          results["exact_cache"].update(cache.stats())
+
+          cache = SQLiteLLMCache(os.path.join(tmp, "semantic.sqlite"), embeddings=WordEmbeddings(), similarity_threshold=0.9)
+          responses, results["semantic_cache"] = run(FakeLLM(latency=args.latency, cache=cache.cache_option(0)), queries)
+          results["semantic_cache"].update(cache.stats())
+          # A semantic hit is wrong when it serves the answer of another question
+          results["semantic_cache"]["wrong_answers"] = sum(
+               response not in answers[index] for (index, _), response in zip(queries, responses))
+          assert results["semantic_cache"]["wrong_answers"] == 0, results["semantic_cache"]
+
+          # Non-deterministic calls are not cached unless asked for
+          cache = SQLiteLLMCache(os.path.join(tmp, "creative.sqlite"))
+          llm = FakeLLM(latency=0.0, temperature=0.9, cache=cache.cache_option(0.9))
+          run(llm, queries[:100])
+          results["temperature_0.9_llm_calls"] = llm.calls
+
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
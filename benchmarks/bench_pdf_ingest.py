@@ -0,0 +1,91 @@
+"""
+Benchmark: loading a directory of PDFs with PyPDFDirectoryLoader (load_docs in the quiz notebook)
+against PdfIngestor: first run (process pool, pages cached by content hash), re-run on the
+unchanged directory (cache only), and pages streamed into the split + embed pipeline while the
+PDFs are still being parsed. The PDFs are synthetic, with a few pages of text each.
+
+Run from the 'benchmarks' folder:
+python bench_pdf_ingest.py --files 200 --pages 5 --processes 4
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+from fakes import HashEmbeddings, synthetic_words, write_text_pdf
+from pdf_ingest import PdfIngestor
+from ingest_pipeline import IngestPipeline
+from fast_text_splitter import FastRecursiveTextSplitter
+from langchain_community.document_loaders import PyPDFDirectoryLoader
+
+# Function to write the synthetic PDFs
+def write_pdfs(directory, files, pages, words_per_line=12, lines=50, seed=0):
+     rng = np.random.default_rng(seed)
+     vocabulary = synthetic_words(5000)
+     for i in range(files):
+          texts = ["\n".join(" ".join(rng.choice(vocabulary, words_per_line)) for _ in range(lines)) for _ in range(pages)]
+          write_text_pdf(os.path.join(directory, f"document_{i:04d}.pdf"), texts)
+
+# Function to index pages by file and page number, for the parity check
+def by_page(docs):
+     return {(doc.metadata["source"], doc.metadata["page"]): (doc.page_content, doc.metadata) for doc in docs}
+
+# Function to time a call
+def timed(fn):
+     start = time.perf_counter()
+     result = fn()
+     return result, time.perf_counter() - start
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--files", type=int, default=200)
+     parser.add_argument("--pages", type=int, default=5)  # Pages per PDF
+     parser.add_argument("--processes", type=int, default=os.cpu_count())
+     parser.add_argument("--embed-latency", type=float, default=0.01)  # Seconds per embedding call
+     args = parser.parse_args()
+     splitter = FastRecursiveTextSplitter(chunk_size=1000, chunk_overlap=20)
+
+     with tempfile.TemporaryDirectory() as tmp:
+          directory = os.path.join(tmp, "Docs")
+          os.makedirs(directory)
+          write_pdfs(directory, args.files, args.pages)
+          results = {"files": args.files, "pages": args.files * args.pages, "processes": args.processes}
+
+          # Before: serial parse of every PDF on every run
+          expected, seconds = timed(lambda: PyPDFDirectoryLoader(directory).load())
+          results["pypdf_directory_loader_seconds"] = seconds
+
+          # First run: process pool, every file parsed once and cached
+          ingestor = PdfIngestor(cache_dir=os.path.join(tmp, "cache"), processes=args.processes)
+          docs, seconds = timed(lambda: ingestor.load(directory))
+          assert by_page(docs) == by_page(expected)
+          results["first_run"] = {"seconds": seconds, **{k: v for k, v in ingestor.stats.items() if k != "seconds"},
+                                  "mean_parse_seconds_per_file": float(np.mean([t["seconds"] for t in ingestor.timings]))}
+
+          # Re-run on the unchanged directory: hashes and cache reads only
+          docs, seconds = timed(lambda: ingestor.load(directory))
+          assert by_page(docs) == by_page(expected)
+          results["rerun"] = {"seconds": seconds, "cached": ingestor.stats["cached"], "speedup": results["pypdf_directory_loader_seconds"] / seconds}
+
+          # Split + embed: after the whole directory is loaded, against pages streamed into the pipeline
+          embeddings = HashEmbeddings(call_latency=args.embed_latency)
+
+          def sequential():
+               chunks = splitter.split_documents(PyPDFDirectoryLoader(directory).load())
+               for start in range(0, len(chunks), 64):
+                    embeddings.embed_documents([chunk.page_content for chunk in chunks[start:start + 64]])
+
+          _, results["load_then_embed_seconds"] = timed(sequential)
+          streamed = PdfIngestor(cache_dir=os.path.join(tmp, "cache_streamed"), processes=args.processes)
+          pipeline = IngestPipeline(splitter.split_documents, embeddings, embed_batch_size=64)
+          _, results["streamed_pipeline_seconds"] = timed(lambda: asyncio.run(pipeline.run(streamed.stream(directory))))
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
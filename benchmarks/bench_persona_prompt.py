@@ -0,0 +1,84 @@
+"""
+Benchmark: per-request overhead of getGenResponse (n2) before and after the persona registry.
+Before: every request builds the examples, a PromptTemplate, a LengthBasedExampleSelector,
+a FewShotPromptTemplate and an OpenAI client. After: the registry formats the prompt from
+pre-rendered, pre-measured examples and the client is shared. No request is sent to OpenAI.
+Both paths must produce the same prompt for every persona and query length.
+
+Run from the 'benchmarks' folder:
+python bench_persona_prompt.py --requests 2000
+"""
+import os
+import json
+import time
+import argparse
+
+from fakes import SRC_DIR, latency_summary
+from langchain_openai import OpenAI
+from langchain_core.prompts import PromptTemplate, FewShotPromptTemplate
+from langchain_core.example_selectors import LengthBasedExampleSelector
+from persona_registry import PersonaRegistry
+
+PERSONAS_PATH = os.path.join(SRC_DIR, '..', 'data', 'personas.json')
+
+# Function reproducing the prompt assembly of getGenResponse before the registry (one request)
+def prompt_before(config, query, persona, tasktype_option):
+     llm = OpenAI(temperature=.9, model="gpt-3.5-turbo-instruct", api_key="sk-benchmark")  # noqa: F841 (client per call)
+     examples = [dict(example) for example in config["personas"][persona]["examples"]]
+     example_prompt = PromptTemplate(input_variables=["query", "answer"], template=config["example_template"])
+     example_selector = LengthBasedExampleSelector(examples=examples, example_prompt=example_prompt,
+                                                   max_length=config["max_length"])
+     new_prompt_template = FewShotPromptTemplate(
+          example_selector=example_selector,
+          example_prompt=example_prompt,
+          prefix=config["prefix"],
+          suffix=config["suffix"],
+          input_variables=["template_userInput", "template_ageoption", "template_tasktype_option"],
+          example_separator=config["example_separator"]
+     )
+     return new_prompt_template.format(template_userInput=query, template_ageoption=persona,
+                                       template_tasktype_option=tasktype_option)
+
+# Function to time one way of building prompts over the requests
+def timed(build, requests):
+     latencies = []
+     for query, persona, tasktype_option in requests:
+          start = time.perf_counter()
+          build(query, persona, tasktype_option)
+          latencies.append(time.perf_counter() - start)
+     return {"requests_per_second": len(requests) / sum(latencies), "mean_us": sum(latencies) / len(latencies) * 1e6,
+             **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--requests", type=int, default=2000)
+     args = parser.parse_args()
+
+     with open(PERSONAS_PATH, encoding="utf-8") as f:
+          config = json.load(f)
+     registry = PersonaRegistry(PERSONAS_PATH)
+     shared_llm = OpenAI(temperature=.9, model="gpt-3.5-turbo-instruct", api_key="sk-benchmark")
+
+     # Queries of growing length, so fewer and fewer examples fit in max_length
+     queries = ["What are your dreams?"] + [" ".join(["word"] * n) + "?" for n in (20, 60, 120, 180, 199, 250)]
+     tasks = ["Write a project report", "Create a technical tweet", "Write a research summary"]
+     requests = [(queries[i % len(queries)], registry.names()[i % 3], tasks[i % len(tasks)]) for i in range(args.requests)]
+
+     # Parity: the registry builds exactly the prompt of the FewShotPromptTemplate
+     for query, persona, tasktype_option in set(requests):
+          assert registry.format_prompt(persona, query, tasktype_option) == \
+               prompt_before(config, query, persona, tasktype_option), (query, persona)
+
+     def prompt_after(query, persona, tasktype_option):
+          llm = shared_llm  # noqa: F841 (shared client)
+          return registry.format_prompt(persona, query, tasktype_option)
+
+     before = timed(lambda *request: prompt_before(config, *request), requests)
+     after = timed(prompt_after, requests)
+     print(json.dumps({"requests": args.requests, "parity": True, "before": before, "after": after,
+                       "speedup": before["mean_us"] / after["mean_us"]}, indent=2))
+
+
+if __name__ == "__main__":
+     main()
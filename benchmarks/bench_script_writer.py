@@ -0,0 +1,70 @@
+"""
+Benchmark: script_generator (n5) against script_generator_async and script_generator_batch,
+with a fake LLM and a fake search tool of fixed latencies (no API key, no network).
+The async version runs the title and the search concurrently, the batch API processes
+several prompts at once within a concurrency limit and an optional rate limit.
+
+Run from the 'benchmarks' folder:
+python bench_script_writer.py --prompts 40 --llm-latency 0.2 --search-latency 0.3
+"""
+import json
+import time
+import asyncio
+import argparse
+
+from fakes import FakeLLM, FakeSearch, latency_summary
+from n5_video_script_writer import script_generator, script_generator_async, script_generator_batch
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--prompts", type=int, default=40)
+     parser.add_argument("--llm-latency", type=float, default=0.2)  # Seconds per LLM call
+     parser.add_argument("--search-latency", type=float, default=0.3)  # Seconds per search
+     parser.add_argument("--concurrency", type=int, default=8)
+     parser.add_argument("--requests-per-second", type=float, default=None)  # LLM rate limit of the batch
+     args = parser.parse_args()
+
+     prompts = [f"How to improve productivity with AI tools, part {i}" for i in range(args.prompts)]
+     llm = FakeLLM(latency=args.llm_latency)
+     search = FakeSearch(latency=args.search_latency)
+     options = {"llm_cache": None, "llm": llm, "search": search}
+
+     # Sequential: one prompt after the other, each step after the other
+     latencies, expected = [], []
+     start = time.perf_counter()
+     for prompt in prompts:
+          t0 = time.perf_counter()
+          expected.append(script_generator(prompt, "10", 0.7, None, **options))
+          latencies.append(time.perf_counter() - t0)
+     sequential = {"prompts_per_second": len(prompts) / (time.perf_counter() - start), **latency_summary(latencies)}
+
+     # Async: title and search concurrently, still one prompt after the other
+     async def run_async():
+          results, latencies = [], []
+          for prompt in prompts:
+               t0 = time.perf_counter()
+               results.append(await script_generator_async(prompt, "10", 0.7, None, **options))
+               latencies.append(time.perf_counter() - t0)
+          return results, latencies
+
+     start = time.perf_counter()
+     results, latencies = asyncio.run(run_async())
+     concurrent = {"prompts_per_second": len(prompts) / (time.perf_counter() - start), **latency_summary(latencies)}
+     assert results == expected  # Same outputs as the sequential version
+
+     # Batch: several prompts in flight, within the concurrency limit (and rate limit)
+     start = time.perf_counter()
+     results = asyncio.run(script_generator_batch(prompts, "10", 0.7, None, max_concurrency=args.concurrency,
+                                                  requests_per_second=args.requests_per_second, **options))
+     batch = {"prompts_per_second": len(prompts) / (time.perf_counter() - start)}
+     assert results == expected
+
+     print(json.dumps({"prompts": args.prompts, "sequential": sequential, "async": concurrent,
+                       "batch": {"concurrency": args.concurrency, "requests_per_second": args.requests_per_second, **batch},
+                       "latency_speedup": sequential["p50_ms"] / concurrent["p50_ms"],
+                       "throughput_speedup": batch["prompts_per_second"] / sequential["prompts_per_second"]}, indent=2))
+
+
+if __name__ == "__main__":
+     main()
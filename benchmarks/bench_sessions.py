@@ -0,0 +1,96 @@
+"""
+Benchmark: many concurrent conversations, one ConversationChain + ConversationSummaryMemory
+per user (n3 design, a blocking summary call on every turn) against SessionManager
+(recent turns verbatim, summaries batched in the background, idle sessions spilled to disk).
+A fake LLM with a fixed latency stands in for OpenAI.
+
+Run from the 'benchmarks' folder:
+python bench_sessions.py --sessions 200 --turns 10 --users 32 --latency 0.05
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import FakeLLM, latency_summary
+from session_manager import SessionManager
+
+# Same imports as n3, with the package they moved to in LangChain 1.x
+try:
+     from langchain.chains import ConversationChain
+     from langchain.chains.conversation.memory import ConversationSummaryMemory
+except ImportError:
+     from langchain_classic.chains import ConversationChain
+     from langchain_classic.memory import ConversationSummaryMemory
+
+# Function to build the load: every session sends its turns in order, sessions are interleaved
+def workload(sessions, turns, seed=0):
+     rng = random.Random(seed)
+     remaining = {f"user-{i}": 0 for i in range(sessions)}
+     order = []
+     while remaining:
+          session_id = rng.choice(list(remaining))
+          order.append((session_id, f"Message {remaining[session_id]} of {session_id}: tell me about AI."))
+          remaining[session_id] += 1
+          if remaining[session_id] == turns:
+               del remaining[session_id]
+     return order
+
+# Function to run the load with a number of concurrent users and collect the per-turn latencies
+def run(handle, order, users):
+     # One worker per user slot; turns of a session are kept in order by giving each session to one worker
+     by_worker = [[] for _ in range(users)]
+     for session_id, message in order:
+          by_worker[hash(session_id) % users].append((session_id, message))
+     latencies = []
+
+     def worker(items):
+          for session_id, message in items:
+               start = time.perf_counter()
+               handle(session_id, message)
+               latencies.append(time.perf_counter() - start)
+
+     start = time.perf_counter()
+     with ThreadPoolExecutor(max_workers=users) as executor:
+          list(executor.map(worker, by_worker))
+     return {"turns_per_second": len(order) / (time.perf_counter() - start), **latency_summary(latencies)}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--sessions", type=int, default=200)
+     parser.add_argument("--turns", type=int, default=10)  # Turns per session
+     parser.add_argument("--users", type=int, default=32)  # Concurrent requests
+     parser.add_argument("--latency", type=float, default=0.05)  # Seconds per LLM call
+     parser.add_argument("--max-live", type=int, default=50)  # Sessions kept in memory by SessionManager
+     args = parser.parse_args()
+     order = workload(args.sessions, args.turns)
+
+     # n3 design: one chain per user, the summary memory calls the LLM again on every turn
+     llm = FakeLLM(latency=args.latency, response_words=30)
+     chains = {}
+
+     def chain_turn(session_id, message):
+          if session_id not in chains:
+               chains[session_id] = ConversationChain(llm=llm, memory=ConversationSummaryMemory(llm=llm))
+          return chains[session_id].predict(input=message)
+
+     results = {"sessions": args.sessions, "turns": len(order)}
+     results["summary_memory"] = {**run(chain_turn, order, args.users), "llm_calls": llm.calls,
+                                  "mean_bytes_per_session": sum(len(c.memory.buffer.encode("utf-8")) for c in chains.values()) / len(chains)}
+
+     # SessionManager: one LLM call per turn, summaries in the background
+     llm = FakeLLM(latency=args.latency, response_words=30)
+     with tempfile.TemporaryDirectory() as spill_dir:
+          manager = SessionManager(llm, max_live_sessions=args.max_live, spill_dir=spill_dir)
+          results["session_manager"] = run(manager.predict, order, args.users)
+          results["session_manager"].update(manager.memory_report())
+          manager.close()
+          results["session_manager"].update({"llm_calls": llm.calls, **manager.stats})
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: the asyncio SitemapCrawler against a local synthetic website.
+Reports pages/sec, time to first document, retries, and the 304 share of a second (conditional) crawl.
+
+Run from the 'benchmarks' folder:
+python bench_sitemap_crawler.py --pages 5000 --latency 0.02 --failure-rate 0.01
+"""
+import json
+import time
+import asyncio
+import argparse
+import urllib.request
+
+from fakes import SitemapServer
+from sitemap_crawler import SitemapCrawler, parse_sitemap
+
+# Function to crawl once and time it
+async def timed_crawl(crawler, sitemap_url):
+     start = time.perf_counter()
+     first = None
+     count = 0
+     async for _ in crawler.crawl(sitemap_url):
+          if first is None:
+               first = time.perf_counter() - start
+          count += 1
+     return {"documents": count, "seconds": time.perf_counter() - start, "first_document_seconds": first, **crawler.stats}
+
+# Function to fetch the pages one after the other, like a blocking loader without concurrency
+def sequential_fetch(sitemap_url, limit):
+     start = time.perf_counter()
+     pages, _ = parse_sitemap(urllib.request.urlopen(sitemap_url).read().decode())
+     for entry in pages[:limit]:
+          urllib.request.urlopen(entry["loc"]).read()
+     return (time.perf_counter() - start) / min(limit, len(pages))
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--pages", type=int, default=2000)
+     parser.add_argument("--latency", type=float, default=0.02)  # Server latency per response
+     parser.add_argument("--failure-rate", type=float, default=0.01)  # Share of transient 503 responses
+     parser.add_argument("--connections", type=int, default=64)
+     parser.add_argument("--per-host", type=int, default=64)
+     args = parser.parse_args()
+
+     with SitemapServer(pages=args.pages, latency=args.latency, failure_rate=args.failure_rate) as server:
+          crawler = SitemapCrawler(max_connections=args.connections, per_host=args.per_host, backoff=0.01)
+          first_run = asyncio.run(timed_crawl(crawler, server.sitemap_url))
+
+          # Second crawl with the validators of the first one: unchanged pages answer 304
+          crawler.stats = {key: 0 for key in crawler.stats}
+          second_run = asyncio.run(timed_crawl(crawler, server.sitemap_url))
+
+          server.failure_rate = 0.0  # The sequential baseline has no retries
+          seconds_per_page = sequential_fetch(server.sitemap_url, limit=100)
+
+     print(json.dumps({
+          "pages": args.pages,
+          "first_run": {**first_run, "pages_per_second": first_run["documents"] / first_run["seconds"]},
+          "conditional_run": second_run,
+          "sequential_pages_per_second": 1 / seconds_per_page,
+     }, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: cold-start import time of the entry-point scripts (each import in a fresh Python
+process, median of the runs) and per-call construction overhead of the clients: a new
+OpenAI / ChatOpenAI client per call (new HTTP connection pool) against the shared clients of
+the provider pool (created once, before the timing), and build_tools of script_generator (n5,
+with a fake search tool). No request is sent to OpenAI.
+n1 and n3 run their whole pipeline when imported, so they are not part of the import timings.
+
+Run from the 'benchmarks' folder:
+python bench_startup.py --runs 5 --calls 200
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from fakes import SRC_DIR, FakeSearch
+
+MODULES = ["n2_persona_prompt", "n4_csv_insight_analyzer", "n5_video_script_writer", "n6_web_wise_assistant"]
+
+# Heavy backends the scripts used to import at top level
+BACKENDS = ["langchain_openai", "langchain_experimental.agents", "langchain_community.tools", "pinecone",
+            "langchain_community.vectorstores"]
+
+# Function to time the import of a module in a fresh process (None when it cannot be imported here)
+def import_seconds(module, runs):
+     code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+     timings = []
+     for _ in range(runs):
+          process = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True)
+          if process.returncode != 0:
+               return None
+          timings.append(float(process.stdout.strip().splitlines()[-1]))
+     return statistics.median(timings)
+
+# Function to time a call in microseconds
+def us_per_call(fn, calls):
+     start = time.perf_counter()
+     for _ in range(calls):
+          fn()
+     return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--runs", type=int, default=5)  # Fresh processes per import timing
+     parser.add_argument("--calls", type=int, default=200)  # Calls per construction timing
+     args = parser.parse_args()
+
+     results = {"import_seconds": {module: import_seconds(module, args.runs) for module in MODULES},
+                "backend_import_seconds": {module: import_seconds(module, args.runs) for module in BACKENDS}}
+
+     from langchain_openai import OpenAI, ChatOpenAI
+     from providers import PROVIDERS
+     from n5_video_script_writer import build_tools
+
+     params = {"temperature": 0.7, "openai_api_key": "sk-benchmark", "model_name": "gpt-3.5-turbo"}
+     PROVIDERS.chat_model(**params), PROVIDERS.llm(temperature=0, openai_api_key="sk-benchmark")  # Created once
+     new_chat = us_per_call(lambda: ChatOpenAI(**params), args.calls)
+     shared_chat = us_per_call(lambda: PROVIDERS.chat_model(**params), args.calls)
+     new_llm = us_per_call(lambda: OpenAI(temperature=0, openai_api_key="sk-benchmark"), args.calls)
+     shared_llm = us_per_call(lambda: PROVIDERS.llm(temperature=0, openai_api_key="sk-benchmark"), args.calls)
+     assert PROVIDERS.chat_model(**params) is PROVIDERS.chat_model(**params)
+     search = FakeSearch()  # DuckDuckGoSearchRun needs the ddgs package
+     build = us_per_call(lambda: build_tools(0.7, "sk-benchmark", llm_cache=None, search=search), args.calls)
+     results["construction_us"] = {
+          "new_chat_openai": new_chat, "shared_chat_openai": shared_chat, "chat_speedup": new_chat / shared_chat,
+          "new_openai": new_llm, "shared_openai": shared_llm, "openai_speedup": new_llm / shared_llm,
+          "n5_build_tools": build,
+     }
+     results["providers"] = PROVIDERS.stats
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: time until the user sees the first token, blocking calls against streaming,
+for the conversation (n3) and the video script writer (n5). A fake streaming LLM with a
+fixed latency before the first token and between tokens stands in for OpenAI.
+The streamed text must equal the blocking answer, and the conversation memory must end
+up the same, updated once per turn (one summary call per turn).
+
+Run from the 'benchmarks' folder:
+python bench_streaming.py --turns 5 --words 100 --latency 0.3 --token-latency 0.01
+"""
+import json
+import time
+import asyncio
+import argparse
+
+from fakes import FakeLLM, FakeSearch
+from streaming import StreamMetrics, stream_conversation, astream_conversation
+from n5_video_script_writer import script_generator, script_generator_stream, script_generator_astream
+
+# Same imports as n3, with the package they moved to in LangChain 1.x
+try:
+     from langchain.chains import ConversationChain
+     from langchain.chains.conversation.memory import ConversationSummaryMemory
+except ImportError:
+     from langchain_classic.chains import ConversationChain
+     from langchain_classic.memory import ConversationSummaryMemory
+
+# Function to create a conversation like n3, on a fake LLM
+def new_conversation(args):
+     llm = FakeLLM(latency=args.latency, token_latency=args.token_latency, response_words=args.words)
+     return ConversationChain(llm=llm, memory=ConversationSummaryMemory(llm=llm)), llm
+
+# Function to average the metrics of several streams
+def mean_metrics(metrics):
+     rows = [m.as_dict() for m in metrics]
+     return {key: sum(row[key] for row in rows) / len(rows) for key in ("ttft_ms", "total_ms", "tokens", "tokens_per_second")}
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--turns", type=int, default=5)  # Conversation turns (and script prompts)
+     parser.add_argument("--words", type=int, default=100)  # Words of every answer
+     parser.add_argument("--latency", type=float, default=0.3)  # Seconds before the first token
+     parser.add_argument("--token-latency", type=float, default=0.01)  # Seconds between tokens
+     args = parser.parse_args()
+     messages = [f"Tell me about the future of AI, question {i}." for i in range(args.turns)]
+     results = {}
+
+     # Conversation: predict blocks until the whole answer is there
+     conversation, llm = new_conversation(args)
+     blocking, answers = [], []
+     for message in messages:
+          start = time.perf_counter()
+          answers.append(conversation.predict(input=message))
+          blocking.append((time.perf_counter() - start) * 1000)
+     expected_memory, expected_calls = conversation.memory.buffer, llm.calls
+
+     streamed_conversation, streamed_llm = new_conversation(args)
+     metrics = []
+     for message, answer in zip(messages, answers):
+          metrics.append(StreamMetrics())
+          assert "".join(stream_conversation(streamed_conversation, message, metrics[-1])) == answer
+     assert streamed_conversation.memory.buffer == expected_memory and streamed_llm.calls == expected_calls
+
+     async def run_async():
+          conversation, llm = new_conversation(args)
+          metrics = []
+          for message, answer in zip(messages, answers):
+               metrics.append(StreamMetrics())
+               tokens = [token async for token in astream_conversation(conversation, message, metrics[-1])]
+               assert "".join(tokens) == answer
+          assert conversation.memory.buffer == expected_memory and llm.calls == expected_calls
+          return metrics
+
+     results["conversation"] = {"blocking_first_output_ms": sum(blocking) / len(blocking),
+                                "stream": mean_metrics(metrics), "astream": mean_metrics(asyncio.run(run_async())),
+                                "llm_calls_per_turn": expected_calls / args.turns}
+
+     # Script writer: the title and the script arrive only at the end, or token by token
+     options = {"llm_cache": None, "search": FakeSearch(latency=args.latency),
+                "llm": FakeLLM(latency=args.latency, token_latency=args.token_latency, response_words=args.words)}
+     blocking, metrics = [], []
+     for message in messages:
+          start = time.perf_counter()
+          search_result, title, script = script_generator(message, "10", 0.7, None, **options)
+          blocking.append((time.perf_counter() - start) * 1000)
+          metrics.append(StreamMetrics())
+          fields = {"title": "", "search": "", "script": ""}
+          for field, text in script_generator_stream(message, "10", 0.7, None, metrics=metrics[-1], **options):
+               fields[field] += text
+          assert (fields["search"], fields["title"], fields["script"]) == (search_result, title, script)
+
+     async def run_script_async():
+          metrics = []
+          for message in messages:
+               metrics.append(StreamMetrics())
+               async for _ in script_generator_astream(message, "10", 0.7, None, metrics=metrics[-1], **options):
+                    pass
+          return metrics
+
+     results["script_writer"] = {"blocking_first_output_ms": sum(blocking) / len(blocking),
+                                 "stream": mean_metrics(metrics), "astream": mean_metrics(asyncio.run(run_script_async()))}
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
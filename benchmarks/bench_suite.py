@@ -0,0 +1,246 @@
+"""
+End-to-end benchmark suite of the pipelines, fully offline: deterministic fake backends replace
+OpenAI, Pinecone, HuggingFace and DuckDuckGo (hash embeddings, fixed-latency fake LLMs and search,
+an in-memory vector store and a local sitemap HTTP server).
+
+Scenarios (each one runs in its own Python process, so its peak RSS is measured alone):
+n1 - n1_generate_similar_item: FAISS index sync of a word catalog, then similarity searches
+n2 - getGenResponse: persona prompt + LLM call
+n4 - csv_analyzer: aggregate questions (query plan fast path), then questions for the pandas agent
+n5 - script_generator: title, search and script
+n6 - ingest_website (crawl, split, embed, upsert), re-run on the unchanged site, then get_similar_docs
+
+Every phase reports its throughput (requests per second), p50/p99 latency and the peak RSS of the
+scenario, as JSON. Pass --baseline with the JSON of an earlier run to list the regressions
+beyond --tolerance (the exit status is 1 when there are any).
+
+Run from the 'benchmarks' folder:
+python bench_suite.py --scale 1 --requests 200 --concurrency 8 --output suite.json
+python bench_suite.py --scale 1 --requests 200 --concurrency 8 --baseline suite.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import FakeLLM, FakeSearch, HashEmbeddings, BackendVectorStore, SitemapServer, synthetic_words, latency_summary
+from bench_chunked_csv import peak_rss_mb
+from bench_dataset_registry import write_employees_csv
+
+SCENARIOS = ["n1", "n2", "n4", "n5", "n6"]
+
+# Metrics compared with the baseline, and whether higher values are better
+COMPARED = {"requests_per_second": True, "p50_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+
+class ScriptedAgentLLM(FakeLLM):
+     """
+     Fake LLM playing the pandas agent from the prompt alone (safe with concurrent requests):
+     a tool call first, the final answer once the scratchpad after the question holds an observation.
+     """
+
+     def _response(self, prompt):
+          self.calls += 1
+          if "Observation:" in prompt.rsplit("Question:", 1)[-1]:
+               return "Thought: I now know the final answer.\nFinal Answer: 6182.32"
+          return "Thought: I should compute it with pandas.\nAction: python_repl_ast\nAction Input: df['SALARY'].mean()"
+
+# Function to send requests with a number of them in flight, and measure throughput and latency
+def drive(request, items, concurrency):
+     def timed(item):
+          start = time.perf_counter()
+          request(item)
+          return time.perf_counter() - start
+
+     start = time.perf_counter()
+     with ThreadPoolExecutor(max_workers=concurrency) as executor:
+          latencies = list(executor.map(timed, items))
+     seconds = time.perf_counter() - start
+     return {"requests": len(items), "seconds": seconds, "requests_per_second": len(items) / seconds,
+             **latency_summary(latencies)}
+
+# Function to time a one-off phase (index build, ingest) of a number of items
+def timed_phase(fn, items):
+     start = time.perf_counter()
+     result = fn()
+     seconds = time.perf_counter() - start
+     return result, {"items": items, "seconds": seconds, "items_per_second": items / seconds}
+
+# n1: FAISS index of a word catalog, synced from the CSV, then single and batched similarity searches
+def run_n1(args, tmp):
+     from langchain_community.document_loaders import CSVLoader
+     from embedding_cache import CachedEmbeddings, EmbeddingCache
+     from faiss_index_store import FaissIndexStore
+     from batch_search import similarity_search_batch
+
+     rows = int(10000 * args.scale)
+     path = os.path.join(tmp, "the_data.csv")
+     words = synthetic_words(rows)
+     with open(path, "w") as f:
+          f.write("\n".join(words) + "\n")
+     data = CSVLoader(file_path=path, csv_args={'delimiter': ',', 'quotechar': '"', 'fieldnames': ['Words']}).load()
+
+     def store():
+          embeddings = CachedEmbeddings(HashEmbeddings(dimension=256, call_latency=args.embed_latency),
+                                        EmbeddingCache(os.path.join(tmp, "embedding_cache")))
+          return FaissIndexStore(embeddings, os.path.join(tmp, "faiss_index"))
+
+     phases = {}
+     db, phases["index_sync"] = timed_phase(lambda: store().sync(data), rows)
+     _, phases["restart_sync"] = timed_phase(lambda: store().sync(data), rows)  # Saved index, nothing to embed
+     queries = [words[i * 7 % rows] for i in range(args.requests)]
+     phases["similarity_search"] = drive(lambda query: db.similarity_search(query), queries, args.concurrency)
+     batches = [queries[i:i + 8] for i in range(0, len(queries), 8)]
+     phases["similarity_search_batch_of_8"] = drive(lambda batch: similarity_search_batch(db, batch, k=2, symmetric=True), batches,
+                                                    args.concurrency)
+     return {"rows": rows, "phases": phases}
+
+# n2: getGenResponse with a fake LLM, persona prompts of growing length
+def run_n2(args, tmp):
+     from n2_persona_prompt import getGenResponse, PERSONAS
+
+     llm = FakeLLM(latency=args.llm_latency)
+     queries = ["What are your dreams?"] + [" ".join(["word"] * n) + "?" for n in (20, 60, 120, 180)]
+     tasks = ["Write a project report", "Create a technical tweet", "Write a research summary"]
+     requests = [(queries[i % len(queries)], PERSONAS.names()[i % 3], tasks[i % len(tasks)]) for i in range(args.requests)]
+     with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # getGenResponse prints the prompt and the response
+          phase = drive(lambda request: getGenResponse(*request, llm_cache=None, llm=llm), requests, args.concurrency)
+     return {"phases": {"getGenResponse": phase}, "llm_calls": llm.calls}
+
+# n4: csv_analyzer on a synthetic employees CSV, fast path then agent questions
+def run_n4(args, tmp):
+     from n4_csv_insight_analyzer import csv_analyzer, DATASETS
+     from bench_csv_query import FAST_PATH_QUESTIONS, AGENT_QUESTIONS
+
+     rows = int(50000 * args.scale)
+     path = os.path.join(tmp, "employees.csv")
+     write_employees_csv(path, rows)
+     llm = ScriptedAgentLLM(latency=args.llm_latency)
+     phases = {}
+     _, phases["load"] = timed_phase(lambda: DATASETS.load(path), rows)
+     fast = [FAST_PATH_QUESTIONS[i % len(FAST_PATH_QUESTIONS)][0] for i in range(args.requests)]
+     agent = [AGENT_QUESTIONS[i % len(AGENT_QUESTIONS)] for i in range(max(1, args.requests // 10))]
+     with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # The agent is verbose
+          phases["fast_path"] = drive(lambda query: csv_analyzer(path, query, llm=llm), fast, args.concurrency)
+          phases["agent"] = drive(lambda query: csv_analyzer(path, query, llm=llm), agent, args.concurrency)
+     return {"rows": rows, "phases": phases, "llm_calls": llm.calls}
+
+# n5: script_generator with a fake LLM and a fake search
+def run_n5(args, tmp):
+     from n5_video_script_writer import script_generator
+
+     options = {"llm_cache": None, "llm": FakeLLM(latency=args.llm_latency), "search": FakeSearch(latency=args.search_latency)}
+     prompts = [f"How to improve productivity with AI tools, part {i}" for i in range(args.requests)]
+     phase = drive(lambda prompt: script_generator(prompt, "10", 0.7, None, **options), prompts, args.concurrency)
+     return {"phases": {"script_generator": phase}}
+
+# n6: ingest of a local website into the in-memory vector store and the BM25 index, then hybrid queries
+def run_n6(args, tmp):
+     from n6_web_wise_assistant import ingest_website, get_similar_docs
+     from embedding_cache import CachedEmbeddings, EmbeddingCache
+     from vector_upsert import VectorUpserter, InMemoryVectorBackend
+     from lexical_index import BM25Index
+
+     pages = int(200 * args.scale)
+     embeddings = CachedEmbeddings(HashEmbeddings(dimension=384, call_latency=args.embed_latency),
+                                   EmbeddingCache(os.path.join(tmp, "embedding_cache")))
+     backend = InMemoryVectorBackend(latency=args.upsert_latency)
+     lexical_index = BM25Index.load(os.path.join(tmp, "lexical_index"))
+     options = {"manifest_path": os.path.join(tmp, "manifest.json"), "lexical_index": lexical_index,
+                "validators_path": os.path.join(tmp, "validators.json")}
+     phases = {}
+     with SitemapServer(pages=pages, latency=args.http_latency) as server:
+          stats, phases["ingest"] = timed_phase(lambda: ingest_website(server.sitemap_url, embeddings,
+                                                                       VectorUpserter(backend), **options), pages)
+          _, phases["reingest_unchanged"] = timed_phase(lambda: ingest_website(server.sitemap_url, embeddings,
+                                                                               VectorUpserter(backend), **options), pages)
+     store = BackendVectorStore(backend, embeddings, latency=args.search_latency)
+     queries = [f"how does ai improve {word} hiring" for word in synthetic_words(args.requests)]
+     phases["get_similar_docs"] = drive(lambda query: get_similar_docs(store, query, 3, lexical_index=lexical_index),
+                                        queries, args.concurrency)
+     return {"pages": pages, "vectors": len(backend.vectors), "phases": phases}
+
+# Function to run one scenario (in the child process) and print its results
+def worker(args):
+     with tempfile.TemporaryDirectory() as tmp:
+          start = time.perf_counter()
+          results = globals()[f"run_{args.worker}"](args, tmp)
+     results.update({"seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()})
+     print(json.dumps(results))
+
+# Function to list the metrics worse than the baseline by more than the tolerance
+def regressions(results, baseline, tolerance):
+     found = []
+     for name, scenario in results["scenarios"].items():
+          before = baseline.get("scenarios", {}).get(name)
+          if "error" in scenario or not before or "error" in before:
+               continue
+          pairs = [("peak_rss_mb", scenario, before["peak_rss_mb"])]
+          pairs += [(f"{phase}.{metric}", values, before["phases"][phase][metric])
+                    for phase, values in scenario["phases"].items() if phase in before["phases"]
+                    for metric in COMPARED if metric in values and metric in before["phases"][phase]]
+          for key, values, old in pairs:
+               new = values[key.rsplit(".", 1)[-1]]
+               higher_is_better = COMPARED[key.rsplit(".", 1)[-1]]
+               change = (new - old) / old if old else 0.0
+               if (change < -tolerance) if higher_is_better else (change > tolerance):
+                    found.append({"scenario": name, "metric": key, "baseline": old, "current": new, "change_pct": change * 100})
+     return found
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+     parser.add_argument("--scale", type=float, default=1.0)  # Multiplies the data sizes (rows, pages)
+     parser.add_argument("--requests", type=int, default=200)  # Requests per phase
+     parser.add_argument("--concurrency", type=int, default=8)  # Requests in flight
+     parser.add_argument("--llm-latency", type=float, default=0.05)  # Seconds per fake LLM call
+     parser.add_argument("--embed-latency", type=float, default=0.005)  # Seconds per fake embedding call
+     parser.add_argument("--search-latency", type=float, default=0.02)  # Seconds per web search / vector query
+     parser.add_argument("--upsert-latency", type=float, default=0.01)  # Seconds per vector store request
+     parser.add_argument("--http-latency", type=float, default=0.002)  # Seconds per page of the local website
+     parser.add_argument("--output")  # JSON file of the results
+     parser.add_argument("--baseline")  # JSON file of an earlier run to compare with
+     parser.add_argument("--tolerance", type=float, default=0.2)  # Relative change reported as a regression
+     parser.add_argument("--worker", choices=SCENARIOS)  # Internal: run one scenario
+     args = parser.parse_args()
+
+     if args.worker:
+          worker(args)
+          return
+
+     options = ["--scale", str(args.scale), "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                "--llm-latency", str(args.llm_latency), "--embed-latency", str(args.embed_latency),
+                "--search-latency", str(args.search_latency), "--upsert-latency", str(args.upsert_latency),
+                "--http-latency", str(args.http_latency)]
+     results = {"python": platform.python_version(), "cpus": os.cpu_count(),
+                "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "worker")},
+                "scenarios": {}}
+     for name in args.scenarios:
+          process = subprocess.run([sys.executable, __file__, "--worker", name] + options, capture_output=True, text=True)
+          if process.returncode == 0:
+               results["scenarios"][name] = json.loads(process.stdout.strip().splitlines()[-1])
+          else:
+               # A scenario whose dependencies are missing is reported, the others still run
+               lines = process.stderr.strip().splitlines()
+               results["scenarios"][name] = {"error": lines[-1] if lines else f"exit status {process.returncode}"}
+
+     if args.baseline:
+          with open(args.baseline) as f:
+               results["regressions"] = regressions(results, json.load(f), args.tolerance)
+     if args.output:
+          with open(args.output, "w") as f:
+               json.dump(results, f, indent=2)
+     print(json.dumps(results, indent=2))
+     if results.get("regressions"):
+          sys.exit(1)
+
+
+if __name__ == "__main__":
+     main()
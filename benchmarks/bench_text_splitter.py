@@ -0,0 +1,97 @@
+"""
+Benchmark: FastRecursiveTextSplitter against RecursiveCharacterTextSplitter.
+A parity check runs first: both splitters must produce identical chunks (and metadata)
+on random texts with many chunk sizes and overlaps, and on the benchmark corpus itself.
+
+Run from the 'benchmarks' folder:
+python bench_text_splitter.py --documents 2000 --words 3000
+"""
+import json
+import time
+import random
+import argparse
+import logging
+
+from fakes import SRC_DIR  # noqa: F401 (makes the modules of the "src" folder importable)
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from fast_text_splitter import FastRecursiveTextSplitter
+
+# RecursiveCharacterTextSplitter logs a warning for every oversized chunk of the random parity texts
+logging.getLogger("langchain_text_splitters.base").setLevel(logging.ERROR)
+
+# Configurations used in the repo: n6 data_splitter (1000/200) and the quiz notebook split_docs (1000/20)
+CONFIGS = [{"chunk_size": 1000, "chunk_overlap": 200}, {"chunk_size": 1000, "chunk_overlap": 20}]
+
+# Function to build a page-like text with paragraphs, lines and occasional very long tokens
+def synthetic_text(rng, words):
+     vocabulary = ["the", "model", "recruitment", "economy", "data", "is", "growing", "and", "India's", "AI", "pages"]
+     parts = []
+     for _ in range(words):
+          roll = rng.random()
+          if roll < 0.01:
+               parts.append("\n\n")
+          elif roll < 0.04:
+               parts.append("\n")
+          elif roll < 0.0405:
+               parts.append("x" * rng.randint(500, 2500) + " ")  # Token longer than a chunk
+          else:
+               parts.append(rng.choice(vocabulary) + " ")
+     return "".join(parts)
+
+# Function to compare both splitters on random texts and on the corpus
+def parity_check(corpus, trials=2000, seed=0):
+     rng = random.Random(seed)
+     alphabet = ["a", "bb", "word", " ", "  ", "\n", "\n\n", "\n\n\n", "\t", "y" * 40]
+     for _ in range(trials):
+          text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+          chunk_size = rng.choice([3, 10, 25, 100, 1000])
+          kwargs = {"chunk_size": chunk_size, "chunk_overlap": rng.randint(0, chunk_size)}
+          expected = RecursiveCharacterTextSplitter(**kwargs).split_text(text)
+          assert FastRecursiveTextSplitter(**kwargs).split_text(text) == expected, (text, kwargs)
+     for kwargs in CONFIGS:
+          expected = RecursiveCharacterTextSplitter(**kwargs).split_documents(corpus)
+          assert FastRecursiveTextSplitter(**kwargs).split_documents(corpus) == expected, kwargs
+          # start_index is the exact offset of the chunk in its document
+          texts = {doc.metadata["source"]: doc.page_content for doc in corpus}
+          for chunk in FastRecursiveTextSplitter(add_start_index=True, **kwargs).split_documents(corpus):
+               start = chunk.metadata["start_index"]
+               assert texts[chunk.metadata["source"]][start:start + len(chunk.page_content)] == chunk.page_content
+     return True
+
+# Function to time a splitter over the corpus
+def timed(splitter, corpus, repeat=3):
+     best = float("inf")
+     for _ in range(repeat):
+          start = time.perf_counter()
+          splitter.split_documents(corpus)
+          best = min(best, time.perf_counter() - start)
+     return best
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--documents", type=int, default=2000)
+     parser.add_argument("--words", type=int, default=3000)  # Words per document
+     args = parser.parse_args()
+
+     rng = random.Random(1)
+     corpus = [Document(page_content=synthetic_text(rng, args.words), metadata={"source": f"page-{i}"})
+               for i in range(args.documents)]
+     megabytes = sum(len(doc.page_content) for doc in corpus) / 2**20
+
+     results = {"documents": args.documents, "megabytes": megabytes, "parity": parity_check(corpus[:50]), "configs": []}
+     for kwargs in CONFIGS:
+          recursive_seconds = timed(RecursiveCharacterTextSplitter(length_function=len, **kwargs), corpus)
+          fast_seconds = timed(FastRecursiveTextSplitter(length_function=len, **kwargs), corpus)
+          results["configs"].append({
+               **kwargs,
+               "recursive_mb_per_second": megabytes / recursive_seconds,
+               "fast_mb_per_second": megabytes / fast_seconds,
+               "speedup": recursive_seconds / fast_seconds,
+          })
+     print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+     main()
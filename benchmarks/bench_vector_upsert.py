@@ -0,0 +1,64 @@
+"""
+Benchmark: throughput and idempotency of VectorUpserter against the in-process vector store
+(simulated round trip latency and transient failures), compared with one sequential request per batch.
+
+Run from the 'benchmarks' folder:
+python bench_vector_upsert.py --chunks 20000 --latency 0.02 --failure-rate 0.02
+"""
+import json
+import time
+import argparse
+
+from langchain_core.documents import Document
+from fakes import HashEmbeddings, synthetic_words
+from vector_upsert import VectorUpserter, InMemoryVectorBackend, chunk_id
+
+
+def main():
+     parser = argparse.ArgumentParser()
+     parser.add_argument("--chunks", type=int, default=20000)
+     parser.add_argument("--latency", type=float, default=0.02)  # Round trip per request
+     parser.add_argument("--failure-rate", type=float, default=0.02)  # Share of transient request failures
+     parser.add_argument("--batch-size", type=int, default=100)
+     parser.add_argument("--concurrency", type=int, default=8)
+     args = parser.parse_args()
+
+     words = synthetic_words(args.chunks)
+     chunks = [Document(page_content=word, metadata={"source": f"https://example.com/page/{i // 10}"})
+               for i, word in enumerate(words)]
+     vectors = HashEmbeddings(dimension=64).embed_documents(words)
+
+     # Baseline: one request per batch, one after the other, random ids (no deduplication possible)
+     backend = InMemoryVectorBackend(latency=args.latency)
+     start = time.perf_counter()
+     for i in range(0, len(chunks), args.batch_size):
+          backend.upsert([(str(i + j), v, {}) for j, v in enumerate(vectors[i:i + args.batch_size])])
+     sequential_seconds = time.perf_counter() - start
+
+     # Upserter: concurrent batches with retries, then a re-run which should upload nothing
+     backend = InMemoryVectorBackend(latency=args.latency, failure_rate=args.failure_rate)
+     upserter = VectorUpserter(backend, batch_size=args.batch_size, max_concurrency=args.concurrency, backoff=0.01)
+     start = time.perf_counter()
+     upserter.upsert(chunks, vectors)
+     first_seconds = time.perf_counter() - start
+     first_stats = dict(upserter.stats)
+
+     # Fresh upserter (no known ids in memory): existence checks against the store skip every chunk
+     rerun = VectorUpserter(backend, batch_size=args.batch_size, max_concurrency=args.concurrency, backoff=0.01)
+     start = time.perf_counter()
+     rerun.upsert(chunks, vectors)
+     rerun_seconds = time.perf_counter() - start
+
+     print(json.dumps({
+          "chunks": args.chunks,
+          "sequential_vectors_per_second": args.chunks / sequential_seconds,
+          "upserter_vectors_per_second": args.chunks / first_seconds,
+          "first_run": first_stats,
+          "rerun": {**rerun.stats, "seconds": rerun_seconds},
+          "stored_vectors": len(backend.vectors),
+          "ids_deterministic": chunk_id(chunks[0].metadata["source"], words[0]) in backend.vectors,
+     }, indent=2))
+
+
+if __name__ == "__main__":
+     main()
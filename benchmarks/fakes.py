@@ -0,0 +1,355 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+# Make the modules in the 'src' folder importable from the benchmark scripts
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+if SRC_DIR not in sys.path:
+     sys.path.insert(0, SRC_DIR)
+
+
+class HashEmbeddings(Embeddings):
+     """
+     Deterministic, offline embeddings: every text is mapped to a unit vector seeded by its hash.
+     A fixed latency per call (and per text) stands in for the network round trip of a real model.
+     """
+
+     def __init__(self, dimension=384, call_latency=0.0, text_latency=0.0, model="hash-embeddings"):
+          self.dimension = dimension
+          self.call_latency = call_latency  # Seconds spent per embed call
+          self.text_latency = text_latency  # Seconds spent per embedded text
+          self.model = model
+          self.calls = 0
+          self.texts = 0
+
+     def _vector(self, text):
+          seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+          vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+          return (vector / np.linalg.norm(vector)).tolist()
+
+     def embed_documents(self, texts):
+          self.calls += 1
+          self.texts += len(texts)
+          time.sleep(self.call_latency + self.text_latency * len(texts))
+          return [self._vector(text) for text in texts]
+
+     def embed_query(self, text):
+          return self.embed_documents([text])[0]
+
+
+class WordEmbeddings(Embeddings):
+     """
+     Deterministic, offline bag-of-words embeddings: texts sharing most of their words get
+     close vectors, so near-duplicate prompts can be told apart from unrelated ones.
+     """
+
+     def __init__(self, dimension=512):
+          self.dimension = dimension
+          self.calls = 0
+
+     def embed_documents(self, texts):
+          self.calls += 1
+          vectors = []
+          for text in texts:
+               vector = np.zeros(self.dimension, dtype=np.float32)
+               for word in text.lower().split():
+                    vector[int(hashlib.md5(word.strip(".,?!").encode("utf-8")).hexdigest(), 16) % self.dimension] += 1.0
+               vectors.append((vector / (np.linalg.norm(vector) or 1.0)).tolist())
+          return vectors
+
+     def embed_query(self, text):
+          return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+     """
+     Offline stand-in for OpenAI / ChatOpenAI: answers with a text derived from the prompt hash
+     after a fixed latency, and counts its calls. Model name and temperature are part of its
+     parameters, so they end up in the LLM string used by LangChain caches.
+     Streaming yields the answer word by word, token_latency seconds apart.
+     """
+
+     model_name: str = "fake-llm"
+     temperature: float = 0.0
+     latency: float = 0.0  # Seconds spent per call (before the first token when streaming)
+     token_latency: float = 0.0  # Seconds between two streamed tokens
+     response_words: int = 0  # Extra words appended to the answer, to get long streams
+     calls: int = 0
+
+     @property
+     def _llm_type(self):
+          return "fake"
+
+     @property
+     def _identifying_params(self):
+          return {"model_name": self.model_name, "temperature": self.temperature}
+
+     def _response(self, prompt):
+          self.calls += 1
+          digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+          return " ".join(["Response", digest[:16]] + [f"word{digest[i % 64]}{i}" for i in range(self.response_words)])
+
+     # The answer split into tokens: words with their trailing space
+     def _tokens(self, prompt):
+          words = self._response(prompt).split(" ")
+          return [word + " " for word in words[:-1]] + words[-1:]
+
+     def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+          tokens = self._tokens(prompt)
+          time.sleep(self.latency + self.token_latency * (len(tokens) - 1))
+          return "".join(tokens)
+
+     async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+          tokens = self._tokens(prompt)
+          await asyncio.sleep(self.latency + self.token_latency * (len(tokens) - 1))
+          return "".join(tokens)
+
+     def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+          time.sleep(self.latency)
+          for i, token in enumerate(self._tokens(prompt)):
+               if i:
+                    time.sleep(self.token_latency)
+               yield GenerationChunk(text=token)
+
+     async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+          await asyncio.sleep(self.latency)
+          for i, token in enumerate(self._tokens(prompt)):
+               if i:
+                    await asyncio.sleep(self.token_latency)
+               yield GenerationChunk(text=token)
+
+
+class FakeSearch:
+     """
+     Offline stand-in for DuckDuckGoSearchRun: returns a text derived from the query after a fixed latency.
+     """
+
+     def __init__(self, latency=0.0):
+          self.latency = latency
+          self.calls = 0
+
+     def _result(self, query):
+          self.calls += 1
+          return f"Search results about {query}: " + hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+     def invoke(self, query):
+          time.sleep(self.latency)
+          return self._result(query)
+
+     run = invoke
+
+     async def ainvoke(self, query):
+          await asyncio.sleep(self.latency)
+          return self._result(query)
+
+
+
+class BackendVectorStore:
+     """
+     Offline stand-in for Pinecone.from_existing_index: similarity search over the vectors of an
+     InMemoryVectorBackend (filled by a VectorUpserter), chunk text under the "text" metadata key.
+     Cosine scores are computed with numpy on a matrix rebuilt when the backend changes.
+     """
+
+     def __init__(self, backend, embeddings, latency=0.0, text_key="text"):
+          self.backend = backend
+          self.embeddings = embeddings
+          self.latency = latency  # Seconds per query, like the round trip to a remote index
+          self.text_key = text_key
+          self._matrix = None
+          self._items = []
+          self._lock = threading.Lock()
+
+     # Normalized matrix of the stored vectors, rebuilt after upserts or deletes
+     def _snapshot(self):
+          with self._lock:
+               if self._matrix is None or len(self._items) != len(self.backend.vectors):
+                    self._items = list(self.backend.vectors.items())
+                    matrix = np.array([values for _, (values, _) in self._items], dtype=np.float32).reshape(len(self._items), -1)
+                    self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+               return self._matrix, self._items
+
+     def similarity_search_with_score(self, query, k=4):
+          matrix, items = self._snapshot()
+          time.sleep(self.latency)
+          vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+          scores = matrix @ (vector / max(np.linalg.norm(vector), 1e-12)) if len(items) else np.empty(0)
+          results = []
+          for i in np.argsort(-scores)[:k]:
+               metadata = dict(items[i][1][1])
+               text = metadata.pop(self.text_key, "")
+               results.append((Document(page_content=text, metadata=metadata), float(scores[i])))
+          return results
+
+     def similarity_search(self, query, k=4):
+          return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+# Function to generate a synthetic word catalog like data/the_data.csv
+def synthetic_words(count, seed=0):
+     """
+     Generates pseudo-random product-like words.
+
+     Args:
+     count (int): Number of words to generate.
+     seed (int): Seed of the random generator.
+
+     Returns:
+     List[str]: The generated words.
+     """
+     rng = np.random.default_rng(seed)
+     syllables = ["mo", "bi", "le", "wat", "ch", "head", "pho", "ne", "char", "ger", "lap", "top", "ca", "ble", "spea", "ker"]
+     return ["".join(rng.choice(syllables, size=rng.integers(2, 5))) + str(i) for i in range(count)]
+
+
+# Function to summarize a list of latencies
+def latency_summary(latencies):
+     """
+     Computes the p50 and p99 of a list of latencies.
+
+     Args:
+     latencies (List[float]): Latencies in seconds.
+
+     Returns:
+     dict: p50 and p99 latency in milliseconds.
+     """
+     values = np.asarray(latencies) * 1000
+     return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+
+# Function to write a minimal PDF with one page of text per item (Helvetica, one text line per line)
+def write_text_pdf(path, pages):
+     """
+     Writes a PDF whose pages hold the given texts, readable by pypdf.
+
+     Args:
+     path (str): The path of the PDF file.
+     pages (List[str]): The text of every page.
+     """
+     def escape(line):
+          return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+     kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+     objects = {1: "<< /Type /Catalog /Pages 2 0 R >>",
+                2: f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>",
+                3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+     for i, text in enumerate(pages):
+          stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({escape(line)}) Tj T*" for line in text.split("\n")) + " ET"
+          objects[4 + 2 * i] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+          objects[5 + 2 * i] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+     out = bytearray(b"%PDF-1.4\n")
+     offsets = {}
+     for number in sorted(objects):
+          offsets[number] = len(out)
+          out += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1")
+     xref = len(out)
+     out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+     out += "".join(f"{offsets[number]:010d} 00000 n \n" for number in sorted(objects)).encode("latin-1")
+     out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+     with open(path, "wb") as f:
+          f.write(out)
+
+
+class SitemapServer:
+     """
+     Local HTTP server serving a synthetic website: /sitemap.xml lists `pages` pages at /page/<i>.
+     Pages carry an ETag and a Last-Modified header and answer conditional GETs with 304.
+     A fixed latency per response and a share of transient 503 failures can be simulated.
+
+     Usage:
+     with SitemapServer(pages=5000, latency=0.01) as server:
+          crawl(server.sitemap_url)
+     """
+
+     def __init__(self, pages=1000, latency=0.0, failure_rate=0.0, words_per_page=300, seed=0):
+          self.pages = pages
+          self.latency = latency
+          self.failure_rate = failure_rate
+          self.words_per_page = words_per_page
+          self.version = {}  # Page number -> content version, bump it to simulate an edited page
+          self.removed = set()  # Page numbers no longer listed in the sitemap
+          self.requests = 0
+          self._rng = np.random.default_rng(seed)
+          self._lock = threading.Lock()
+          self._server = None
+
+     @property
+     def base_url(self):
+          return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+     @property
+     def sitemap_url(self):
+          return self.base_url + "/sitemap.xml"
+
+     def page_html(self, i):
+          version = self.version.get(i, 0)
+          rng = np.random.default_rng(i * 1000 + version)
+          words = " ".join(rng.choice(["ai", "recruitment", "jobs", "hiring", "talent", "model", "data", "skills",
+                                       "interview", "candidate", "search", "ranking"], size=self.words_per_page))
+          return f"<html><head><title>Page {i}</title></head><body><h1>Page {i} v{version}</h1><p>{words}</p></body></html>"
+
+     def page_lastmod(self, i):
+          return f"2024-01-{1 + self.version.get(i, 0) % 28:02d}"
+
+     def sitemap_xml(self):
+          urls = "".join(f"<url><loc>{self.base_url}/page/{i}</loc><lastmod>{self.page_lastmod(i)}</lastmod></url>"
+                         for i in range(self.pages) if i not in self.removed)
+          return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+     def __enter__(self):
+          site = self
+
+          class Handler(BaseHTTPRequestHandler):
+               protocol_version = "HTTP/1.1"
+
+               def log_message(self, *args):
+                    pass
+
+               def _send(self, status, body=b"", headers=None):
+                    self.send_response(status)
+                    for key, value in (headers or {}).items():
+                         self.send_header(key, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+               def do_GET(self):
+                    with site._lock:
+                         site.requests += 1
+                         fail = site._rng.random() < site.failure_rate
+                    time.sleep(site.latency)
+                    if self.path == "/sitemap.xml":
+                         return self._send(200, site.sitemap_xml().encode(), {"Content-Type": "application/xml"})
+                    if not self.path.startswith("/page/"):
+                         return self._send(404)
+                    i = int(self.path.rsplit("/", 1)[-1])
+                    if i >= site.pages or i in site.removed:
+                         return self._send(404)
+                    if fail:
+                         return self._send(503, headers={"Retry-After": "0"})
+                    body = site.page_html(i).encode()
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    last_modified = formatdate(1704067200 + 86400 * site.version.get(i, 0), usegmt=True)
+                    if self.headers.get("If-None-Match") == etag:
+                         return self._send(304, headers={"ETag": etag})
+                    self._send(200, body, {"Content-Type": "text/html", "ETag": etag, "Last-Modified": last_modified})
+
+          self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+          self._server.daemon_threads = True
+          threading.Thread(target=self._server.serve_forever, daemon=True).start()
+          return self
+
+     def __exit__(self, *exc):
+          self._server.shutdown()
+          self._server.server_close()
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Function to run many similarity searches with batched embedding calls (and one FAISS search)
+def similarity_search_batch(db, queries, k=4, symmetric=False):
+     """
+     Searches the vector store for several queries at once.
+     The queries are embedded with embed_query, like db.similarity_search does, on a small
+     thread pool. Models that embed queries and documents the same way (OpenAI, MiniLM...)
+     can set symmetric to embed all queries in a single batched embed_documents call instead;
+     leave it off for models with a query instruction or prefix (E5, BGE, Cohere...).
+     For a FAISS store the stacked query matrix is searched in one call, other stores
+     (e.g. Pinecone) are searched per query vector on the thread pool.
+
+     Args:
+     db (VectorStore): The FAISS or Pinecone vector store to search.
+     queries (List[str]): The user queries.
+     k (int): Number of top matches to return per query.
+     symmetric (bool): embed_query(text) equals embed_documents([text])[0] for this model.
+
+     Returns:
+     List[List[Tuple[Document, float]]]: For every query, its top matches with their scores.
+     """
+     if not queries:
+          return []
+
+     # Embed all queries in one call when the model allows it, otherwise one embed_query call per query
+     if symmetric:
+          vectors = db.embeddings.embed_documents(list(queries))
+     else:
+          with ThreadPoolExecutor(max_workers=min(8, len(queries))) as executor:
+               vectors = list(executor.map(db.embeddings.embed_query, queries))
+
+     # Vectorized path: a single FAISS search over the stacked query matrix
+     if hasattr(db, "index_to_docstore_id"):
+          return _faiss_search_batch(db, np.asarray(vectors, dtype=np.float32), k)
+
+     # Generic path: the store has no multi-query search, reuse the batched vectors per query
+     with ThreadPoolExecutor(max_workers=min(8, len(vectors))) as executor:
+          return list(executor.map(lambda vector: db.similarity_search_by_vector_with_score(vector, k=k), vectors))
+
+# Search a FAISS vector store with a matrix of query vectors
+def _faiss_search_batch(db, matrix, k):
+     import faiss
+
+     if db._normalize_L2:
+          faiss.normalize_L2(matrix)
+     scores, indices = db.index.search(matrix, k)
+
+     results = []
+     for row_scores, row_indices in zip(scores, indices):
+          matches = []
+          for score, i in zip(row_scores, row_indices):
+               if i == -1:  # Fewer than k vectors in the index
+                    continue
+               doc = db.docstore.search(db.index_to_docstore_id[i])
+               matches.append((doc, float(score)))
+          results.append(matches)
+     return results
@@ -0,0 +1,497 @@
+import io
+import os
+import math
+import time
+from functools import reduce
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset_registry import NA_VALUES, DATE_FORMAT, is_text, is_date_name, parse_dates
+from query_plan import QueryPlan, QueryPlanError, parse_query, format_answer
+
+# Rows per chunk: about 100 MB of DataFrame for a file shaped like data/employees.csv
+DEFAULT_CHUNKSIZE = 500_000
+
+# Maximum number of distinct values counted per column by the profile
+MAX_DISTINCT = 1000
+
+
+class ChunkDtypeError(ValueError):
+     """
+     A value of the file does not fit the dtypes inferred from its first rows
+     (the dtypes are checked against the whole file before this is raised: retry the pass).
+     """
+
+
+class _ByteRange(io.RawIOBase):
+     """
+     Read-only view of the bytes [start, end) of a file.
+     """
+
+     def __init__(self, path, start, end):
+          self._file = open(path, "rb")
+          self._file.seek(start)
+          self._remaining = end - start
+
+     def readable(self):
+          return True
+
+     def readinto(self, buffer):
+          size = min(len(buffer), self._remaining)
+          if size <= 0:
+               return 0
+          n = self._file.readinto(memoryview(buffer)[:size])
+          self._remaining -= n
+          return n
+
+     def close(self):
+          self._file.close()
+          super().close()
+
+
+class ChunkedCsv:
+     """
+     A CSV file read chunk by chunk with explicit dtypes, so that files larger than the memory
+     can be aggregated and profiled: only one chunk (per process) is in memory at a time.
+     The dtypes are inferred from the first rows, unless given. A later value that does not fit
+     them raises ChunkDtypeError once the columns have been checked against the whole file.
+     """
+
+     def __init__(self, path, chunksize=DEFAULT_CHUNKSIZE, dtypes=None, date_columns=None, date_format=DATE_FORMAT,
+                  sample_rows=10_000):
+          """
+          Args:
+          path (str): The path to the CSV file.
+          chunksize (int): Rows per chunk.
+          dtypes (dict): Column -> dtype of pd.read_csv (default: inferred from the first sample_rows rows).
+          date_columns (List[str]): Columns parsed as dates (default: the text columns whose name ends with "DATE").
+          date_format (str): strptime format of the date columns.
+          sample_rows (int): Rows read to infer the dtypes.
+          """
+          self.path = path
+          self.chunksize = chunksize
+          self.date_format = date_format
+          sample = pd.read_csv(path, nrows=sample_rows, na_values=NA_VALUES)
+          self.names = list(sample.columns)
+          if date_columns is None:
+               date_columns = [c for c in self.names if is_date_name(c) and is_text(sample[c]) and self._parses_as_dates(sample[c])]
+          self.date_columns = list(date_columns)
+          self.dtypes = {column: self._dtype(sample[column]) for column in self.names}
+          self.dtypes.update({column: "str" for column in self.date_columns})  # Parsed after reading
+          self.dtypes.update(dtypes or {})
+
+     def _parses_as_dates(self, values):
+          try:
+               parse_dates(values.dropna(), self.date_format)
+               return True
+          except (ValueError, TypeError):
+               return False
+
+     # Explicit dtype of a column, from its values in the sample
+     def _dtype(self, values):
+          if values.isna().all():
+               return "category"  # Nothing to infer from, later values may be anything
+          if pd.api.types.is_bool_dtype(values):
+               return "boolean"
+          if pd.api.types.is_numeric_dtype(values):
+               return "float64"  # Also for whole numbers: a later 12.5 or missing value still fits
+          return "category"  # Text: every distinct value is stored once per chunk
+
+     # Check whether the text values of a column fit its dtype
+     def _fits(self, column, values):
+          if column in self.date_columns:
+               return self._parses_as_dates(values)
+          if self.dtypes[column] == "boolean":
+               return values.str.lower().isin(["true", "false"]).all()
+          return pd.to_numeric(values, errors="coerce").notna().all()
+
+     def reinfer_dtypes(self):
+          """
+          Reads the typed (numeric, boolean and date) columns of the whole file as text, and turns
+          the ones holding a value their dtype can not parse into text columns.
+
+          Returns:
+          List[str]: The columns that became text.
+          """
+          columns = [c for c in self.names if c in self.date_columns or self.dtypes[c] not in ("category", "str")]
+          failing = []
+          if columns:
+               with pd.read_csv(self.path, usecols=columns, dtype=str, na_values=NA_VALUES, chunksize=self.chunksize) as reader:
+                    for chunk in reader:
+                         failing += [c for c in columns if c not in failing and not self._fits(c, chunk[c].dropna())]
+          for column in failing:
+               self.dtypes[column] = "category"
+               if column in self.date_columns:
+                    self.date_columns.remove(column)
+          return failing
+
+     # Parse the date columns of a chunk
+     def _typed(self, chunk):
+          for column in self.date_columns:
+               if column in chunk.columns:
+                    chunk[column] = parse_dates(chunk[column], self.date_format)
+          return chunk
+
+     def sample(self, rows=100):
+          """
+          Returns:
+          pd.DataFrame: The first rows of the file, with the dtypes of the chunks.
+          """
+          try:
+               return self._typed(pd.read_csv(self.path, nrows=rows, dtype=self.dtypes, na_values=NA_VALUES))
+          except (ValueError, TypeError) as error:
+               # More rows than were used to infer the dtypes, and one of them does not fit
+               self.reinfer_dtypes()
+               raise ChunkDtypeError(f"{self.path}: a value does not fit the dtypes inferred from the first rows") from error
+
+     def chunks(self, columns=None, start=None, end=None):
+          """
+          Reads the file chunk by chunk.
+
+          Args:
+          columns (List[str]): Columns to read (default: all of them).
+          start (int): First byte to read, at the start of a line (default: the first row).
+          end (int): Byte after the last row to read (with start).
+
+          Yields:
+          pd.DataFrame: The chunks, with explicit dtypes.
+          """
+          columns = columns or self.names
+          options = {"usecols": columns, "dtype": {c: self.dtypes[c] for c in columns}, "na_values": NA_VALUES,
+                     "chunksize": self.chunksize}
+          if start is None:
+               source = self.path
+          else:
+               source = io.BufferedReader(_ByteRange(self.path, start, end))
+               options.update(header=None, names=self.names)
+          try:
+               with pd.read_csv(source, **options) as reader:
+                    for chunk in reader:
+                         yield self._typed(chunk)
+          except (ValueError, TypeError) as error:
+               raise ChunkDtypeError(f"{self.path}: a value does not fit the dtypes inferred from the first rows") from error
+          finally:
+               if start is not None:
+                    source.close()  # pandas does not close the file objects it did not open
+
+     def byte_ranges(self, parts):
+          """
+          Splits the rows of the file into byte ranges starting at a line boundary
+          (rows must not contain line breaks inside quoted values).
+
+          Args:
+          parts (int): Number of ranges wanted.
+
+          Returns:
+          List[tuple]: (start, end) byte ranges covering every row once.
+          """
+          size = os.path.getsize(self.path)
+          with open(self.path, "rb") as f:
+               f.readline()  # Header
+               boundaries = [f.tell()]
+               for i in range(1, parts):
+                    f.seek(max(boundaries[-1], boundaries[0] + (size - boundaries[0]) * i // parts))
+                    f.readline()
+                    boundaries.append(f.tell())
+          boundaries.append(size)
+          return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+     def map_reduce(self, fn, merge, *args, processes=None):
+          """
+          Runs fn(self, byte_range, *args) over the whole file and merges the results,
+          in worker processes when asked (each one reads its own byte ranges of the file).
+
+          Args:
+          fn (Callable): Function of a byte range (None = the whole file), defined at module level.
+          merge (Callable): Function merging two results of fn.
+          *args: Extra arguments of fn.
+          processes (int): Worker processes (None = in this process).
+
+          Returns:
+          Any: The merged result.
+          """
+          try:
+               if not processes or processes < 2:
+                    return fn(self, None, *args)
+               with ProcessPoolExecutor(max_workers=processes) as executor:
+                    # More ranges than processes, so that the processes finish together
+                    ranges = self.byte_ranges(processes * 4)
+                    results = executor.map(fn, repeat(self, len(ranges)), ranges, *(repeat(arg, len(ranges)) for arg in args))
+                    return reduce(merge, results)
+          except ChunkDtypeError:
+               self.reinfer_dtypes()  # The caller can retry with dtypes that fit the whole file
+               raise
+
+
+class QuantileSketch:
+     """
+     Mergeable quantile estimate with a bounded relative error (the DDSketch idea): values are counted
+     in logarithmic buckets, so memory grows with the range of the values, not with their number.
+     """
+
+     def __init__(self, relative_accuracy=0.01):
+          self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+          self.log_gamma = math.log(self.gamma)
+          self.positive = {}  # bucket -> count
+          self.negative = {}  # bucket of -value -> count
+          self.zeros = 0
+          self.count = 0
+
+     def add(self, values):
+          values = pd.Series(values).to_numpy(dtype=float, na_value=np.nan)
+          values = values[~np.isnan(values)]
+          self.count += len(values)
+          self.zeros += int((values == 0).sum())
+          for store, part in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+               buckets, counts = np.unique(np.ceil(np.log(part) / self.log_gamma).astype(np.int64), return_counts=True)
+               for bucket, count in zip(buckets.tolist(), counts.tolist()):
+                    store[bucket] = store.get(bucket, 0) + count
+
+     def merge(self, other):
+          for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+               for bucket, count in other_store.items():
+                    store[bucket] = store.get(bucket, 0) + count
+          self.zeros += other.zeros
+          self.count += other.count
+          return self
+
+     # Representative value of a bucket (within the relative accuracy of all its values)
+     def _value(self, bucket):
+          return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+     # Estimated value of the index-th smallest value
+     def _value_at(self, index):
+          ordered = [(-self._value(b), c) for b, c in sorted(self.negative.items(), reverse=True)]
+          ordered += [(0.0, self.zeros)] if self.zeros else []
+          ordered += [(self._value(b), c) for b, c in sorted(self.positive.items())]
+          seen = 0
+          for value, count in ordered:
+               seen += count
+               if seen > index:
+                    return value
+          return ordered[-1][0]
+
+     def quantile(self, q):
+          """
+          Returns:
+          float: The estimated q-quantile, interpolated like pandas (NaN without values).
+          """
+          if self.count == 0:
+               return np.nan
+          rank = q * (self.count - 1)
+          lower, upper = self._value_at(math.floor(rank)), self._value_at(math.ceil(rank))
+          return lower + (upper - lower) * (rank - math.floor(rank))
+
+# Function to turn a categorical group index into plain values (categories differ between chunks)
+def plain_index(series):
+     if isinstance(series.index, pd.CategoricalIndex):
+          series.index = series.index.astype(object)
+     return series
+
+# Function to compute the mergeable partial results of a query plan on one chunk
+def partial_aggregate(chunk, plan, relative_accuracy=0.01):
+     """
+     Args:
+     chunk (pd.DataFrame): The chunk.
+     plan (QueryPlan): The validated plan.
+     relative_accuracy (float): Relative error of the quantile sketches.
+
+     Returns:
+     dict: Partial results per group ("count", "sum", "min", "max" Series, "sketches" dict).
+     """
+     rows = chunk[plan.mask(chunk)] if plan.filters else chunk
+     # Without group_by, all the rows are one group with key 0
+     keys = rows[plan.group_by] if plan.group_by is not None else pd.Series(0, index=rows.index)
+     groups = rows.groupby(keys, observed=True)
+     partial = {}
+     if plan.aggregate in ("count", "mean"):
+          partial["count"] = plain_index(groups.size() if plan.column is None else groups[plan.column].count())
+     if plan.aggregate in ("sum", "mean"):
+          partial["sum"] = plain_index(groups[plan.column].sum())
+     if plan.aggregate in ("min", "max"):
+          partial[plan.aggregate] = plain_index(groups[plan.column].agg(plan.aggregate))
+     if plan.aggregate == "median":
+          partial["sketches"] = {}
+          for key, values in groups[plan.column]:
+               partial["sketches"][key] = QuantileSketch(relative_accuracy)
+               partial["sketches"][key].add(values)
+     return partial
+
+# Function to merge two partial results of the same plan
+def merge_partials(a, b):
+     merged = {}
+     for name in a:
+          if name in ("count", "sum"):
+               merged[name] = a[name].add(b[name], fill_value=0)
+          elif name in ("min", "max"):
+               merged[name] = pd.concat([a[name], b[name]]).groupby(level=0).agg(name)
+          else:
+               merged[name] = a[name]
+               for key, sketch in b[name].items():
+                    merged[name][key] = merged[name][key].merge(sketch) if key in merged[name] else sketch
+     return merged
+
+# Function to turn the merged partial results into the result of the plan
+def finalize(plan, partial):
+     if plan.aggregate == "count":
+          result = partial["count"].astype("int64")
+     elif plan.aggregate == "mean":
+          result = (partial["sum"] / partial["count"]).astype("float64")
+     elif plan.aggregate == "median":
+          result = pd.Series({key: sketch.quantile(0.5) for key, sketch in partial["sketches"].items()}, dtype=float)
+     else:
+          result = partial[plan.aggregate]
+     if plan.group_by is None:
+          if len(result):
+               value = result.iloc[0]
+               return int(value) if plan.aggregate == "count" else value
+          return 0 if plan.aggregate in ("count", "sum") else np.nan
+     result = result.sort_index()
+     # Numbers are read as float64, whole-number group keys are shown as integers like in the loaded DataFrame
+     if pd.api.types.is_float_dtype(result.index) and (result.index.dropna() % 1 == 0).all():
+          result.index = result.index.astype("Int64")
+     result.index.name = plan.group_by
+     return result
+
+# Aggregate the chunks of one byte range of the file (runs in the worker processes)
+def _aggregate_range(csv, byte_range, plan):
+     columns = plan.columns() or csv.names[:1]
+     partials = [partial_aggregate(chunk, plan) for chunk in csv.chunks(columns, *(byte_range or ()))]
+     return reduce(merge_partials, partials) if partials else partial_aggregate(csv.sample(0)[columns], plan)
+
+# Function to run a query plan over a large CSV, chunk by chunk
+def aggregate_csv(csv, plan, processes=None):
+     """
+     Runs a validated query plan in one pass over the file, with bounded memory:
+     counts, sums, means, minimums and maximums are exact, medians are approximate.
+
+     Args:
+     csv (ChunkedCsv): The file.
+     plan (QueryPlan): The validated plan.
+     processes (int): Worker processes sharing the chunks (None = in this process).
+
+     Returns:
+     scalar or pd.Series: The aggregate, per group when group_by is set.
+
+     Raises:
+     QueryPlanError: When the plan cannot run chunk by chunk.
+     """
+     if plan.aggregate == "median" and pd.api.types.is_datetime64_any_dtype(csv.sample(0)[plan.column]):
+          raise QueryPlanError("The median of dates is not supported on chunks")
+     return finalize(plan, csv.map_reduce(_aggregate_range, merge_partials, plan, processes=processes))
+
+# Function to answer a question on a large CSV without loading it, or tell the caller to use the agent
+def answer_query_chunked(csv, query, processes=None):
+     """
+     Chunked version of query_plan.answer_query.
+
+     Args:
+     csv (ChunkedCsv): The file.
+     query (str): The question in natural language.
+     processes (int): Worker processes sharing the chunks (None = in this process).
+
+     Returns:
+     dict: {"input", "output", "plan", "result", "seconds"}, or None when the question needs the agent.
+     """
+     start = time.perf_counter()
+     parsed = parse_query(query, csv.names)
+     if parsed is None:
+          return None
+     for attempt in range(2):
+          try:
+               # Column types and the spelling of text values come from the first rows
+               plan = parsed.validate(csv.sample(10_000))
+               result = aggregate_csv(csv, plan, processes)
+               break
+          except ChunkDtypeError:
+               if attempt:
+                    return None  # Not a dtype problem after all (e.g. a malformed row): leave it to the agent
+          except QueryPlanError:
+               return None
+     rows = None
+     if not isinstance(result, pd.Series) and pd.isna(result):
+          # Tell "no matching rows" from "only null values" (one more pass, only for this rare answer)
+          rows = aggregate_csv(csv, QueryPlan("count", None, None, plan.filters), processes)
+     return {"input": query, "output": format_answer(plan, result, approximate=plan.aggregate == "median", rows=rows),
+             "plan": plan.as_dict(), "result": result, "seconds": time.perf_counter() - start}
+
+# Function to profile the columns of one chunk (mergeable partial result)
+def profile_chunk(chunk):
+     profile = {}
+     for column in chunk.columns:
+          values = chunk[column].dropna()
+          ordered = pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values)
+          counts = values.value_counts()
+          counts = counts[counts > 0]  # Categories of the chunk without any row
+          profile[column] = {
+               "rows": len(chunk),
+               "non_null": len(values),
+               "min": values.min() if ordered and len(values) else None,
+               "max": values.max() if ordered and len(values) else None,
+               "sum": float(values.sum()) if pd.api.types.is_numeric_dtype(values) else None,
+               "counts": plain_index(counts) if len(counts) <= MAX_DISTINCT else None,  # None = too many distinct values
+          }
+     return profile
+
+# Function to merge the profiles of two parts of a file
+def merge_profiles(a, b):
+     merged = {}
+     for column, x in a.items():
+          y = b[column]
+          extremes = [(x[name], y[name]) for name in ("min", "max")]
+          counts = None
+          if x["counts"] is not None and y["counts"] is not None:
+               counts = x["counts"].add(y["counts"], fill_value=0)
+               counts = counts if len(counts) <= MAX_DISTINCT else None
+          merged[column] = {
+               "rows": x["rows"] + y["rows"],
+               "non_null": x["non_null"] + y["non_null"],
+               "min": min((v for v in extremes[0] if v is not None), default=None),
+               "max": max((v for v in extremes[1] if v is not None), default=None),
+               "sum": None if x["sum"] is None else x["sum"] + y["sum"],
+               "counts": counts,
+          }
+     return merged
+
+# Profile the chunks of one byte range of the file (runs in the worker processes)
+def _profile_range(csv, byte_range):
+     profiles = [profile_chunk(chunk) for chunk in csv.chunks(None, *(byte_range or ()))]
+     return reduce(merge_profiles, profiles) if profiles else profile_chunk(csv.sample(0))
+
+# Function to describe every column of a large CSV in one pass
+def profile_csv(csv, processes=None, top=5):
+     """
+     Builds a small description of the whole file for the agent, instead of the full DataFrame.
+
+     Args:
+     csv (ChunkedCsv): The file.
+     processes (int): Worker processes sharing the chunks (None = in this process).
+     top (int): Number of most frequent values listed per column.
+
+     Returns:
+     pd.DataFrame: One row per column: dtype, rows, missing, distinct, min, max, mean, top_values.
+     """
+     try:
+          profile = csv.map_reduce(_profile_range, merge_profiles, processes=processes)
+     except ChunkDtypeError:
+          profile = csv.map_reduce(_profile_range, merge_profiles, processes=processes)  # With the re-inferred dtypes
+     rows = []
+     for column in csv.names:
+          info = profile[column]
+          counts = info["counts"]
+          rows.append({
+               "column": column,
+               "dtype": "datetime" if column in csv.date_columns else csv.dtypes[column],
+               "rows": info["rows"],
+               "missing": info["rows"] - info["non_null"],
+               "distinct": str(len(counts)) if counts is not None else f"more than {MAX_DISTINCT}",
+               "min": info["min"],
+               "max": info["max"],
+               "mean": info["sum"] / info["non_null"] if info["sum"] is not None and info["non_null"] else None,
+               "top_values": ", ".join(f"{value} ({int(count)})" for value, count in counts.nlargest(top).items())
+                             if counts is not None else "",
+          })
+     return pd.DataFrame(rows)
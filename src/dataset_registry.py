@@ -0,0 +1,169 @@
+import os
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Placeholder used for missing values in the exports (e.g. COMMISSION_PCT " - " in employees.csv);
+# a bare "-" is left alone, it can be a real text value
+NA_VALUES = [" - "]
+
+# Date format of the exports (e.g. HIRE_DATE "21-Jun-07")
+DATE_FORMAT = "%d-%b-%y"
+
+# Function to check for a text column (object dtype, or the string dtype of recent pandas versions)
+def is_text(values):
+     return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+# Function to parse a text column of dates (exports repeat the same dates many times: every distinct value is parsed once)
+def parse_dates(values, date_format=DATE_FORMAT):
+     codes, uniques = pd.factorize(values)
+     parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format=date_format))
+     return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index, name=values.name)
+
+# Function to check for a date column by its name (e.g. HIRE_DATE)
+def is_date_name(column):
+     return str(column).upper().endswith("DATE")
+
+# Function to check that pandas can write Parquet files (pyarrow or fastparquet installed)
+def has_parquet_engine():
+     return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
+
+# Function to turn the columns of a freshly parsed CSV into compact, typed columns
+def optimize_dtypes(df, date_format=DATE_FORMAT, date_columns=None, category_threshold=0.5):
+     """
+     Parses date columns, converts repetitive text columns to categoricals and downcasts numbers.
+
+     Args:
+     df (pd.DataFrame): The DataFrame as returned by pd.read_csv.
+     date_format (str): strptime format of the date columns.
+     date_columns (List[str]): Columns to parse as dates (default: the text columns whose name ends with "DATE").
+     category_threshold (float): Maximum share of distinct values for a text column to become a categorical.
+
+     Returns:
+     pd.DataFrame: The typed DataFrame (a new one, df is not modified).
+     """
+     df = df.copy()
+     if date_columns is None:
+          date_columns = [c for c in df.columns if is_date_name(c) and is_text(df[c])]
+     for column in df.columns:
+          values = df[column]
+          if column in date_columns:
+               try:
+                    df[column] = parse_dates(values, date_format)
+               except (ValueError, TypeError):
+                    pass  # Not in the expected format, keep the text
+          elif is_text(values):
+               # Repetitive text (codes like JOB_ID) is stored once per distinct value
+               if values.nunique(dropna=True) <= category_threshold * max(1, len(values)):
+                    df[column] = values.astype("category")
+          elif pd.api.types.is_integer_dtype(values):
+               df[column] = pd.to_numeric(values, downcast="integer")
+          elif pd.api.types.is_float_dtype(values):
+               # Whole numbers with missing values (e.g. MANAGER_ID) become nullable integers
+               if values.notna().any() and (values.dropna() % 1 == 0).all():
+                    df[column] = pd.to_numeric(values.astype("Int64"), downcast="integer")
+               else:
+                    # float32 only when no value changes (0.1 is not exact in float32)
+                    as_float32 = values.astype(np.float32)
+                    if np.array_equal(as_float32.astype(np.float64).to_numpy(), values.to_numpy(), equal_nan=True):
+                         df[column] = as_float32
+     return df
+
+
+class DatasetRegistry:
+     """
+     Parses every CSV once and keeps the typed DataFrame in memory, keyed by path,
+     modification time and size (a modified file is parsed again).
+     Least recently used DataFrames are evicted beyond the memory budget, and with a
+     parquet_dir the typed DataFrames are also stored as Parquet, so a restart reloads
+     them without parsing the CSV (when pyarrow or fastparquet is installed, memory only otherwise).
+     """
+
+     def __init__(self, memory_budget=1024 * 2**20, parquet_dir=None, **read_options):
+          """
+          Args:
+          memory_budget (int): Maximum bytes of DataFrames kept in memory (the last loaded one is always kept).
+          parquet_dir (str): Folder of the Parquet copies (None, or no Parquet engine installed = memory only).
+          **read_options: Extra options of pd.read_csv (e.g. engine="pyarrow").
+          """
+          self.memory_budget = memory_budget
+          self.parquet_dir = parquet_dir if parquet_dir and has_parquet_engine() else None
+          self.read_options = read_options
+          self.stats = {"hits": 0, "csv_parses": 0, "parquet_loads": 0, "evictions": 0}
+          self._frames = OrderedDict()  # (path, mtime_ns, size) -> (DataFrame, bytes), least recently used first
+          self._lock = threading.Lock()
+          if self.parquet_dir:
+               os.makedirs(self.parquet_dir, exist_ok=True)
+
+     # Identity of the current version of a file
+     def key(self, path):
+          """
+          Returns:
+          tuple: (absolute path, modification time in ns, size in bytes) of the file.
+          """
+          path = os.path.abspath(path)
+          info = os.stat(path)
+          return path, info.st_mtime_ns, info.st_size
+
+     # Parquet copy of a version of a file
+     def _parquet_path(self, key):
+          path, mtime_ns, size = key
+          return os.path.join(self.parquet_dir, f"{hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]}-{mtime_ns}-{size}.parquet")
+
+     # Parse the CSV (or reload its Parquet copy)
+     def _read(self, key):
+          parquet_path = self._parquet_path(key) if self.parquet_dir else None
+          if parquet_path and os.path.exists(parquet_path):
+               self.stats["parquet_loads"] += 1
+               return pd.read_parquet(parquet_path)
+
+          df = optimize_dtypes(pd.read_csv(key[0], na_values=NA_VALUES, **self.read_options))
+          self.stats["csv_parses"] += 1
+          if parquet_path:
+               # Remove the copies of older versions of the file, then write atomically
+               prefix = os.path.basename(parquet_path).split("-")[0] + "-"
+               for name in os.listdir(self.parquet_dir):
+                    if name.startswith(prefix):
+                         os.remove(os.path.join(self.parquet_dir, name))
+               df.to_parquet(parquet_path + ".tmp", index=False)
+               os.replace(parquet_path + ".tmp", parquet_path)
+          return df
+
+     def load(self, path):
+          """
+          Returns the typed DataFrame of a CSV, parsing it only if this version of the file was never seen.
+
+          Args:
+          path (str): The path to the CSV file.
+
+          Returns:
+          pd.DataFrame: The DataFrame (shared between calls: copy it before modifying it).
+          """
+          key = self.key(path)
+          with self._lock:
+               if key in self._frames:
+                    self._frames.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self._frames[key][0]
+
+               df = self._read(key)
+               # Older versions of the same file are useless now
+               for old in [k for k in self._frames if k[0] == key[0]]:
+                    del self._frames[old]
+               self._frames[key] = (df, int(df.memory_usage(deep=True).sum()))
+
+               while len(self._frames) > 1 and self.memory_bytes() > self.memory_budget:
+                    self._frames.popitem(last=False)
+                    self.stats["evictions"] += 1
+               return df
+
+     def memory_bytes(self):
+          """
+          Returns:
+          int: Bytes of the DataFrames kept in memory.
+          """
+          return sum(size for _, size in self._frames.values())
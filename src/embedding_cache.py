@@ -0,0 +1,349 @@
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np  # The cached vectors live in a memory-mapped float32 matrix
+from langchain_core.embeddings import Embeddings  # Base class shared by OpenAIEmbeddings and SentenceTransformerEmbeddings
+
+# Default location of the cache, next to the 'data' folder outside the 'src' folder
+DEFAULT_CACHE_DIR = '../data/.embedding_cache'
+
+# Size of a sha256 digest, used as the fixed-width key of every cached vector
+KEY_SIZE = 32
+
+# Size of a journal record: the key followed by its matrix slot as a little-endian int64
+RECORD_SIZE = KEY_SIZE + 8
+
+# Function to find the model name of an embeddings instance (part of the cache key)
+def embedding_model_name(embeddings):
+     """
+     Returns the name of the model behind an embeddings instance.
+
+     Args:
+     embeddings (Embeddings): OpenAIEmbeddings, SentenceTransformerEmbeddings or any other Embeddings.
+
+     Returns:
+     str: The model name, or the class name when the instance does not expose one.
+     """
+     # OpenAIEmbeddings exposes 'model', SentenceTransformerEmbeddings exposes 'model_name'
+     for attribute in ("model", "model_name"):
+          name = getattr(embeddings, attribute, None)
+          if isinstance(name, str) and name:
+               return name
+     return type(embeddings).__name__
+
+# Function to normalize a text before hashing it, so trivial differences share one cache entry
+def normalize_text(text):
+     """
+     Normalizes the unicode form and the surrounding whitespace of a text.
+
+     Args:
+     text (str): The text to normalize.
+
+     Returns:
+     str: The normalized text.
+     """
+     return unicodedata.normalize("NFC", text).strip()
+
+# Function to build the content-addressed key of a (model name, call kind, text) triple
+def embedding_key(model_name, text, kind="document"):
+     """
+     Hashes the model name, the call kind and the normalized text into a fixed-width binary key.
+     The kind keeps query and document vectors apart, as some models (E5, BGE, Cohere...)
+     embed the same text differently in embed_query and embed_documents.
+
+     Args:
+     model_name (str): The name of the embedding model.
+     text (str): The text to embed.
+     kind (str): "document" (embed_documents) or "query" (embed_query).
+
+     Returns:
+     bytes: The 32 byte sha256 digest used as the cache key.
+     """
+     digest = hashlib.sha256()
+     digest.update(model_name.encode("utf-8"))
+     digest.update(b"\0")  # Separator so that (model, kind, text) triples can never collide
+     digest.update(kind.encode("utf-8"))
+     digest.update(b"\0")
+     digest.update(normalize_text(text).encode("utf-8"))
+     return digest.digest()
+
+# Function to turn a model name into the name of its cache sub-folder
+def model_cache_folder(model_name):
+     """
+     Replaces the characters of a model name that are not safe in a folder name.
+
+     Args:
+     model_name (str): The name of the embedding model (e.g. "sentence-transformers/all-MiniLM-L6-v2").
+
+     Returns:
+     str: The folder name.
+     """
+     return "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+
+
+class EmbeddingCache:
+     """
+     On-disk, size-bounded LRU cache of embedding vectors.
+
+     Every model has a sub-folder of its own (vectors of different models have different
+     dimensions and can not share a matrix), holding these files:
+     vectors.f32 - a memory-mapped float32 matrix with one vector per slot
+     keys.npy    - the sha256 keys of the live slots, in least-recently-used first order
+     slots.npy   - the matrix slot of every key in keys.npy
+     journal.bin - the (key, slot) records written since keys.npy, replayed on load
+     meta.json   - the model name, the vector dimension and the matrix capacity
+     """
+
+     def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=100_000, model_name=None):
+          """
+          Opens (or creates) the cache stored in cache_dir.
+
+          Args:
+          cache_dir (str): Directory where the cache files are stored.
+          max_entries (int): Maximum number of vectors kept before the least recently used are evicted.
+          model_name (str): The embedding model, its vectors are kept in a sub-folder of cache_dir.
+          """
+          self.model_name = model_name
+          self.cache_dir = os.path.join(cache_dir, model_cache_folder(model_name)) if model_name else cache_dir
+          self.max_entries = max_entries
+          self.hits = 0  # Number of texts served from the cache
+          self.misses = 0  # Number of texts that had to be embedded
+          self._lock = threading.Lock()
+          self._entries = OrderedDict()  # key -> slot, least recently used first
+          self._free_slots = []  # Slots released by eviction, reused before growing the matrix
+          self._dimension = None
+          self._capacity = 0
+          self._matrix = None
+          self._journal_records = 0  # Records appended to journal.bin since keys.npy was written
+          os.makedirs(self.cache_dir, exist_ok=True)
+          self._load()
+
+     # Paths of the files making up the cache
+     def _path(self, name):
+          return os.path.join(self.cache_dir, name)
+
+     # Load the key index and memory-map the vectors written by a previous run
+     def _load(self):
+          if not os.path.exists(self._path("meta.json")):
+               return
+          with open(self._path("meta.json")) as f:
+               meta = json.load(f)
+          if self.model_name and meta.get("model") not in (None, self.model_name):
+               raise ValueError(f"The embedding cache in {self.cache_dir} holds vectors of model {meta['model']!r}, "
+                                f"not {self.model_name!r}")
+          self._dimension = meta["dimension"]
+          self._capacity = meta["capacity"]
+          if os.path.exists(self._path("keys.npy")):
+               keys = np.load(self._path("keys.npy"))
+               slots = np.load(self._path("slots.npy"))
+               for key, slot in zip(keys, slots):
+                    self._entries[key.tobytes()] = int(slot)
+          self._replay_journal()
+          used = set(self._entries.values())
+          self._free_slots = [slot for slot in range(self._capacity) if slot not in used]
+          self._matrix = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+",
+                                   shape=(self._capacity, self._dimension))
+
+     # Apply the (key, slot) records written after keys.npy, in order: a slot given to a new key evicts its previous key
+     def _replay_journal(self):
+          if not os.path.exists(self._path("journal.bin")):
+               return
+          with open(self._path("journal.bin"), "rb") as f:
+               data = f.read()
+          owners = {slot: key for key, slot in self._entries.items()}
+          for offset in range(0, len(data) - len(data) % RECORD_SIZE, RECORD_SIZE):  # A torn last record is ignored
+               key = data[offset:offset + KEY_SIZE]
+               slot = int.from_bytes(data[offset + KEY_SIZE:offset + RECORD_SIZE], "little")
+               previous = owners.get(slot)
+               if previous is not None and previous != key:
+                    self._entries.pop(previous, None)
+               owners[slot] = key
+               self._entries[key] = slot
+               self._entries.move_to_end(key)
+               self._journal_records += 1
+
+     # Grow the memory-mapped matrix (doubling, bounded by max_entries) when no slot is free
+     def _grow(self):
+          new_capacity = min(self.max_entries, max(1024, self._capacity * 2))
+          if self._matrix is not None:
+               self._matrix.flush()
+               self._matrix = None
+          with open(self._path("vectors.f32"), "ab") as f:
+               f.truncate(new_capacity * self._dimension * 4)
+          self._free_slots.extend(range(self._capacity, new_capacity))
+          self._capacity = new_capacity
+          self._matrix = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+",
+                                   shape=(self._capacity, self._dimension))
+          self._save_meta()
+
+     # Pick the slot for a new vector, evicting the least recently used entry when the cache is full
+     def _allocate_slot(self):
+          if not self._free_slots and self._capacity < self.max_entries:
+               self._grow()
+          if self._free_slots:
+               return self._free_slots.pop()
+          _, slot = self._entries.popitem(last=False)
+          return slot
+
+     def __len__(self):
+          return len(self._entries)
+
+     def get_many(self, keys):
+          """
+          Looks up several keys at once and refreshes their LRU position.
+
+          Args:
+          keys (List[bytes]): Cache keys built with embedding_key.
+
+          Returns:
+          List[Optional[List[float]]]: The cached vector of every key, or None for a miss.
+          """
+          results = []
+          with self._lock:
+               for key in keys:
+                    slot = self._entries.get(key)
+                    if slot is None:
+                         self.misses += 1
+                         results.append(None)
+                    else:
+                         self.hits += 1
+                         self._entries.move_to_end(key)
+                         results.append(self._matrix[slot].tolist())
+          return results
+
+     def put_many(self, keys, vectors):
+          """
+          Stores vectors in the cache and appends their keys to the journal.
+
+          Args:
+          keys (List[bytes]): Cache keys built with embedding_key.
+          vectors (List[List[float]]): The embedding of every key.
+          """
+          if not keys:
+               return
+          with self._lock:
+               if self._dimension is None:
+                    self._dimension = len(vectors[0])
+               elif len(vectors[0]) != self._dimension:
+                    raise ValueError(f"The embedding cache in {self.cache_dir} holds {self._dimension}-d vectors, got "
+                                     f"{len(vectors[0])}-d ones (use one cache_dir or model_name per embedding model)")
+               records = []
+               for key, vector in zip(keys, vectors):
+                    slot = self._entries.get(key)
+                    if slot is None:
+                         slot = self._allocate_slot()
+                    self._matrix[slot] = vector
+                    self._entries[key] = slot
+                    self._entries.move_to_end(key)
+                    records.append(key + slot.to_bytes(8, "little"))
+               self._append_journal(records)
+
+     # Flush the vectors, then append the new (key, slot) records; the key index is only rewritten once the journal is long
+     def _append_journal(self, records):
+          self._matrix.flush()
+          with open(self._path("journal.bin"), "ab") as f:
+               f.write(b"".join(records))
+          self._journal_records += len(records)
+          if self._journal_records > max(1024, len(self._entries)):
+               self._compact()
+
+     # Atomically rewrite the key index and empty the journal
+     def _compact(self):
+          keys = np.frombuffer(b"".join(self._entries.keys()), dtype=np.uint8).reshape(-1, KEY_SIZE)
+          slots = np.fromiter(self._entries.values(), dtype=np.int64, count=len(self._entries))
+          for name, array in (("keys.npy", keys), ("slots.npy", slots)):
+               with open(self._path(name + ".tmp"), "wb") as f:
+                    np.save(f, array)
+               os.replace(self._path(name + ".tmp"), self._path(name))
+          # Replaying the journal over the new index gives the same entries, so a crash here loses nothing
+          open(self._path("journal.bin"), "wb").close()
+          self._journal_records = 0
+
+     # Atomically rewrite the model name, dimension and capacity of the cache
+     def _save_meta(self):
+          with open(self._path("meta.json.tmp"), "w") as f:
+               json.dump({"model": self.model_name, "dimension": self._dimension, "capacity": self._capacity}, f)
+          os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+
+     def stats(self):
+          """
+          Returns the hit and miss counters of the cache.
+
+          Returns:
+          dict: Number of hits, misses, live entries and the hit rate.
+          """
+          total = self.hits + self.misses
+          return {
+               "hits": self.hits,
+               "misses": self.misses,
+               "entries": len(self._entries),
+               "hit_rate": self.hits / total if total else 0.0,
+          }
+
+
+class CachedEmbeddings(Embeddings):
+     """
+     Embeddings wrapper that serves repeated texts from an EmbeddingCache
+     and only sends the missing texts to the wrapped model.
+     """
+
+     def __init__(self, embeddings, cache=None, model_name=None):
+          """
+          Wraps an embeddings instance with a persistent cache.
+
+          Args:
+          embeddings (Embeddings): The embeddings instance doing the actual work (OpenAI, SentenceTransformer, ...).
+          cache (EmbeddingCache): The cache to use, a default on-disk cache is opened when omitted.
+          model_name (str): Overrides the model name used in the cache key.
+          """
+          self.embeddings = embeddings
+          self.model_name = model_name or embedding_model_name(embeddings)
+          self.cache = cache if cache is not None else EmbeddingCache(model_name=self.model_name)
+
+     def embed_documents(self, texts):
+          """
+          Embeds a list of texts, calling the wrapped model once for all cache misses.
+
+          Args:
+          texts (List[str]): The texts to embed.
+
+          Returns:
+          List[List[float]]: One vector per text.
+          """
+          keys = [embedding_key(self.model_name, text) for text in texts]
+          vectors = self.cache.get_many(keys)
+
+          # Collect the missing texts, embedding every distinct key only once
+          missing = OrderedDict()
+          for i, vector in enumerate(vectors):
+               if vector is None:
+                    missing.setdefault(keys[i], texts[i])
+
+          if missing:
+               new_vectors = self.embeddings.embed_documents(list(missing.values()))
+               self.cache.put_many(list(missing.keys()), new_vectors)
+               by_key = dict(zip(missing.keys(), new_vectors))
+               vectors = [vector if vector is not None else list(by_key[key])
+                          for key, vector in zip(keys, vectors)]
+          return vectors
+
+     def embed_query(self, text):
+          """
+          Embeds a single query text through the cache.
+
+          Args:
+          text (str): The query to embed.
+
+          Returns:
+          List[float]: The query vector.
+          """
+          key = embedding_key(self.model_name, text, kind="query")
+          vector = self.cache.get_many([key])[0]
+          if vector is None:
+               vector = self.embeddings.embed_query(text)
+               self.cache.put_many([key], [vector])
+          return vector
@@ -0,0 +1,350 @@
+import os
+import json
+import pickle
+import hashlib
+from collections import Counter
+
+import numpy as np
+import faiss  # Facebook AI similarity search, used directly to build, write and memory-map the index
+from langchain_community.vectorstores import FAISS  # LangChain wrapper used for the similarity search itself
+from langchain_community.docstore.in_memory import InMemoryDocstore  # Keeps the documents behind the vectors
+
+# Default location of the saved index, next to the 'data' folder outside the 'src' folder
+DEFAULT_INDEX_DIR = '../data/.faiss_index'
+
+# Number of rows embedded and added to the index per step, keeps memory flat on large catalogs
+EMBED_BATCH_SIZE = 1000
+
+# Supported index types: exact brute force, inverted lists, graph based and inverted lists with product quantization
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Default build and search parameters of the approximate index types
+DEFAULT_INDEX_PARAMS = {
+     "nlist": 1024,  # IVF: number of inverted lists (clusters)
+     "nprobe": 16,  # IVF: number of lists visited per search, higher = better recall, slower
+     "pq_m": 16,  # IVF-PQ: number of sub-quantizers (bytes per vector with 8 bits)
+     "nbits": 8,  # IVF-PQ: bits per sub-quantizer code
+     "hnsw_m": 32,  # HNSW: number of neighbours per node
+     "ef_construction": 40,  # HNSW: candidate list size while building
+     "ef_search": 64,  # HNSW: candidate list size while searching, higher = better recall, slower
+     "train_size": 50_000,  # IVF: number of sampled vectors used to train the clusters
+}
+
+# Build parameters of every index type (an index built with other values is rebuilt)
+BUILD_PARAMS = {
+     "flat": (),
+     "ivf_flat": ("nlist",),
+     "hnsw": ("hnsw_m", "ef_construction"),
+     "ivf_pq": ("nlist", "pq_m", "nbits"),
+}
+
+# Vectors needed per trained list, FAISS warns below this (nlist and nbits are capped by the rows available)
+TRAIN_VECTORS_PER_LIST = 39
+
+# Function to create an empty FAISS index of the requested type
+def build_faiss_index(dimension, index_type="flat", n_train=None, **params):
+     """
+     Creates an empty FAISS index. IVF indexes still need to be trained before vectors are added.
+
+     Args:
+     dimension (int): Dimension of the vectors.
+     index_type (str): One of "flat", "ivf_flat", "hnsw" or "ivf_pq".
+     n_train (int): Number of training vectors available, caps nlist so that training succeeds.
+     **params: Overrides of DEFAULT_INDEX_PARAMS.
+
+     Returns:
+     faiss.Index: The empty index.
+     """
+     if index_type not in INDEX_TYPES:
+          raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+     params = {**DEFAULT_INDEX_PARAMS, **params}
+
+     if index_type == "flat":
+          return faiss.IndexFlatL2(dimension)
+
+     if index_type == "hnsw":
+          index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+          index.hnsw.efConstruction = params["ef_construction"]
+          return index
+
+     # FAISS needs at least as many training vectors as lists (and warns below 39 per list)
+     nlist = params["nlist"]
+     if n_train is not None:
+          nlist = max(1, min(nlist, n_train // TRAIN_VECTORS_PER_LIST))
+     quantizer = faiss.IndexFlatL2(dimension)
+     if index_type == "ivf_flat":
+          return faiss.IndexIVFFlat(quantizer, dimension, nlist)
+
+     # The number of sub-quantizers has to divide the dimension, use the closest divisor below pq_m
+     pq_m = max(m for m in range(1, params["pq_m"] + 1) if dimension % m == 0)
+     # Each sub-quantizer has 2**nbits centroids, which also need about 39 training vectors each
+     nbits = params["nbits"]
+     if n_train is not None:
+          nbits = min(nbits, max(1, int(np.log2(max(2, n_train // TRAIN_VECTORS_PER_LIST)))))
+     return faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, nbits)
+
+# Function to apply the search time parameters (nprobe / efSearch) to an index
+def tune_faiss_index(index, **params):
+     """
+     Sets nprobe on IVF indexes and efSearch on HNSW indexes, other indexes are left untouched.
+
+     Args:
+     index (faiss.Index): The index to tune.
+     **params: Overrides of DEFAULT_INDEX_PARAMS (only nprobe and ef_search are used).
+     """
+     params = {**DEFAULT_INDEX_PARAMS, **params}
+     index = faiss.downcast_index(index)
+     if isinstance(index, faiss.IndexIVF):
+          index.nprobe = params["nprobe"]
+     elif isinstance(index, faiss.IndexHNSW):
+          index.hnsw.efSearch = params["ef_search"]
+
+# Function to compute the fingerprint of a row (content plus metadata, except its position in the file)
+def row_fingerprint(doc):
+     """
+     Hashes the content and the metadata of a document.
+
+     Args:
+     doc (Document): The document loaded from a CSV row.
+
+     Returns:
+     str: Hex sha256 of the document content and metadata.
+     """
+     metadata = {key: value for key, value in doc.metadata.items() if key != "row"}
+     payload = json.dumps([doc.page_content, metadata], sort_keys=True, default=str)
+     return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Function to assign a stable id to every row, so inserting a row does not shift the ids of the others
+def row_ids(docs):
+     """
+     Builds a stable id for each document from its content and its occurrence number.
+
+     Args:
+     docs (List[Document]): The documents loaded from the CSV.
+
+     Returns:
+     List[str]: One id per document.
+     """
+     seen = Counter()
+     ids = []
+     for doc in docs:
+          content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:24]
+          ids.append(f"{content_hash}-{seen[content_hash]}")
+          seen[content_hash] += 1
+     return ids
+
+
+class FaissIndexStore:
+     """
+     Managed FAISS index that is saved to disk, memory-mapped back at startup and
+     updated incrementally: only new or changed rows are embedded and removed rows are deleted.
+
+     The index directory holds:
+     index.faiss         - the FAISS index
+     index.pkl           - the docstore and the FAISS position to document id mapping
+     index.manifest.json - the fingerprint of every indexed row, keyed by row id
+     index.config.json   - the index type and parameters the index was built with, and the nlist it was trained with
+     """
+
+     def __init__(self, embeddings, index_dir=DEFAULT_INDEX_DIR, index_name="index", index_type="flat", index_params=None):
+          """
+          Args:
+          embeddings (Embeddings): Embeddings instance used for the rows and the queries.
+          index_dir (str): Directory where the index, docstore and manifest are stored.
+          index_name (str): Base name of the index files.
+          index_type (str): One of "flat", "ivf_flat", "hnsw" or "ivf_pq".
+          index_params (dict): Overrides of DEFAULT_INDEX_PARAMS (nlist, nprobe, pq_m, ef_search, ...).
+          """
+          if index_type not in INDEX_TYPES:
+               raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+          self.embeddings = embeddings
+          self.index_dir = index_dir
+          self.index_name = index_name
+          self.index_type = index_type
+          self.index_params = dict(index_params or {})
+          self.last_sync = {"added": 0, "removed": 0, "unchanged": 0}
+
+     # Paths of the files making up the store
+     def _path(self, suffix):
+          return os.path.join(self.index_dir, self.index_name + suffix)
+
+     def exists(self):
+          return os.path.exists(self._path(".faiss")) and os.path.exists(self._path(".manifest.json"))
+
+     def load(self, mmap=True):
+          """
+          Loads the saved index, memory-mapping the vectors unless mmap is False.
+
+          Args:
+          mmap (bool): Memory-map the FAISS index instead of reading it into memory.
+
+          Returns:
+          FAISS: The vector store.
+          """
+          io_flags = faiss.IO_FLAG_MMAP if mmap else 0
+          index = faiss.read_index(self._path(".faiss"), io_flags)
+          tune_faiss_index(index, **self.index_params)
+          with open(self._path(".pkl"), "rb") as f:
+               docstore, index_to_docstore_id = pickle.load(f)
+          return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+     # Index type and the build parameters of that type, an index built with another configuration is rebuilt
+     def _config(self):
+          return {"index_type": self.index_type,
+                  **{key: self.index_params[key] for key in BUILD_PARAMS[self.index_type] if key in self.index_params}}
+
+     def _saved_config(self):
+          if not os.path.exists(self._path(".config.json")):
+               return {"index_type": "flat"}
+          with open(self._path(".config.json")) as f:
+               return json.load(f)
+
+     # Number of lists an IVF index was trained with (None for the other index types)
+     def _trained_nlist(self):
+          saved = self._saved_config()
+          if "trained_nlist" in saved:
+               return saved["trained_nlist"]
+          ivf = faiss.try_extract_index_ivf(faiss.read_index(self._path(".faiss"), faiss.IO_FLAG_MMAP))
+          return ivf.nlist if ivf is not None else None
+
+     # An IVF index trained on a small catalog is rebuilt once the catalog supports at least twice its lists
+     def _outgrown(self, row_count):
+          if self.index_type not in ("ivf_flat", "ivf_pq"):
+               return False
+          trained = self._trained_nlist()
+          params = {**DEFAULT_INDEX_PARAMS, **self.index_params}
+          # Same cap as build_faiss_index, training uses at most train_size rows
+          target = max(1, min(params["nlist"], min(row_count, params["train_size"]) // TRAIN_VECTORS_PER_LIST))
+          return trained is not None and target >= 2 * trained
+
+     def load_manifest(self):
+          if not os.path.exists(self._path(".manifest.json")):
+               return {}
+          with open(self._path(".manifest.json")) as f:
+               return json.load(f)
+
+     def save(self, db, manifest):
+          """
+          Writes the index, the docstore and the manifest to disk (each file is replaced atomically).
+
+          Args:
+          db (FAISS): The vector store to save.
+          manifest (dict): Row id to row fingerprint mapping of the indexed rows.
+          """
+          os.makedirs(self.index_dir, exist_ok=True)
+          faiss.write_index(db.index, self._path(".faiss.tmp"))
+          os.replace(self._path(".faiss.tmp"), self._path(".faiss"))
+          with open(self._path(".pkl.tmp"), "wb") as f:
+               pickle.dump((db.docstore, db.index_to_docstore_id), f)
+          os.replace(self._path(".pkl.tmp"), self._path(".pkl"))
+          with open(self._path(".manifest.json.tmp"), "w") as f:
+               json.dump(manifest, f)
+          os.replace(self._path(".manifest.json.tmp"), self._path(".manifest.json"))
+          ivf = faiss.try_extract_index_ivf(db.index)
+          with open(self._path(".config.json"), "w") as f:
+               json.dump({**self._config(), **({"trained_nlist": ivf.nlist} if ivf is not None else {})}, f)
+
+     # Create an empty vector store, training the index on the given sample when it needs training
+     def _new_vectorstore(self, sample):
+          index = build_faiss_index(sample.shape[1], self.index_type, n_train=len(sample), **self.index_params)
+          if not index.is_trained:
+               index.train(sample)
+          tune_faiss_index(index, **self.index_params)
+          return FAISS(self.embeddings, index, InMemoryDocstore(), {})
+
+     # Remove rows from the store. Only the flat index compacts its ids on removal (which the LangChain
+     # wrapper relies on), IVF and HNSW indexes are refilled from their own stored vectors instead
+     def _delete(self, db, ids):
+          if isinstance(faiss.downcast_index(db.index), faiss.IndexFlat):
+               db.delete(ids)
+               return db
+          removed = set(ids)
+          keep = [(position, id_) for position, id_ in sorted(db.index_to_docstore_id.items()) if id_ not in removed]
+          ivf = faiss.try_extract_index_ivf(db.index)
+          if ivf is not None:
+               ivf.make_direct_map()
+          index = faiss.clone_index(db.index)
+          index.reset()  # Keeps the trained clusters / quantizer
+          if keep:
+               index.add(np.vstack([db.index.reconstruct(position) for position, _ in keep]))
+          tune_faiss_index(index, **self.index_params)
+          db.docstore.delete(ids)
+          return FAISS(self.embeddings, index, db.docstore, {i: id_ for i, (_, id_) in enumerate(keep)})
+
+     # Embed the given rows batch by batch and add them to db (creating and training the index first if needed)
+     def _add(self, db, ids, current, manifest):
+          def embed(batch):
+               return self.embeddings.embed_documents([current[id_][1].page_content for id_ in batch])
+
+          def add_batch(db, batch, vectors):
+               texts = [current[id_][1].page_content for id_ in batch]
+               metadatas = [current[id_][1].metadata for id_ in batch]
+               db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=batch)
+               for id_ in batch:
+                    manifest[id_] = current[id_][0]
+
+          if db is None and ids:
+               # A new index is trained on a random sample of the rows (the first rows of a file are often
+               # sorted or grouped), the sampled rows are added first and the others batch by batch below
+               train_size = self.index_params.get("train_size", DEFAULT_INDEX_PARAMS["train_size"])
+               picked = np.sort(np.random.default_rng(0).permutation(len(ids))[:train_size])
+               sample_ids = [ids[i] for i in picked]
+               sample_batches = [sample_ids[start:start + EMBED_BATCH_SIZE] for start in range(0, len(sample_ids), EMBED_BATCH_SIZE)]
+               sample_vectors = [embed(batch) for batch in sample_batches]
+               db = self._new_vectorstore(np.asarray([v for vs in sample_vectors for v in vs], dtype=np.float32))
+               for batch, vectors in zip(sample_batches, sample_vectors):
+                    add_batch(db, batch, vectors)
+               sampled = set(sample_ids)
+               ids = [id_ for id_ in ids if id_ not in sampled]
+
+          for start in range(0, len(ids), EMBED_BATCH_SIZE):
+               batch = ids[start:start + EMBED_BATCH_SIZE]
+               add_batch(db, batch, embed(batch))
+          return db
+
+     def sync(self, docs):
+          """
+          Brings the saved index in line with docs and returns it.
+          Rows whose fingerprint is unchanged are neither embedded nor touched.
+
+          Args:
+          docs (List[Document]): The full, current list of documents (e.g. all CSV rows).
+
+          Returns:
+          FAISS: The up to date vector store.
+          """
+          ids = row_ids(docs)
+          current = {id_: (row_fingerprint(doc), doc) for id_, doc in zip(ids, docs)}
+          manifest = self.load_manifest() if self.exists() else {}
+
+          # An index built with another type or build parameters, or trained on a much smaller catalog, is rebuilt
+          # from scratch (rows are embedded again, which costs no call behind an embedding cache)
+          if manifest:
+               saved = {key: value for key, value in self._saved_config().items() if key != "trained_nlist"}
+               if saved != self._config() or self._outgrown(len(current)):
+                    manifest = {}
+
+          # Rows that disappeared or changed are removed, rows that are new or changed are added
+          removed = [id_ for id_, fingerprint in manifest.items()
+                     if id_ not in current or current[id_][0] != fingerprint]
+          added = [id_ for id_, (fingerprint, _) in current.items() if manifest.get(id_) != fingerprint]
+          self.last_sync = {"added": len(added), "removed": len(removed),
+                            "unchanged": len(current) - len(added)}
+
+          # Nothing changed: serve the memory-mapped index as it is
+          if manifest and not removed and not added:
+               return self.load(mmap=True)
+
+          db = self.load(mmap=False) if manifest else None
+          if removed:
+               db = self._delete(db, removed)
+               for id_ in removed:
+                    manifest.pop(id_)
+
+          # Embed and add the new rows batch by batch
+          db = self._add(db, added, current, manifest)
+
+          if db is None:
+               raise ValueError("Cannot build a FAISS index from an empty list of documents.")
+          self.save(db, manifest)
+          return db
@@ -0,0 +1,165 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter  # Base class of RecursiveCharacterTextSplitter
+
+
+class FastRecursiveTextSplitter(TextSplitter):
+     """
+     Drop-in replacement of RecursiveCharacterTextSplitter (default keep_separator=True,
+     non-regex separators) producing the same chunks with much less work.
+
+     RecursiveCharacterTextSplitter copies every split into a new string and joins them
+     back together. With keep_separator=True the splits of a text are contiguous, so a
+     chunk is always one slice of the original text: this splitter only tracks the offsets
+     of the splits (found with str.find, no regex) and slices each chunk once.
+     With length_function=len the lengths are offset differences and no split is ever copied.
+
+     Token based splitting works the same way as for RecursiveCharacterTextSplitter:
+     FastRecursiveTextSplitter.from_tiktoken_encoder(chunk_size=..., chunk_overlap=...).
+
+     With add_start_index=True, start_index is the exact offset of the chunk (RecursiveCharacterTextSplitter
+     searches the chunk again with str.find, which can land on an earlier repeat of the same text).
+     """
+
+     def __init__(self, separators=None, **kwargs):
+          """
+          Args:
+          separators (List[str]): Separators tried in order, plain strings (default: paragraphs, lines, words, characters).
+          **kwargs: chunk_size, chunk_overlap, length_function, strip_whitespace, add_start_index (as for TextSplitter).
+          """
+          kwargs["keep_separator"] = True
+          super().__init__(**kwargs)
+          self._separators = separators or ["\n\n", "\n", " ", ""]
+
+     # Offsets of the splits of text[start:end]: split i is text[bounds[i]:bounds[i + 1]], every split but the
+     # first starts with the separator (like re.split with a capturing group and keep_separator=True)
+     def _bounds(self, text, start, end, separator):
+          if not separator:
+               return list(range(start, end + 1))
+          bounds = [start]
+          step = len(separator)
+          position = text.find(separator, start, end)
+          if position == start:  # The first split would be empty, it is dropped
+               position = text.find(separator, start + step, end)
+          while position != -1:
+               bounds.append(position)
+               position = text.find(separator, position + step, end)
+          bounds.append(end)
+          return bounds
+
+     # Split text[start:end] with the first separator it contains, recursing into splits that are still too long
+     def _split_range(self, text, start, end, separators, chunks, offsets):
+          separator = separators[-1]
+          new_separators = []
+          for i, candidate in enumerate(separators):
+               if not candidate:
+                    separator = candidate
+                    break
+               if text.find(candidate, start, end) != -1:
+                    separator = candidate
+                    new_separators = separators[i + 1:]
+                    break
+
+          bounds = self._bounds(text, start, end, separator)
+          if self._length_function is len:
+               lengths = [bounds[i + 1] - bounds[i] for i in range(len(bounds) - 1)]
+          else:
+               lengths = [self._length_function(text[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+          # Merge runs of short splits, recurse into the long ones
+          run_start = 0
+          for i, length in enumerate(lengths):
+               if length < self._chunk_size:
+                    continue
+               if run_start < i:
+                    self._merge(text, bounds, lengths, run_start, i, chunks, offsets)
+               if not new_separators:
+                    chunks.append(text[bounds[i]:bounds[i + 1]])
+                    offsets.append(bounds[i])
+               else:
+                    self._split_range(text, bounds[i], bounds[i + 1], new_separators, chunks, offsets)
+               run_start = i + 1
+          if run_start < len(lengths):
+               self._merge(text, bounds, lengths, run_start, len(lengths), chunks, offsets)
+
+     # Merge the splits lo..hi-1 into chunks of at most chunk_size with chunk_overlap, same rules as _merge_splits
+     def _merge(self, text, bounds, lengths, lo, hi, chunks, offsets):
+          separator_length = self._length_function("")  # The splits keep their separator, they are joined with ""
+          head = lo
+          total = 0
+          for i in range(lo, hi):
+               length = lengths[i]
+               if total + length + (separator_length if i > head else 0) > self._chunk_size and i > head:
+                    self._emit(text, bounds[head], bounds[i], chunks, offsets)
+                    # Drop splits from the start until the overlap fits
+                    while total > self._chunk_overlap or (
+                         total + length + (separator_length if i > head else 0) > self._chunk_size and total > 0
+                    ):
+                         total -= lengths[head] + (separator_length if i - head > 1 else 0)
+                         head += 1
+               total += length + (separator_length if i > head else 0)
+          self._emit(text, bounds[head], bounds[hi], chunks, offsets)
+
+     # Slice one chunk out of the text, stripped like TextSplitter._join_docs
+     def _emit(self, text, start, end, chunks, offsets):
+          chunk = text[start:end]
+          if self._strip_whitespace:
+               stripped = chunk.lstrip()
+               start += len(chunk) - len(stripped)
+               chunk = stripped.rstrip()
+          if chunk:
+               chunks.append(chunk)
+               offsets.append(start)
+
+     # Chunks of a text with their start offsets
+     def _split_with_offsets(self, text):
+          chunks, offsets = [], []
+          if text:
+               self._split_range(text, 0, len(text), self._separators, chunks, offsets)
+          return chunks, offsets
+
+     def split_text(self, text):
+          """
+          Splits a text into chunks.
+
+          Args:
+          text (str): The text to split.
+
+          Returns:
+          List[str]: The chunks, identical to RecursiveCharacterTextSplitter.split_text.
+          """
+          return self._split_with_offsets(text)[0]
+
+     def iter_split_documents(self, documents):
+          """
+          Splits a stream of documents lazily, one document at a time.
+
+          Args:
+          documents (Iterable[Document]): The documents to split (a list or any generator).
+
+          Yields:
+          Document: The chunks, with the metadata of their document (and start_index if add_start_index).
+          """
+          for doc in documents:
+               chunks, offsets = self._split_with_offsets(doc.page_content)
+               for chunk, offset in zip(chunks, offsets):
+                    metadata = dict(doc.metadata)
+                    if self._add_start_index:
+                         metadata["start_index"] = offset
+                    yield Document(page_content=chunk, metadata=metadata)
+
+     def split_documents(self, documents):
+          """
+          Splits documents into chunks.
+
+          Args:
+          documents (Iterable[Document]): The documents to split.
+
+          Returns:
+          List[Document]: The chunks, identical to RecursiveCharacterTextSplitter.split_documents.
+          """
+          return list(self.iter_split_documents(documents))
+
+     def create_documents(self, texts, metadatas=None):
+          metadatas = metadatas or [{}] * len(texts)
+          return self.split_documents(Document(page_content=text, metadata=metadata)
+                                      for text, metadata in zip(texts, metadatas))
@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+
+from sitemap_crawler import SitemapCrawler
+from ingest_pipeline import IngestPipeline
+from vector_upsert import chunk_id
+
+# Default location of the ingest manifest, next to the 'data' folder outside the 'src' folder
+DEFAULT_MANIFEST_PATH = '../data/.ingest_manifest.json'
+
+
+class IngestManifest:
+     """
+     Local record of what is in the index: for every page URL its sitemap lastmod,
+     the hash of its content and the ids of the chunks it produced.
+     """
+
+     def __init__(self, path=DEFAULT_MANIFEST_PATH):
+          self.path = path
+          self.pages = {}  # url -> {"lastmod", "content_hash", "chunk_ids"}
+          if os.path.exists(path):
+               with open(path) as f:
+                    self.pages = json.load(f)
+
+     def save(self):
+          with open(self.path + ".tmp", "w") as f:
+               json.dump(self.pages, f)
+          os.replace(self.path + ".tmp", self.path)
+
+     def changed_entries(self, entries):
+          """
+          Selects the sitemap entries that have to be fetched: new pages, pages whose
+          lastmod changed, and pages without a lastmod (those are fetched conditionally).
+
+          Args:
+          entries (List[dict]): The sitemap entries ({"loc", "lastmod"}).
+
+          Returns:
+          List[dict]: The entries to fetch.
+          """
+          changed = []
+          for entry in entries:
+               page = self.pages.get(entry["loc"])
+               if page is None or not entry.get("lastmod") or page["lastmod"] != entry["lastmod"]:
+                    changed.append(entry)
+          return changed
+
+     def removed_urls(self, entries):
+          """
+          Lists the indexed pages that are no longer in the sitemap.
+
+          Args:
+          entries (List[dict]): The sitemap entries ({"loc", "lastmod"}).
+
+          Returns:
+          List[str]: The URLs of the removed pages.
+          """
+          listed = {entry["loc"] for entry in entries}
+          return [url for url in self.pages if url not in listed]
+
+# Function to hash the content of a page
+def content_hash(text):
+     return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+async def incremental_ingest(sitemap_url, manifest, split_fn, embeddings, upserter, crawler=None, reindex_all=False,
+                             **pipeline_options):
+     """
+     Re-indexes only what changed since the last run: pages whose lastmod (or, without
+     lastmod, whose ETag / content) changed are fetched, split, embedded and upserted,
+     their stale chunks are deleted, and the chunks of pages gone from the sitemap are deleted.
+
+     Args:
+     sitemap_url (str): The URL of the sitemap.
+     manifest (IngestManifest): The manifest of the previous run (updated and saved).
+     split_fn (Callable): Splits a list of documents into chunks (e.g. data_splitter).
+     embeddings (Embeddings): Embeddings instance to convert text into vectors.
+     upserter (VectorUpserter): Upsert layer of the index (chunk ids must be the ones of chunk_id).
+     crawler (SitemapCrawler): The crawler to use, a default one is created when omitted.
+     reindex_all (bool): Fetch and re-index every page (e.g. to fill a new lexical index); the manifest is still
+     used to delete the chunks of removed pages and the chunks modified pages no longer produce.
+     **pipeline_options: Options of IngestPipeline (queue_size, embed_workers, ...).
+
+     Returns:
+     dict: Counters of the run (pages listed, fetched, re-indexed, removed, chunks deleted, ...).
+     """
+     crawler = crawler or SitemapCrawler()
+     entries = await crawler.list_entries(sitemap_url)
+     lastmods = {entry["loc"]: entry.get("lastmod") for entry in entries}
+     stats = {"pages_listed": len(entries), "fetched": 0, "unchanged_content": 0, "reindexed": 0,
+              "removed": 0, "chunks_deleted": 0}
+
+     # Pages gone from the sitemap: delete all their chunks
+     stale_ids = []
+     for url in manifest.removed_urls(entries):
+          stale_ids.extend(manifest.pages.pop(url)["chunk_ids"])
+          stats["removed"] += 1
+
+     # Fetch only new / modified pages, skip the ones whose content did not change after all
+     changed = entries if reindex_all else manifest.changed_entries(entries)
+     for entry in changed:
+          # A page missing from the manifest must be downloaded, even if the server would answer 304
+          if reindex_all or entry["loc"] not in manifest.pages:
+               crawler.validators.pop(entry["loc"], None)
+     updates = {}  # url -> new manifest record, applied once the chunks are in the index
+
+     async def changed_pages():
+          # The validators are saved with the manifest below, once the pages are in the index
+          async for doc in crawler.crawl(sitemap_url, entries=changed, save_validators=False):
+               stats["fetched"] += 1
+               url = doc.metadata["source"]
+               digest = content_hash(doc.page_content)
+               page = manifest.pages.get(url)
+               if not reindex_all and page is not None and page["content_hash"] == digest:
+                    stats["unchanged_content"] += 1
+                    page["lastmod"] = lastmods.get(url)
+                    continue
+               yield doc
+
+     # Split a page and record the ids of its chunks (identical chunks keep their id and are not re-uploaded)
+     def split_and_track(docs):
+          chunks = split_fn(docs)
+          for doc in docs:
+               url = doc.metadata["source"]
+               ids = [chunk_id(url, chunk.page_content) for chunk in chunks if chunk.metadata.get("source") == url]
+               updates[url] = {"lastmod": lastmods.get(url), "content_hash": content_hash(doc.page_content), "chunk_ids": ids}
+          return chunks
+
+     pipeline = IngestPipeline(split_and_track, embeddings, upserter, **pipeline_options)
+     crawler.not_modified_urls = []
+     stage_stats = await pipeline.run(changed_pages())
+
+     # Pages that answered 304 did not change: record their new lastmod so they are not fetched again
+     for url in crawler.not_modified_urls:
+          if url in manifest.pages:
+               manifest.pages[url]["lastmod"] = lastmods.get(url)
+
+     # The new chunks are in the index, now drop the chunks the modified pages no longer produce
+     for url, record in updates.items():
+          old = manifest.pages.get(url)
+          if old is not None:
+               stale_ids.extend(set(old["chunk_ids"]) - set(record["chunk_ids"]))
+          manifest.pages[url] = record
+     stats["reindexed"] = len(updates)
+     if stale_ids:
+          upserter.delete(stale_ids)
+     stats["chunks_deleted"] = len(stale_ids)
+
+     # Validators only go to disk with the manifest: after a failed run the pages are fetched again
+     manifest.save()
+     crawler.save_validators()
+     stats["stages"] = stage_stats
+     return stats
@@ -0,0 +1,213 @@
+import time
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Embeddings instance of a process pool worker, created once per process by _init_embed_worker
+_worker_embeddings = None
+
+def _init_embed_worker(embeddings_factory):
+     global _worker_embeddings
+     _worker_embeddings = embeddings_factory()
+
+def _embed_in_worker(texts):
+     return _worker_embeddings.embed_documents(texts)
+
+# Run coroutines as tasks: the first exception cancels the others (blocked on a queue nobody serves any more) and is raised
+async def _gather_or_cancel(coros):
+     tasks = [asyncio.ensure_future(coro) for coro in coros]
+     try:
+          await asyncio.gather(*tasks)
+     finally:
+          for task in tasks:
+               task.cancel()
+          await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class StageStats:
+     """
+     Throughput and queue depth of one pipeline stage.
+     """
+
+     def __init__(self, name):
+          self.name = name
+          self.items = 0  # Items produced by the stage (documents, chunks or vectors)
+          self.busy_seconds = 0.0  # Time spent doing work, summed over the workers of the stage
+          self.max_queue_depth = 0  # Largest number of items seen waiting in the input queue
+          self.queue_depth_samples = []
+          self.started = None
+          self.finished = None
+
+     def as_dict(self):
+          elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+          samples = self.queue_depth_samples
+          return {
+               "stage": self.name,
+               "items": self.items,
+               "items_per_second": self.items / elapsed if elapsed > 0 else 0.0,
+               "busy_seconds": round(self.busy_seconds, 4),
+               "max_queue_depth": self.max_queue_depth,
+               "mean_queue_depth": sum(samples) / len(samples) if samples else 0.0,
+          }
+
+
+class IngestPipeline:
+     """
+     Staged ingest: fetch -> split -> embed -> upsert.
+
+     Every stage runs its own workers and the stages are connected by bounded queues, so a
+     slow stage pauses the ones before it (backpressure) and memory stays flat whatever the
+     size of the site. Fetching and upserting are I/O and run on asyncio, splitting runs in
+     threads and the CPU-bound embedding runs in a thread or process pool.
+     """
+
+     def __init__(self, split_fn, embeddings=None, upsert_fn=None, embed_batch_size=64, queue_size=8,
+                  split_workers=2, embed_workers=2, upsert_workers=4, embed_executor="thread", embeddings_factory=None):
+          """
+          Args:
+          split_fn (Callable): Splits a list of documents into chunks (e.g. data_splitter).
+          embeddings (Embeddings): Embeddings instance used by the thread pool.
+          upsert_fn (Callable): Called with (chunks, vectors) for every embedded batch, sync or async.
+          embed_batch_size (int): Number of chunks embedded per call.
+          queue_size (int): Capacity of every queue between two stages.
+          split_workers (int): Number of split workers.
+          embed_workers (int): Number of embedding workers (threads or processes).
+          upsert_workers (int): Number of concurrent upserts.
+          embed_executor (str): "thread", or "process" to embed in a process pool built with embeddings_factory.
+          embeddings_factory (Callable): Picklable function returning an Embeddings instance, used by each process.
+          """
+          if embed_executor == "process" and embeddings_factory is None:
+               raise ValueError("embed_executor='process' needs a picklable embeddings_factory")
+          self.split_fn = split_fn
+          self.embeddings = embeddings
+          self.upsert_fn = upsert_fn
+          self.embed_batch_size = embed_batch_size
+          self.queue_size = queue_size
+          self.split_workers = split_workers
+          self.embed_workers = embed_workers
+          self.upsert_workers = upsert_workers
+          self.embed_executor = embed_executor
+          self.embeddings_factory = embeddings_factory
+          self.stats = {}
+
+     # Create the executor running the embedding stage
+     def _executor(self):
+          if self.embed_executor == "process":
+               return ProcessPoolExecutor(max_workers=self.embed_workers, initializer=_init_embed_worker,
+                                          initargs=(self.embeddings_factory,))
+          return ThreadPoolExecutor(max_workers=self.embed_workers)
+
+     # Sample the depth of every queue while the pipeline runs
+     async def _monitor(self, queues, interval=0.05):
+          while True:
+               for name, queue in queues.items():
+                    depth = queue.qsize()
+                    self.stats[name].queue_depth_samples.append(depth)
+                    self.stats[name].max_queue_depth = max(self.stats[name].max_queue_depth, depth)
+               await asyncio.sleep(interval)
+
+     async def run(self, documents):
+          """
+          Runs the pipeline over a stream of documents.
+
+          Args:
+          documents (AsyncIterable[Document] or Iterable[Document]): The pages to ingest (e.g. scrape_url_stream).
+
+          Returns:
+          List[dict]: The statistics of every stage.
+          """
+          loop = asyncio.get_running_loop()
+          self.stats = {name: StageStats(name) for name in ("fetch", "split", "embed", "upsert")}
+          split_queue = asyncio.Queue(self.queue_size)
+          embed_queue = asyncio.Queue(self.queue_size)
+          upsert_queue = asyncio.Queue(self.queue_size)
+          done = object()
+
+          async def fetch():
+               stats = self.stats["fetch"]
+               stats.started = time.perf_counter()
+               if hasattr(documents, "__aiter__"):
+                    async for doc in documents:
+                         stats.items += 1
+                         await split_queue.put(doc)
+               elif iter(documents) is documents:
+                    # Lazy iterators (e.g. PdfIngestor.stream) may block, they are advanced in a thread meanwhile
+                    while (doc := await asyncio.to_thread(next, documents, done)) is not done:
+                         stats.items += 1
+                         await split_queue.put(doc)
+               else:
+                    for doc in documents:
+                         stats.items += 1
+                         await split_queue.put(doc)
+               stats.finished = time.perf_counter()
+               for _ in range(self.split_workers):
+                    await split_queue.put(done)
+
+          async def split():
+               stats = self.stats["split"]
+               stats.started = stats.started or time.perf_counter()
+               batch = []
+               while (doc := await split_queue.get()) is not done:
+                    start = time.perf_counter()
+                    chunks = await asyncio.to_thread(self.split_fn, [doc])
+                    stats.busy_seconds += time.perf_counter() - start
+                    stats.items += len(chunks)
+                    batch.extend(chunks)
+                    # Hand over full batches to the embedding stage
+                    while len(batch) >= self.embed_batch_size:
+                         await embed_queue.put(batch[:self.embed_batch_size])
+                         batch = batch[self.embed_batch_size:]
+               if batch:
+                    await embed_queue.put(batch)
+               stats.finished = time.perf_counter()
+
+          async def embed(executor):
+               stats = self.stats["embed"]
+               stats.started = stats.started or time.perf_counter()
+               while (chunks := await embed_queue.get()) is not done:
+                    start = time.perf_counter()
+                    texts = [chunk.page_content for chunk in chunks]
+                    if self.embed_executor == "process":
+                         vectors = await loop.run_in_executor(executor, _embed_in_worker, texts)
+                    else:
+                         vectors = await loop.run_in_executor(executor, self.embeddings.embed_documents, texts)
+                    stats.busy_seconds += time.perf_counter() - start
+                    stats.items += len(vectors)
+                    await upsert_queue.put((chunks, vectors))
+               stats.finished = time.perf_counter()
+
+          async def upsert():
+               stats = self.stats["upsert"]
+               stats.started = stats.started or time.perf_counter()
+               while (item := await upsert_queue.get()) is not done:
+                    chunks, vectors = item
+                    start = time.perf_counter()
+                    if self.upsert_fn is not None:
+                         if inspect.iscoroutinefunction(self.upsert_fn):
+                              await self.upsert_fn(chunks, vectors)
+                         else:
+                              await asyncio.to_thread(self.upsert_fn, chunks, vectors)
+                    stats.busy_seconds += time.perf_counter() - start
+                    stats.items += len(chunks)
+               stats.finished = time.perf_counter()
+
+          # Run one stage with its workers, then tell every worker of the next stage to stop
+          async def stage(workers, next_queue, next_workers):
+               await _gather_or_cancel(workers)
+               if next_queue is not None:
+                    for _ in range(next_workers):
+                         await next_queue.put(done)
+
+          monitor = asyncio.create_task(self._monitor({"split": split_queue, "embed": embed_queue, "upsert": upsert_queue}))
+          executor = self._executor()
+          try:
+               await _gather_or_cancel([
+                    fetch(),
+                    stage([split() for _ in range(self.split_workers)], embed_queue, self.embed_workers),
+                    stage([embed(executor) for _ in range(self.embed_workers)], upsert_queue, self.upsert_workers),
+                    stage([upsert() for _ in range(self.upsert_workers)], None, 0),
+               ])
+          finally:
+               monitor.cancel()
+               executor.shutdown(wait=False, cancel_futures=True)
+          return [stats.as_dict() for stats in self.stats.values()]
@@ -0,0 +1,453 @@
+import os
+import json
+import time
+import atexit
+import random
+import bisect
+import itertools
+import threading
+import contextvars
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import embedding_model_name
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Id of the span running in the current thread / task, parent of the spans it opens
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+     """
+     Timed section of a pipeline, recorded in its registry when it exits.
+     Labels are metric dimensions (keep them few: stage, pipeline, model...), attributes only go to the trace file.
+     """
+
+     __slots__ = ("registry", "name", "labels", "attributes", "start", "wall_start", "span_id", "parent_id", "_token")
+
+     def __init__(self, registry, name, labels):
+          self.registry = registry
+          self.name = name
+          self.labels = labels
+          self.attributes = {}
+
+     def __enter__(self):
+          self.parent_id = _current_span.get()
+          self.span_id = next(_span_ids)
+          self._token = _current_span.set(self.span_id)
+          self.wall_start = time.time()
+          self.start = time.perf_counter()
+          return self
+
+     def __exit__(self, exc_type, exc, tb):
+          seconds = time.perf_counter() - self.start
+          _current_span.reset(self._token)
+          self.registry.record(self, seconds, error=exc_type is not None)
+          return False
+
+     def set_labels(self, **labels):
+          self.labels.update(labels)
+
+     def set_attributes(self, **attributes):
+          self.attributes.update(attributes)
+
+
+class _SkippedSpan:
+     """
+     Span left out by sampling: does nothing.
+     """
+
+     def __enter__(self):
+          return self
+
+     def __exit__(self, exc_type, exc, tb):
+          return False
+
+     def set_labels(self, **labels):
+          pass
+
+     def set_attributes(self, **attributes):
+          pass
+
+
+_SKIPPED = _SkippedSpan()
+
+
+class _Histogram:
+     __slots__ = ("count", "sum", "buckets")
+
+     def __init__(self, size):
+          self.count = 0
+          self.sum = 0.0
+          self.buckets = [0] * size  # Non-cumulative counts, the last one is +Inf
+
+
+class MetricsRegistry:
+     """
+     In-process registry of the spans (latency histograms), counters and watched statistics
+     of the pipelines. Exported as a JSON lines trace file (one line per recorded span) and as
+     Prometheus text, served over HTTP on demand.
+
+     With sample_rate below 1, only that share of the spans is timed and written (counters stay
+     exact), which keeps the overhead negligible on hot paths.
+     """
+
+     def __init__(self, jsonl_path=None, sample_rate=1.0, buckets=DEFAULT_BUCKETS, flush_every=100):
+          """
+          Args:
+          jsonl_path (str): Trace file the spans are appended to (None = no trace file).
+          sample_rate (float): Share of the spans recorded, between 0 and 1.
+          buckets (tuple): Upper bounds in seconds of the latency histogram buckets.
+          flush_every (int): Number of buffered spans written to the trace file at once.
+          """
+          self.jsonl_path = jsonl_path
+          self.sample_rate = sample_rate
+          self.buckets = tuple(buckets)
+          self.flush_every = flush_every
+          self._counters = {}  # (name, label items) -> value, merged by label set at export time
+          self._histograms = {}  # (span name, label items) -> _Histogram
+          self._watched = {}  # name -> stats source
+          self._events = []  # Spans waiting to be written to the trace file
+          self._lock = threading.Lock()
+          self._server = None
+          atexit.register(self.flush)
+
+     def sampled(self):
+          """
+          Returns:
+          bool: Whether the next span is recorded.
+          """
+          return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+     def span(self, name, **labels):
+          """
+          Times a block of code: "with METRICS.span('vector_search', pipeline='n6'):".
+
+          Args:
+          name (str): Name of the stage.
+          **labels: Metric dimensions of the span.
+
+          Returns:
+          Span: The context manager (a no-op when sampling skips the span).
+          """
+          if not self.sampled():
+               return _SKIPPED
+          return Span(self, name, labels)
+
+     def record(self, span, seconds, error=False):
+          """
+          Records a finished span (called by Span on exit, or directly for spans timed elsewhere).
+
+          Args:
+          span (Span): The span.
+          seconds (float): Its duration.
+          error (bool): The span ended with an exception.
+          """
+          if error:
+               span.labels["status"] = "error"
+          key = (span.name, tuple(span.labels.items()))  # Not sorted here: the hot path stays cheap
+          with self._lock:
+               histogram = self._histograms.get(key)
+               if histogram is None:
+                    histogram = self._histograms[key] = _Histogram(len(self.buckets) + 1)
+               histogram.count += 1
+               histogram.sum += seconds
+               histogram.buckets[bisect.bisect_left(self.buckets, seconds)] += 1
+               if self.jsonl_path:
+                    self._events.append({"ts": span.wall_start, "span": span.name, "seconds": seconds, "labels": span.labels,
+                                         "attributes": span.attributes, "span_id": span.span_id, "parent_id": span.parent_id})
+                    if len(self._events) >= self.flush_every:
+                         self._write_events()
+
+     def inc(self, name, value=1, **labels):
+          """
+          Adds to a counter (always exact, whatever the sample rate).
+
+          Args:
+          name (str): Name of the counter (e.g. "llm_tokens_total").
+          value (float): Amount to add.
+          **labels: Dimensions of the counter.
+          """
+          key = (name, tuple(labels.items()))
+          with self._lock:
+               self._counters[key] = self._counters.get(key, 0) + value
+
+     def watch(self, name, source):
+          """
+          Exports the statistics of a component as gauges, read only at export time (no cost on the hot path).
+
+          Args:
+          name (str): Prefix of the gauges (e.g. "llm_cache").
+          source: A callable returning a dict, an object with a stats() method or a stats dict (e.g. DatasetRegistry).
+          """
+          self._watched[name] = source
+
+     # Current numeric statistics of the watched components
+     def _gauges(self):
+          gauges = {}
+          for name, source in list(self._watched.items()):
+               stats = source() if callable(source) else getattr(source, "stats", source)
+               stats = stats() if callable(stats) else stats
+               for key, value in stats.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                         gauges[f"{name}_{key}"] = value
+          return gauges
+
+     # Counters and histograms merged by sorted label set: {(name, labels): value}, {labels: (count, sum, buckets)}
+     def _series(self):
+          def label_set(items):
+               return tuple(sorted((key, str(value)) for key, value in items))
+
+          counters, histograms = {}, {}
+          with self._lock:
+               for (name, items), value in self._counters.items():
+                    key = (name, label_set(items))
+                    counters[key] = counters.get(key, 0) + value
+               for (name, items), h in self._histograms.items():
+                    key = label_set(items + (("span", name),))
+                    count, total, buckets = histograms.get(key, (0, 0.0, [0] * len(h.buckets)))
+                    histograms[key] = (count + h.count, total + h.sum, [a + b for a, b in zip(buckets, h.buckets)])
+          return counters, histograms
+
+     def snapshot(self):
+          """
+          Returns:
+          dict: Counters, span statistics (count, total, mean seconds) and gauges, as plain values.
+          """
+          counters, histograms = self._series()
+          counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters.items()]
+          spans = [{**dict(labels), "count": count, "seconds": total, "mean_seconds": total / count}
+                   for labels, (count, total, _) in histograms.items()]
+          return {"counters": counters, "spans": spans, "gauges": self._gauges(), "sample_rate": self.sample_rate}
+
+     def prometheus_text(self):
+          """
+          Returns:
+          str: The metrics in the Prometheus text exposition format.
+          """
+          def labels_text(labels, extra=()):
+               pairs = list(labels) + list(extra)
+               if not pairs:
+                    return ""
+               escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+               return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+          lines = []
+          counters, histograms = self._series()
+          counters, histograms = sorted(counters.items()), sorted(histograms.items())
+          for name in sorted({name for (name, _), _ in counters}):
+               lines.append(f"# TYPE {name} counter")
+               lines += [f"{name}{labels_text(labels)} {value}" for (n, labels), value in counters if n == name]
+          if histograms:
+               lines.append("# TYPE span_seconds histogram")
+          for labels, (count, total, buckets) in histograms:
+               cumulative = 0
+               for bound, bucket in zip(self.buckets + ("+Inf",), buckets):
+                    cumulative += bucket
+                    lines.append(f"span_seconds_bucket{labels_text(labels, [('le', bound)])} {cumulative}")
+               lines.append(f"span_seconds_sum{labels_text(labels)} {total}")
+               lines.append(f"span_seconds_count{labels_text(labels)} {count}")
+          for name, value in sorted(self._gauges().items()):
+               lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+          lines += ["# TYPE instrumentation_sample_rate gauge", f"instrumentation_sample_rate {self.sample_rate}"]
+          return "\n".join(lines) + "\n"
+
+     # Append the buffered spans to the trace file (with the lock held)
+     def _write_events(self):
+          events, self._events = self._events, []
+          with open(self.jsonl_path, "a") as f:
+               f.write("".join(json.dumps(event, default=str) + "\n" for event in events))
+
+     def flush(self):
+          """
+          Writes the buffered spans to the trace file.
+          """
+          with self._lock:
+               if self.jsonl_path and self._events:
+                    self._write_events()
+
+     def serve(self, port=9100, host="127.0.0.1"):
+          """
+          Serves the Prometheus text at http://host:port/metrics from a background thread.
+
+          Args:
+          port (int): The port to listen on.
+          host (str): The interface to listen on.
+
+          Returns:
+          ThreadingHTTPServer: The server (call shutdown() to stop it).
+          """
+          registry = self
+
+          class Handler(BaseHTTPRequestHandler):
+               def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                         self.send_error(404)
+                         return
+                    body = registry.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+               def log_message(self, *args):
+                    pass
+
+          self._server = ThreadingHTTPServer((host, port), Handler)
+          threading.Thread(target=self._server.serve_forever, daemon=True).start()
+          return self._server
+
+     def reset(self):
+          """
+          Clears the counters and spans (the watched components stay).
+          """
+          with self._lock:
+               self._counters.clear()
+               self._histograms.clear()
+               self._events.clear()
+
+
+# Registry shared by the pipelines, configured from the environment:
+# INSTRUMENTATION_JSONL (trace file), INSTRUMENTATION_SAMPLE_RATE (0 to 1), INSTRUMENTATION_PORT (serve /metrics)
+METRICS = MetricsRegistry(jsonl_path=os.environ.get("INSTRUMENTATION_JSONL") or None,
+                          sample_rate=float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", "1")))
+if os.environ.get("INSTRUMENTATION_PORT"):
+     METRICS.serve(int(os.environ["INSTRUMENTATION_PORT"]))
+
+# Function to time every call of a function: "@traced('csv_analyzer', pipeline='n4')"
+def traced(name, registry=None, **labels):
+     def decorator(fn):
+          def wrapper(*args, **kwargs):
+               with (registry or METRICS).span(name, **labels):
+                    return fn(*args, **kwargs)
+          wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = fn.__name__, fn.__doc__, fn
+          return wrapper
+     return decorator
+
+# Function to find the model of an LLM call in the callback arguments
+def _model_name(serialized, kwargs):
+     metadata = kwargs.get("metadata") or {}
+     params = kwargs.get("invocation_params") or {}
+     return (metadata.get("ls_model_name") or params.get("model_name") or params.get("model")
+             or (serialized or {}).get("name") or "unknown")
+
+
+class InstrumentationCallbackHandler(BaseCallbackHandler):
+     """
+     LangChain callback handler recording the LLM calls (latency, time to first token,
+     token usage, errors), tool calls and retriever calls of a pipeline into a registry.
+     Pass it in the callbacks of a model or chain: OpenAI(callbacks=[InstrumentationCallbackHandler(pipeline="n2")]).
+     """
+
+     def __init__(self, registry=None, pipeline=None):
+          """
+          Args:
+          registry (MetricsRegistry): Where the metrics go (default: METRICS).
+          pipeline (str): Label of the pipeline (e.g. "n2").
+          """
+          self.registry = registry or METRICS
+          self.labels = {"pipeline": pipeline} if pipeline else {}
+          self._runs = {}  # run_id -> (span, first token seen)
+
+     # Open a span for a run (None when sampling skips it)
+     def _start(self, run_id, name, **labels):
+          span = self.registry.span(name, **self.labels, **labels)
+          if isinstance(span, Span):
+               span.__enter__()
+               self._runs[run_id] = [span, False]
+
+     def _end(self, run_id, error=False):
+          run = self._runs.pop(run_id, None)
+          if run is not None:
+               span = run[0]
+               _current_span.set(span.parent_id)  # Callbacks may end in another context than they started
+               self.registry.record(span, time.perf_counter() - span.start, error=error)
+          return run
+
+     def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+          self._start(run_id, "llm", model=_model_name(serialized, kwargs))
+
+     def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+          self._start(run_id, "llm", model=_model_name(serialized, kwargs))
+
+     def on_llm_new_token(self, token, *, run_id, **kwargs):
+          run = self._runs.get(run_id)
+          if run is not None and not run[1]:
+               run[1] = True
+               run[0].set_attributes(ttft_seconds=time.perf_counter() - run[0].start)
+
+     def on_llm_end(self, response, *, run_id, **kwargs):
+          run = self._runs.get(run_id)
+          model = run[0].labels.get("model", "unknown") if run is not None else "unknown"
+          usage = (response.llm_output or {}).get("token_usage") or {}
+          if not usage:
+               # Chat models report the usage on the messages
+               for generations in response.generations:
+                    for generation in generations:
+                         metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                         for key, name in (("input_tokens", "prompt_tokens"), ("output_tokens", "completion_tokens")):
+                              usage[name] = usage.get(name, 0) + metadata.get(key, 0)
+          for kind in ("prompt", "completion"):
+               if usage.get(f"{kind}_tokens"):
+                    self.registry.inc("llm_tokens_total", usage[f"{kind}_tokens"], model=model, type=kind, **self.labels)
+          if run is not None:
+               run[0].set_attributes(**{key: value for key, value in usage.items() if isinstance(value, int)})
+          self.registry.inc("llm_requests_total", model=model, **self.labels)
+          self._end(run_id)
+
+     def on_llm_error(self, error, *, run_id, **kwargs):
+          self.registry.inc("llm_errors_total", **self.labels)
+          self._end(run_id, error=True)
+
+     def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+          self._start(run_id, "tool", tool=(serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+     def on_tool_end(self, output, *, run_id, **kwargs):
+          self._end(run_id)
+
+     def on_tool_error(self, error, *, run_id, **kwargs):
+          self._end(run_id, error=True)
+
+     def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+          self._start(run_id, "retriever")
+
+     def on_retriever_end(self, documents, *, run_id, **kwargs):
+          self._end(run_id)
+
+     def on_retriever_error(self, error, *, run_id, **kwargs):
+          self._end(run_id, error=True)
+
+
+class InstrumentedEmbeddings(Embeddings):
+     """
+     Embeddings wrapper timing the calls of the wrapped model and counting the embedded texts.
+     Wrap the model itself (inside CachedEmbeddings) to measure the real embedding calls only.
+     """
+
+     def __init__(self, embeddings, registry=None, pipeline=None):
+          """
+          Args:
+          embeddings (Embeddings): The embeddings instance to wrap.
+          registry (MetricsRegistry): Where the metrics go (default: METRICS).
+          pipeline (str): Label of the pipeline (e.g. "n1").
+          """
+          self.embeddings = embeddings
+          self.registry = registry or METRICS
+          self.model = embedding_model_name(embeddings)  # Keeps the cache keys of CachedEmbeddings unchanged
+          self.labels = {"model": self.model, **({"pipeline": pipeline} if pipeline else {})}
+
+     def embed_documents(self, texts):
+          self.registry.inc("embedded_texts_total", len(texts), **self.labels)
+          with self.registry.span("embed", **self.labels):
+               return self.embeddings.embed_documents(texts)
+
+     def embed_query(self, text):
+          self.registry.inc("embedded_texts_total", 1, **self.labels)
+          with self.registry.span("embed", **self.labels):
+               return self.embeddings.embed_query(text)
@@ -0,0 +1,328 @@
+import os
+import re
+import json
+
+import numpy as np
+from langchain_core.documents import Document
+
+from vector_upsert import chunk_id
+
+# Default location of the saved index, next to the 'data' folder outside the 'src' folder
+DEFAULT_LEXICAL_INDEX_DIR = '../data/.lexical_index'
+
+# Words of the texts and the queries (lowercased, so "GPT-4" is "gpt" and "4")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Constant of reciprocal rank fusion, dampens the weight of the first ranks
+RRF_K = 60
+
+# Queries with at most this many words can be answered by the lexical index alone
+MAX_LEXICAL_ONLY_TERMS = 3
+
+# Function to split a text into index terms
+def tokenize(text):
+     return TOKEN_PATTERN.findall(text.lower())
+
+# Function to build the key of a chunk, the same id as the vector store (so lexical and vector hits can be fused)
+def doc_key(doc):
+     return chunk_id(doc.metadata.get("source"), doc.page_content)
+
+
+class BM25Index:
+     """
+     Local BM25 inverted index of the chunks, built alongside the vector index.
+
+     Postings are stored in compressed sparse rows: for term t, the chunks containing it are
+     doc_ids[offsets[t]:offsets[t + 1]] with their term frequencies in term_freqs, so the whole
+     index is a handful of numpy arrays and a query is scored with vectorized operations.
+     Added and deleted chunks are buffered and merged into the arrays in one pass on commit.
+
+     The index directory holds:
+     index.npz       - offsets, doc_ids, term_freqs and doc_lengths arrays
+     index.json      - the vocabulary (term of every row of offsets) and the chunks (id, text, metadata)
+     """
+
+     def __init__(self, index_dir=DEFAULT_LEXICAL_INDEX_DIR, k1=1.5, b=0.75):
+          """
+          Args:
+          index_dir (str): Directory where the index is saved (None = memory only).
+          k1 (float): BM25 term frequency saturation.
+          b (float): BM25 length normalization.
+          """
+          self.index_dir = index_dir
+          self.k1 = k1
+          self.b = b
+          self.vocabulary = {}  # term -> term id
+          self.ids, self.texts, self.metadatas = [], [], []
+          self.offsets = np.zeros(1, dtype=np.int64)
+          self.doc_ids = np.zeros(0, dtype=np.int32)
+          self.term_freqs = np.zeros(0, dtype=np.uint16)
+          self.doc_lengths = np.zeros(0, dtype=np.int32)
+          self._positions = {}  # chunk id -> position in ids
+          self._norms = None  # BM25 length normalization of every chunk, computed once per commit
+          self._pending = {}  # chunk id -> (text, metadata) waiting for commit
+          self._deleted = set()  # chunk ids waiting for commit
+
+     # Paths of the files making up the index
+     def _path(self, suffix):
+          return os.path.join(self.index_dir, "index" + suffix)
+
+     def exists(self):
+          return self.index_dir is not None and os.path.exists(self._path(".npz"))
+
+     @classmethod
+     def load(cls, index_dir=DEFAULT_LEXICAL_INDEX_DIR, **options):
+          """
+          Loads the saved index, or returns an empty one when nothing was saved yet.
+
+          Args:
+          index_dir (str): Directory of the saved index.
+          **options: k1 and b.
+
+          Returns:
+          BM25Index: The index.
+          """
+          index = cls(index_dir, **options)
+          if index.exists():
+               arrays = np.load(index._path(".npz"))
+               index.offsets, index.doc_ids = arrays["offsets"], arrays["doc_ids"]
+               index.term_freqs, index.doc_lengths = arrays["term_freqs"], arrays["doc_lengths"]
+               with open(index._path(".json")) as f:
+                    saved = json.load(f)
+               index.vocabulary = {term: i for i, term in enumerate(saved["terms"])}
+               index.ids, index.texts, index.metadatas = saved["ids"], saved["texts"], saved["metadatas"]
+               index._positions = {id_: i for i, id_ in enumerate(index.ids)}
+          return index
+
+     def save(self):
+          """
+          Commits the pending changes and writes the index to disk (each file is replaced atomically).
+          """
+          self.commit()
+          os.makedirs(self.index_dir, exist_ok=True)
+          with open(self._path(".npz.tmp"), "wb") as f:
+               np.savez(f, offsets=self.offsets, doc_ids=self.doc_ids, term_freqs=self.term_freqs, doc_lengths=self.doc_lengths)
+          os.replace(self._path(".npz.tmp"), self._path(".npz"))
+          with open(self._path(".json.tmp"), "w") as f:
+               json.dump({"terms": list(self.vocabulary), "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+          os.replace(self._path(".json.tmp"), self._path(".json"))
+
+     def __len__(self):
+          return len(self.ids) + len(self._pending) - len(self._deleted & self._positions.keys())
+
+     def add_documents(self, docs, ids=None):
+          """
+          Adds (or replaces) chunks, indexed on the next commit.
+
+          Args:
+          docs (List[Document]): The chunks.
+          ids (List[str]): Their ids (default: chunk_id of their source and text, like VectorUpserter).
+
+          Returns:
+          List[str]: The ids of the chunks.
+          """
+          ids = ids or [doc_key(doc) for doc in docs]
+          for id_, doc in zip(ids, docs):
+               self._pending[id_] = (doc.page_content, dict(doc.metadata))
+               if id_ in self._positions:
+                    self._deleted.add(id_)  # Replaced: the indexed version goes away on commit
+          return ids
+
+     def delete(self, ids):
+          """
+          Deletes chunks by id, on the next commit.
+
+          Args:
+          ids (List[str]): The ids to delete.
+          """
+          for id_ in ids:
+               self._pending.pop(id_, None)
+               if id_ in self._positions:
+                    self._deleted.add(id_)
+
+     def commit(self):
+          """
+          Merges the pending additions and deletions into the posting arrays.
+          """
+          if not self._pending and not self._deleted:
+               return
+          # Current postings as (term, doc, frequency) triples, without the deleted chunks
+          terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+          keep = np.ones(len(self.ids), dtype=bool)
+          keep[[self._positions[id_] for id_ in self._deleted if id_ in self._positions]] = False
+          new_position = np.cumsum(keep) - 1
+          kept = keep[self.doc_ids]
+          terms, docs, freqs = terms[kept], new_position[self.doc_ids[kept]], self.term_freqs[kept]
+          self.ids = [id_ for id_, k in zip(self.ids, keep) if k]
+          self.texts = [text for text, k in zip(self.texts, keep) if k]
+          self.metadatas = [metadata for metadata, k in zip(self.metadatas, keep) if k]
+          lengths = [self.doc_lengths[keep]]
+
+          # Postings of the pending chunks
+          new_terms, new_docs, new_freqs, new_lengths = [], [], [], []
+          for id_, (text, metadata) in self._pending.items():
+               tokens = tokenize(text)
+               term_ids, counts = np.unique([self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens],
+                                            return_counts=True)
+               new_terms.append(term_ids)
+               new_docs.append(np.full(len(term_ids), len(self.ids), dtype=np.int64))
+               new_freqs.append(np.minimum(counts, np.iinfo(np.uint16).max))
+               new_lengths.append(len(tokens))
+               self.ids.append(id_)
+               self.texts.append(text)
+               self.metadatas.append(metadata)
+          terms = np.concatenate([terms] + new_terms).astype(np.int64)
+          docs = np.concatenate([docs] + new_docs).astype(np.int32)
+          freqs = np.concatenate([freqs] + new_freqs).astype(np.uint16)
+
+          # Back to compressed sparse rows, sorted by term then chunk
+          order = np.lexsort((docs, terms))
+          self.doc_ids, self.term_freqs = docs[order], freqs[order]
+          self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))]).astype(np.int64)
+          self.doc_lengths = np.concatenate(lengths + [np.asarray(new_lengths, dtype=np.int32)]).astype(np.int32)
+          self._positions = {id_: i for i, id_ in enumerate(self.ids)}
+          self._pending, self._deleted = {}, set()
+          self._norms = None
+
+     # Postings of a term: (chunk positions, term frequencies)
+     def _postings(self, term_id):
+          start, end = self.offsets[term_id], self.offsets[term_id + 1]
+          return self.doc_ids[start:end], self.term_freqs[start:end]
+
+     def _document(self, position):
+          return Document(page_content=self.texts[position], metadata=self.metadatas[position], id=self.ids[position])
+
+     def search(self, query, k=4):
+          """
+          Ranks the chunks by BM25 score.
+
+          Args:
+          query (str): The user query.
+          k (int): Number of chunks to return.
+
+          Returns:
+          List[Tuple[Document, float]]: The best chunks with their scores (only chunks containing a query word).
+          """
+          self.commit()
+          term_ids = [self.vocabulary[t] for t in dict.fromkeys(tokenize(query)) if t in self.vocabulary]
+          n = len(self.ids)
+          if not term_ids or n == 0:
+               return []
+          if self._norms is None:
+               self._norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(1.0, self.doc_lengths.mean()))
+          norms = self._norms
+          scores = np.zeros(n, dtype=np.float32)
+          for term_id in term_ids:
+               docs, freqs = self._postings(term_id)
+               idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+               freqs = freqs.astype(np.float32)
+               scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norms[docs])
+          matched = np.flatnonzero(scores)
+          top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+          return [(self._document(i), float(scores[i])) for i in top]
+
+     def exact_match(self, query, doc, max_df_share=0.01):
+          """
+          Tells if a lexical hit is enough to answer a query: every indexed word of the query appears
+          in the document, and one of them is rare in the index (a name or a code, not a common word).
+
+          Args:
+          query (str): The user query.
+          doc (Document): The best lexical hit.
+          max_df_share (float): Largest share of the chunks containing the rare word.
+
+          Returns:
+          bool: The hit matches the query exactly.
+          """
+          self.commit()
+          terms = [term for term in set(tokenize(query)) if term in self.vocabulary]
+          if not terms or not set(terms) <= set(tokenize(doc.page_content)):
+               return False
+          rarest = min(len(self._postings(self.vocabulary[term])[0]) for term in terms)
+          return rarest <= max(1, max_df_share * len(self.ids))
+
+
+class HybridUpserter:
+     """
+     Upsert step feeding the vector index and the lexical index together, so both hold the same
+     chunks under the same ids. Callable as upsert(chunks, vectors), like VectorUpserter.
+     """
+
+     def __init__(self, upserter, lexical_index):
+          """
+          Args:
+          upserter (VectorUpserter): Upsert layer of the vector index.
+          lexical_index (BM25Index): The lexical index (saved by the caller once the ingest is done).
+          """
+          self.upserter = upserter
+          self.lexical_index = lexical_index
+
+     @property
+     def stats(self):
+          return self.upserter.stats
+
+     def upsert(self, chunks, vectors):
+          ids = self.upserter.upsert(chunks, vectors)
+          self.lexical_index.add_documents(chunks, ids)
+          return ids
+
+     __call__ = upsert
+
+     def delete(self, ids):
+          ids = list(ids)
+          self.upserter.delete(ids)
+          self.lexical_index.delete(ids)
+
+# Function to merge rankings with reciprocal rank fusion
+def reciprocal_rank_fusion(rankings, k=RRF_K, weights=None):
+     """
+     Scores every item by sum(weight / (k + rank)) over the rankings it appears in.
+
+     Args:
+     rankings (List[List[str]]): Item keys, best first, one list per retriever.
+     k (int): Rank constant.
+     weights (List[float]): Weight of every ranking (default: 1 each).
+
+     Returns:
+     List[Tuple[str, float]]: The keys with their fused scores, best first.
+     """
+     scores = {}
+     for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+          for rank, key in enumerate(ranking, 1):
+               scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+     return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+# Function to retrieve chunks with the lexical and the vector index together
+def hybrid_search(db, lexical_index, query, k=4, fetch_k=20, mode="auto"):
+     """
+     Fuses BM25 and vector search with reciprocal rank fusion. Short queries whose words all
+     match the best lexical hit exactly (product names, codes) skip the embedding call.
+
+     Args:
+     db (VectorStore): The Pinecone (or FAISS) vector store.
+     lexical_index (BM25Index): The lexical index of the same chunks.
+     query (str): The user query.
+     k (int): Number of chunks to return.
+     fetch_k (int): Number of candidates taken from each index before fusion.
+     mode (str): "hybrid", "lexical" (no embedding call), "vector", or "auto" (lexical when it is enough).
+
+     Returns:
+     List[Document]: The most relevant chunks.
+     """
+     if mode not in ("auto", "hybrid", "lexical", "vector"):
+          raise ValueError(f"Unknown search mode '{mode}', expected auto, hybrid, lexical or vector")
+     lexical_hits = lexical_index.search(query, fetch_k) if mode != "vector" else []
+     if mode == "auto" and lexical_hits and len(tokenize(query)) <= MAX_LEXICAL_ONLY_TERMS \
+               and lexical_index.exact_match(query, lexical_hits[0][0]):
+          mode = "lexical"
+     if mode == "lexical":
+          return [doc for doc, _ in lexical_hits[:k]]
+     vector_docs = db.similarity_search(query, k=fetch_k)
+     if mode == "vector":
+          return vector_docs[:k]
+
+     docs = {}
+     for doc in [doc for doc, _ in lexical_hits] + vector_docs:
+          docs.setdefault(doc_key(doc), doc)
+     fused = reciprocal_rank_fusion([[doc_key(doc) for doc, _ in lexical_hits], [doc_key(doc) for doc in vector_docs]])
+     return [docs[key] for key, _ in fused[:k]]
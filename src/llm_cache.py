@@ -0,0 +1,308 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np  # Prompt embeddings of the semantic lookup
+from langchain_core.caches import BaseCache  # Extension point of every LangChain LLM / chat model (cache=...)
+from langchain_core.outputs import Generation, ChatGeneration
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+# Default location of the cache, next to the 'data' folder outside the 'src' folder
+DEFAULT_CACHE_PATH = '../data/.llm_cache.sqlite'
+
+# Marker of the user question in the few-shot prompts (the suffix of data/personas.json)
+QUESTION_MARKER = "Question:"
+
+# Function to hash a text into the hex key of a cache row
+def cache_key(*parts):
+     """
+     Hashes the given strings into one key.
+
+     Args:
+     *parts (str): The strings to hash (e.g. the LLM string and the formatted prompt).
+
+     Returns:
+     str: Hex sha256 of the parts.
+     """
+     digest = hashlib.sha256()
+     for part in parts:
+          digest.update(part.encode("utf-8"))
+          digest.update(b"\0")
+     return digest.hexdigest()
+
+# Function to split a prompt into its template part and its question, for the semantic lookup
+def split_question(prompt, marker=QUESTION_MARKER):
+     """
+     Splits a prompt at the last occurrence of the question marker.
+
+     Args:
+     prompt (str): The formatted prompt.
+     marker (str): The text introducing the user question.
+
+     Returns:
+     Tuple[str, str]: The template part (up to the marker) and the question, or None when the prompt has no marker.
+     """
+     position = prompt.rfind(marker)
+     if position < 0:
+          return None
+     end = position + len(marker)
+     return prompt[:end], prompt[end:]
+
+# Function to serialize the generations of an LLM call (text completions and chat messages)
+def dump_generations(generations):
+     records = []
+     for generation in generations:
+          if isinstance(generation, ChatGeneration):
+               records.append({"message": message_to_dict(generation.message)})
+          else:
+               records.append({"text": generation.text})
+     return json.dumps(records)
+
+# Function to rebuild the generations stored by dump_generations
+def load_generations(data):
+     generations = []
+     for record in json.loads(data):
+          if "message" in record:
+               generations.append(ChatGeneration(message=messages_from_dict([record["message"]])[0]))
+          else:
+               generations.append(Generation(text=record["text"]))
+     return generations
+
+
+class SQLiteLLMCache(BaseCache):
+     """
+     Response cache for LangChain LLMs and chat models, stored in a local SQLite file.
+
+     Entries are keyed on the LLM string (model, temperature and the other call parameters)
+     and the full formatted prompt. They expire after a TTL, and the least recently used
+     entries are evicted beyond max_entries. With an embeddings instance, a prompt without
+     an exact match can be served by the entry of a near-duplicate question (cosine
+     similarity >= similarity_threshold) asked with the same model, parameters and template:
+     only the question is embedded, as few-shot prompts are mostly the same text.
+     The SQLite file is opened on first use.
+
+     Plug it into a model with cache=llm_cache.cache_option(temperature): calls at
+     temperature 0 are cached, higher temperatures only when cache_nondeterministic is set.
+     """
+
+     def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_entries=10_000, embeddings=None,
+                  similarity_threshold=0.95, cache_nondeterministic=False, split_prompt=split_question):
+          """
+          Args:
+          path (str): The SQLite file (":memory:" for a cache that lives as long as the process).
+          ttl (float): Seconds before an entry expires (None = never).
+          max_entries (int): Maximum number of entries, the least recently used ones are evicted.
+          embeddings (Embeddings): Embedding model of the semantic lookup (None = exact matches only).
+          similarity_threshold (float): Minimum cosine similarity of a semantic match.
+          cache_nondeterministic (bool): Also cache calls with a temperature above 0.
+          split_prompt (Callable): Splits a prompt into (template, question), None for prompts without semantic lookup.
+          """
+          self.path = path
+          self.ttl = ttl
+          self.max_entries = max_entries
+          self.embeddings = embeddings
+          self.similarity_threshold = similarity_threshold
+          self.cache_nondeterministic = cache_nondeterministic
+          self.split_prompt = split_prompt
+          self.hits = 0
+          self.semantic_hits = 0
+          self.misses = 0
+          self._vectors = {}  # template_key -> [keys, unit vectors matrix, rows used] of the semantic lookup
+          self._miss_vectors = {}  # key -> question vector of a missed lookup, reused by the update that follows
+          self._lock = threading.Lock()  # Async lookups run in a thread pool
+          self._conn = None
+
+     # The SQLite connection, opened (and the table created) on first use
+     def _db(self):
+          if self._conn is None:
+               conn = sqlite3.connect(self.path, check_same_thread=False)
+               conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                         key TEXT PRIMARY KEY,
+                         llm_key TEXT NOT NULL,
+                         prompt TEXT NOT NULL,
+                         response TEXT NOT NULL,
+                         vector BLOB,
+                         created REAL NOT NULL,
+                         last_access REAL NOT NULL,
+                         template_key TEXT
+                    )""")
+               # Files written before the semantic lookup matched on the question only
+               columns = [row[1] for row in conn.execute("PRAGMA table_info(responses)")]
+               if "template_key" not in columns:
+                    conn.execute("ALTER TABLE responses ADD COLUMN template_key TEXT")
+               conn.execute("CREATE INDEX IF NOT EXISTS responses_template_key ON responses (template_key)")
+               conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+               conn.commit()
+               self._conn = conn
+          return self._conn
+
+     def cache_option(self, temperature):
+          """
+          Chooses the cache argument of a model created with the given temperature.
+
+          Args:
+          temperature (float): The temperature of the model.
+
+          Returns:
+          SQLiteLLMCache or bool: This cache, or False (no caching) for a non-deterministic model.
+          """
+          if temperature == 0 or self.cache_nondeterministic:
+               return self
+          return False
+
+     # Key of the semantic group of a prompt: model, parameters and template (None = exact matches only)
+     def _semantic_key(self, llm_string, prompt):
+          parts = self.split_prompt(prompt) if self.embeddings is not None else None
+          return cache_key(llm_string, parts[0]) if parts else None
+
+     # Unit vector of the question of a prompt for the semantic lookup
+     def _embed(self, prompt):
+          vector = np.asarray(self.embeddings.embed_query(self.split_prompt(prompt)[1]), dtype=np.float32)
+          return vector / (np.linalg.norm(vector) or 1.0)
+
+     # Oldest creation time still valid
+     def _expiry(self):
+          return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+     # Question vectors of a semantic group, loaded from the file once and then appended to by update
+     def _group(self, template_key):
+          if template_key not in self._vectors:
+               rows = self._db().execute(
+                    "SELECT key, vector FROM responses WHERE template_key = ? AND vector IS NOT NULL AND created >= ?",
+                    (template_key, self._expiry())).fetchall()
+               keys = [row[0] for row in rows]
+               matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+               self._vectors[template_key] = [keys, matrix, len(keys)]
+          return self._vectors[template_key]
+
+     # Add a question vector to its group (if loaded, otherwise it is read from the file), doubling the matrix when full
+     def _append_vector(self, template_key, key, vector):
+          if template_key not in self._vectors:
+               return
+          group = self._vectors[template_key]
+          keys, matrix, count = group
+          if matrix is None or matrix.shape[1] != vector.shape[0]:
+               matrix, count = np.empty((16, vector.shape[0]), dtype=np.float32), 0
+               keys.clear()
+          elif count == len(matrix):
+               matrix = np.concatenate([matrix, np.empty_like(matrix)])
+          matrix[count] = vector
+          keys.append(key)
+          group[1], group[2] = matrix, count + 1
+
+     # Best near-duplicate question among the entries of the same semantic group
+     def _semantic_match(self, template_key, vector):
+          keys, matrix, count = self._group(template_key)
+          if matrix is None or count == 0 or matrix.shape[1] != vector.shape[0]:
+               return None
+          scores = matrix[:count] @ vector
+          best = int(np.argmax(scores))
+          return keys[best] if scores[best] >= self.similarity_threshold else None
+
+     def lookup(self, prompt, llm_string):
+          """
+          Looks up the response of a prompt (called by LangChain before every model call).
+
+          Args:
+          prompt (str): The formatted prompt (serialized messages for chat models).
+          llm_string (str): The model and its call parameters.
+
+          Returns:
+          List[Generation]: The cached generations, or None.
+          """
+          key = cache_key(llm_string, prompt)
+          template_key = self._semantic_key(llm_string, prompt)
+          with self._lock:
+               row = self._db().execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+          semantic = False
+          vector = None
+          if (row is None or row[1] < self._expiry()) and template_key is not None:
+               vector = self._embed(prompt)  # Model call outside the lock, other threads keep reading the cache
+          with self._lock:
+               conn = self._db()
+               if vector is not None:
+                    match = self._semantic_match(template_key, vector)
+                    if match is not None:
+                         row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (match,)).fetchone()
+                         semantic = True
+                    if row is None or row[1] < self._expiry():
+                         if len(self._miss_vectors) >= 1024:
+                              self._miss_vectors.clear()  # Misses never followed by an update (failed calls)
+                         self._miss_vectors[key] = vector
+                    else:
+                         key = match
+               if row is None or row[1] < self._expiry():
+                    self.misses += 1
+                    return None
+               conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+               conn.commit()
+               self.hits += 1
+               self.semantic_hits += semantic
+          return load_generations(row[0])
+
+     def update(self, prompt, llm_string, return_val):
+          """
+          Stores the response of a prompt (called by LangChain after a cache miss).
+
+          Args:
+          prompt (str): The formatted prompt.
+          llm_string (str): The model and its call parameters.
+          return_val (List[Generation]): The generations of the model.
+          """
+          key = cache_key(llm_string, prompt)
+          template_key = self._semantic_key(llm_string, prompt)
+          with self._lock:
+               vector = self._miss_vectors.pop(key, None)
+          if template_key is not None and vector is None:
+               vector = self._embed(prompt)  # Not looked up first (or the lookup was an exact match of an expired entry)
+          now = time.time()
+          with self._lock:
+               conn = self._db()
+               conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, llm_key, prompt, response, vector, created, last_access, template_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, cache_key(llm_string), prompt, dump_generations(return_val),
+                     vector.tobytes() if vector is not None else None, now, now, template_key))
+               evicted = self._evict()
+               conn.commit()
+               if evicted:
+                    self._vectors.clear()  # Rebuilt from the file without the evicted entries
+               elif template_key is not None:
+                    self._append_vector(template_key, key, vector)
+
+     # Drop the expired entries, then the least recently used ones beyond max_entries; returns the number of deleted rows
+     def _evict(self):
+          deleted = 0
+          if self.ttl is not None:
+               deleted += self._conn.execute("DELETE FROM responses WHERE created < ?", (self._expiry(),)).rowcount
+          excess = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+          if excess > 0:
+               deleted += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,)).rowcount
+          return deleted
+
+     def clear(self, **kwargs):
+          """
+          Removes every entry of the cache.
+          """
+          with self._lock:
+               self._db().execute("DELETE FROM responses")
+               self._db().commit()
+               self._vectors.clear()
+               self._miss_vectors.clear()
+
+     def stats(self):
+          """
+          Returns the hit-rate metrics of the cache.
+
+          Returns:
+          dict: Hits (exact and semantic), misses, hit rate and number of entries.
+          """
+          with self._lock:
+               entries = self._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+          lookups = self.hits + self.misses
+          return {"hits": self.hits, "semantic_hits": self.semantic_hits, "misses": self.misses,
+                  "hit_rate": self.hits / lookups if lookups else 0.0, "entries": entries}
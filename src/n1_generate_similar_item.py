@@ -1,13 +1,21 @@
 import os  
-from langchain_openai import OpenAIEmbeddings  # To generate embeddings for similarity search
-from langchain_community.vectorstores import FAISS  # For similarity search using FAISS
+from providers import PROVIDERS  # Shared embedding models and clients, imported on first use
+from faiss_index_store import FaissIndexStore  # Saved FAISS index, updated only for new or changed rows
+from batch_search import similarity_search_batch  # Many lookups with one embedding call and one FAISS search
 from dotenv import load_dotenv  # To load environment variables from a .env file
+from embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_model_name  # Persistent cache so unchanged rows are never re-embedded
+from instrumentation import METRICS, InstrumentedEmbeddings  # Stage timings, counters and cache statistics of the pipeline
 
 # Load environment variables from the .env file
 load_dotenv()
 
-# Initialize the OpenAIEmbeddings object to generate vector embeddings
-embeddings = OpenAIEmbeddings()
+# Initialize the OpenAIEmbeddings object to generate vector embeddings,
+# wrapped in an on-disk cache so a restart over an unchanged CSV makes zero embedding calls
+# (the inner model is instrumented, so only the real embedding calls are timed)
+model = PROVIDERS.embeddings("openai")
+embeddings = CachedEmbeddings(InstrumentedEmbeddings(model, pipeline="n1"),
+                              EmbeddingCache('../data/.embedding_cache', model_name=embedding_model_name(model)))
+METRICS.watch("n1_embedding_cache", embeddings.cache)
 
 # Import CSVLoader to load data from a CSV file
 from langchain.document_loaders.csv_loader import CSVLoader
@@ -29,20 +37,44 @@ data = loader.load()
 print("Loaded data from CSV:")
 print(data)
 
-# Initialize the FAISS vector store with the documents and embeddings
-db = FAISS.from_documents(data, embeddings)
+# FAISS index type: "flat" (exact brute force) for small catalogs, "ivf_flat", "hnsw" or "ivf_pq" for millions of rows
+# (see benchmarks/bench_ann_indexes.py for the recall vs latency trade-off of each type)
+INDEX_TYPE = "flat"
+INDEX_PARAMS = {"nlist": 1024, "nprobe": 16, "ef_search": 64}  # Build and search parameters of the approximate types
+
+# Load the saved FAISS vector store and embed only the rows that are new or changed since the last run
+index_store = FaissIndexStore(embeddings, '../data/.faiss_index', index_type=INDEX_TYPE, index_params=INDEX_PARAMS)
+with METRICS.span("index_sync", pipeline="n1"):
+    db = index_store.sync(data)
+print("FAISS index sync:", index_store.last_sync)
+
+# Display how many rows were served from the embedding cache
+print("Embedding cache:", embeddings.cache.stats())
 
 # user input for similarity search
 user_input = "watch"  
 
 # Perform similarity search using the hardcoded input
-docs = db.similarity_search(user_input)
+with METRICS.span("similarity_search", pipeline="n1"):
+    docs = db.similarity_search(user_input)
 
 # Display the top matches
 print("\nTop Matches:")
 print(docs[0])  # Print the first match
 print(docs[1].page_content)  # Print the content of the second match
 
+# Several user inputs are answered together: one batched embedding call and one FAISS search
+user_inputs = ["watch", "phone", "cable"]
+with METRICS.span("similarity_search_batch", pipeline="n1"):
+    batch_results = similarity_search_batch(db, user_inputs, k=2, symmetric=True)  # OpenAI embeds queries like documents
+
+print("\nTop Matches (batch):")
+for query, matches in zip(user_inputs, batch_results):
+    print(query, "->", [(doc.page_content, round(score, 4)) for doc, score in matches])
+
+# Display the stage timings and counters of the run (also written to INSTRUMENTATION_JSONL when it is set)
+print("\nMetrics:", METRICS.snapshot())
+
 """
 Faiss is a library — developed by Facebook AI — that enables efficient similarity search. 
 So, given a set of vectors, we can index them using Faiss — then using another 
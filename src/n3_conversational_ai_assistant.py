@@ -1,17 +1,31 @@
-from langchain_openai import OpenAI  # LangChain's OpenAI wrapper
+from providers import PROVIDERS  # Shared OpenAI clients (imported on first use, pooled HTTP connections)
 from langchain.chains import ConversationChain
 from langchain.chains.conversation.memory import (
     ConversationSummaryMemory  # Used to store and summarize conversation history
 )
+from streaming import StreamMetrics, stream_conversation, astream_conversation  # Token streaming of the answer
+from session_manager import SessionManager  # One conversation per user, with bounded memory
+from instrumentation import METRICS, InstrumentationCallbackHandler  # Latency and token usage of the LLM calls
 
 API_Key = "your_openai_api_key" 
 user_input = "Tell me about the future of AI."  
 
-# Function to initialize the conversation and get a response
-def getGenResponse(userInput, api_key):
+# Callback recording every LLM call, summaries included
+CALLBACKS = [InstrumentationCallbackHandler(pipeline="n3")]
+
+# Function to get the shared OpenAI client of an API key (the conversation and the sessions use the same one)
+def get_llm(api_key):
+    return PROVIDERS.llm(
+        temperature=0,  # Temperature controls randomness; 0 is deterministic
+        openai_api_key=api_key,  # API Key for OpenAI
+        model_name='gpt-3.5-turbo-instruct',  # Model name (default is GPT-3.5-turbo)
+        callbacks=CALLBACKS
+    )
+
+# Function to initialize the conversation once and reuse it for every call
+def get_conversation(api_key):
     """
-    This function initializes the conversation chain and returns the model's response to the user's input.
-    If the conversation does not exist, it creates a new one with the appropriate model and memory.
+    Returns the conversation chain, creating it with the appropriate model and memory on the first call.
     """
     
     # Check if a conversation session has already been initialized.
@@ -19,12 +33,8 @@ def getGenResponse(userInput, api_key):
     if 'conversation' not in globals():
         global conversation  # Store conversation globally for reuse across multiple calls
         
-        # Initialize the OpenAI LLM (GPT-3.5 Turbo, in this case)
-        llm = OpenAI(
-            temperature=0,  # Temperature controls randomness; 0 is deterministic
-            openai_api_key=api_key,  # API Key for OpenAI
-            model_name='gpt-3.5-turbo-instruct'  # Model name (default is GPT-3.5-turbo)
-        )
+        # Get the shared OpenAI LLM (GPT-3.5 Turbo, in this case)
+        llm = get_llm(api_key)
 
         # Initialize the conversation chain with memory to summarize and store the conversation history
         conversation = ConversationChain(
@@ -33,16 +43,68 @@ def getGenResponse(userInput, api_key):
             memory=ConversationSummaryMemory(llm=llm)  # Uses memory to keep track of conversation context
         )
 
+    return conversation
+
+# Function to initialize the conversation and get a response
+def getGenResponse(userInput, api_key):
+    """
+    This function initializes the conversation chain and returns the model's response to the user's input.
+    If the conversation does not exist, it creates a new one with the appropriate model and memory.
+    """
+    conversation = get_conversation(api_key)
+
     # Get the model's response based on the user's input
-    response = conversation.predict(input=userInput)
+    with METRICS.span("getGenResponse", pipeline="n3"):
+        response = conversation.predict(input=userInput)
     
     # Print the conversation memory buffer, showing the history of interactions
     print(conversation.memory.buffer)
 
     return response  # Return the model's response
 
-# Hardcoded process for interaction
+# Function to stream the model's response token by token
+def getGenResponseStream(userInput, api_key, metrics=None):
+    """
+    Streaming version of getGenResponse: yields the tokens of the response as they arrive.
+    The memory is updated once, when the stream ends.
+    Pass a StreamMetrics instance to get the time to first token and tokens per second.
+    """
+    return stream_conversation(get_conversation(api_key), userInput, metrics)
+
+# Function to stream the model's response as an async iterator
+def agetGenResponseStream(userInput, api_key, metrics=None):
+    """
+    Async version of getGenResponseStream (use it with "async for").
+    """
+    return astream_conversation(get_conversation(api_key), userInput, metrics)
+
+# Function to answer a user in their own conversation (for serving many users at once)
+def getSessionResponse(session_id, userInput, api_key):
+    """
+    Returns the model's response in the conversation of a session (e.g. one per user).
+    Recent turns are kept verbatim and older ones are summarized in the background, so a turn
+    costs a single LLM call; idle sessions are written to disk and reloaded when they come back.
+    """
+    if 'sessions' not in globals():
+        global sessions  # Session manager shared by all calls
+        sessions = SessionManager(get_llm(api_key), max_live_sessions=1000, spill_dir='../data/.sessions')
+        METRICS.watch("sessions", sessions)
+
+    with METRICS.span("getSessionResponse", pipeline="n3"):
+        return sessions.predict(session_id, userInput)
+
+# Hardcoded process for interaction (only when run as a script, importing the module makes no API call)
 # Normally, user input would be dynamic, but here we hardcode it for simplicity.
-print("User: ", user_input)
-model_response = getGenResponse(user_input, API_Key)  # Call the getGenResponse function with the user's input
-print("AI: ", model_response)  # Output the AI's response
+if __name__ == "__main__":
+    print("User: ", user_input)
+    model_response = getGenResponse(user_input, API_Key)  # Call the getGenResponse function with the user's input
+    print("AI: ", model_response)  # Output the AI's response
+
+    # Same interaction, with the response printed token by token as it arrives
+    stream_metrics = StreamMetrics()
+    print("AI: ", end="")
+    for token in getGenResponseStream("And what about its risks?", API_Key, stream_metrics):
+        print(token, end="", flush=True)
+    print()
+    print("Streaming:", stream_metrics.as_dict())
+    print("Metrics:", METRICS.snapshot())
@@ -1,36 +1,132 @@
+import os
 from dotenv import load_dotenv 
-from langchain_experimental.agents import create_pandas_dataframe_agent  # Create an agent to interact with Pandas DataFrames
-from langchain_openai import OpenAI  
-import pandas as pd  
+from providers import PROVIDERS, lazy_import  # Shared OpenAI client, backends imported on first use
+from dataset_registry import DatasetRegistry  # Parses every CSV once, typed DataFrames cached in memory and as Parquet
+from query_plan import answer_query  # Deterministic pandas answers for aggregate / filter / group-by questions
+from chunked_csv import ChunkedCsv, answer_query_chunked, profile_csv  # Out-of-core mode for the large files
+from instrumentation import METRICS, InstrumentationCallbackHandler  # Latency of each path, LLM calls and token usage
 
 load_dotenv()
 
+# Shared registry of the parsed CSV files (a modified file is parsed again)
+DATASETS = DatasetRegistry(memory_budget=1024 * 2**20, parquet_dir='../data/.parquet_cache')
+METRICS.watch("datasets", DATASETS)
+
+# Callback recording the LLM and tool calls of the agents, whatever their language model
+CALLBACKS = [InstrumentationCallbackHandler(pipeline="n4")]
+
+# Files larger than this are read in chunks instead of being loaded in memory
+CHUNKED_MIN_BYTES = 256 * 2**20
+
+# Rows of a large file shown to its agent, next to the profile of all the columns
+SAMPLE_ROWS = 100
+
+# Prompt of the agent of a large file, which only gets the profile of the file and its first rows
+PROFILE_PREFIX = """
+You are working with 2 pandas dataframes in Python named df1 and df2, describing a CSV file of {rows} rows that is too 
+large to be loaded. df1 is a profile of every column of the whole file (dtype, missing values, distinct values, min, max, 
+mean and most frequent values) and df2 holds its first {sample_rows} rows. Answer from the profile whenever you can, and 
+say so when a question needs more than the profile and the first rows. You should use the tools below to answer the 
+question posed of you:"""
+
+# Agents of the recently queried datasets, keyed by the version of their file and the language model
+_agents = {}
+MAX_AGENTS = 4
+
+# Chunked readers of the large files, keyed by the version of their file (dtypes inferred once)
+_chunked_files = {}
+
+# Function to get the shared language model (created on first use)
+def get_llm():
+     return PROVIDERS.llm()
+
+# Function to get the chunked reader of a large CSV file, created once per version of the file
+def get_chunked_csv(csv_file_path):
+     key = DATASETS.key(csv_file_path)
+     if key not in _chunked_files:
+          if len(_chunked_files) >= MAX_AGENTS:
+               _chunked_files.pop(next(iter(_chunked_files)))
+          _chunked_files[key] = ChunkedCsv(csv_file_path)
+     return _chunked_files[key]
+
+# Function to get the agent of a CSV file, created once per version of the file
+def get_agent(csv_file_path, llm=None, chunked=False, processes=None):
+     """
+     Returns the pandas agent of a CSV file, reusing the parsed DataFrame and the agent of earlier queries.
+
+     Args:
+     csv_file_path (str): The path to the CSV file.
+     llm (BaseLanguageModel): Model of the agent (default: the shared OpenAI model).
+     chunked (bool): The file is too large to load: the agent gets a one-pass profile of the columns and the first rows.
+     processes (int): Worker processes building the profile (None = in this process).
+
+     Returns:
+     AgentExecutor: The agent working on the DataFrame of the file.
+     """
+     llm = llm or get_llm()
+     key = (DATASETS.key(csv_file_path), id(llm), chunked)
+     if key not in _agents:
+          if len(_agents) >= MAX_AGENTS:
+               _agents.pop(next(iter(_agents)))  # Drop the oldest agent (and its DataFrame)
+          # (recent langchain_experimental versions require the explicit opt-in to run the generated Python)
+          # langchain_experimental is imported by the first question that needs an agent, not by the fast path
+          create_pandas_dataframe_agent = lazy_import("langchain_experimental.agents").create_pandas_dataframe_agent
+          if chunked:
+               csv = get_chunked_csv(csv_file_path)
+               profile = profile_csv(csv, processes=processes)
+               prefix = PROFILE_PREFIX.format(rows=int(profile["rows"].iloc[0]), sample_rows=SAMPLE_ROWS)
+               _agents[key] = create_pandas_dataframe_agent(llm, [profile, csv.sample(SAMPLE_ROWS)], prefix=prefix,
+                                                            number_of_head_rows=len(profile), verbose=True,
+                                                            allow_dangerous_code=True)
+          else:
+               # Load the CSV file into a Pandas DataFrame (parsed only the first time)
+               df = DATASETS.load(csv_file_path)
+               # Create an agent that allows interaction with the DataFrame using the language model
+               _agents[key] = create_pandas_dataframe_agent(llm, df, verbose=True, allow_dangerous_code=True)
+     return _agents[key]
+
 # Function to handle CSV analysis based on user query
-def csv_analyzer(csv_file_path, query):
+def csv_analyzer(csv_file_path, query, llm=None, fast_path=True, chunked=None, processes=None):
      """
      This function processes a CSV file and uses a language model to respond to user queries 
      about the CSV data in a natural language manner.
+     Aggregate questions ("average SALARY by DEPARTMENT_ID", "how many employees where JOB_ID is SH_CLERK")
+     are answered directly with pandas, without any LLM call; other questions go to the agent.
+     Files larger than CHUNKED_MIN_BYTES are never loaded: aggregates are computed chunk by chunk
+     and the agent works on a profile of the columns.
 
      Args:
      csv_file_path (str): The path to the CSV file.
      query (str): The question or query in natural language regarding the CSV data.
+     llm (BaseLanguageModel): Model of the agent (default: the shared OpenAI model).
+     fast_path (bool): Try the deterministic pandas answer before the agent.
+     chunked (bool): Read the file in chunks (default: only when it is larger than CHUNKED_MIN_BYTES).
+     processes (int): Worker processes sharing the chunks in chunked mode (None = in this process).
 
      Returns:
-     str: The response generated by the agent.
+     dict: The response ("input" and "output", plus "plan" and "result" when answered by the fast path).
      """
 
-     # Load the CSV file into a Pandas DataFrame
-     df = pd.read_csv(csv_file_path)
-
-     # Initialize the language model (OpenAI) to be used for generating responses
-     llm = OpenAI()
+     with METRICS.span("csv_analyzer", pipeline="n4") as span:
+          if chunked is None:
+               chunked = os.path.getsize(csv_file_path) > CHUNKED_MIN_BYTES
 
-     # Create an agent that allows interaction with the DataFrame using the language model
-     agent = create_pandas_dataframe_agent(llm, df, verbose=True)
+          # Compile the question into a validated query plan and run it with vectorized pandas operations
+          if fast_path:
+               if chunked:
+                    answer = answer_query_chunked(get_chunked_csv(csv_file_path), query, processes=processes)
+               else:
+                    answer = answer_query(DATASETS.load(csv_file_path), query)
+               if answer is not None:
+                    span.set_labels(path="chunked" if chunked else "fast")
+                    return answer
 
-     # Generate a response to the user query by interacting with the agent
-     return agent.invoke(query)
+          # Reuse the parsed DataFrame (or the profile), the language model and the agent of earlier queries on the same file
+          span.set_labels(path="chunked_agent" if chunked else "agent")
+          agent = get_agent(csv_file_path, llm, chunked=chunked, processes=processes)
 
+          # Generate a response to the user query by interacting with the agent
+          return agent.invoke(query, config={"callbacks": CALLBACKS})
 
 # Hardcoded user input for terminal execution
 if __name__ == "__main__":
@@ -46,3 +142,4 @@ if __name__ == "__main__":
 
      print("Response to your query:")
      print(response)
+     print("Metrics:", METRICS.snapshot())
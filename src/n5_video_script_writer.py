@@ -1,11 +1,67 @@
 # Required Imports
-from langchain_openai import ChatOpenAI  # OpenAI's LLM for generating content
-from langchain.prompts import PromptTemplate  # Templates for structuring LLM prompts
-from langchain.chains import LLMChain  # Create chains for sequential processing
-from langchain_community.tools import DuckDuckGoSearchRun  # Use DuckDuckGo for web search
+import asyncio  # Run the independent steps (title, search) concurrently
+from langchain_core.prompts import PromptTemplate  # Templates for structuring LLM prompts
+from langchain_core.output_parsers import StrOutputParser  # Turn the chat message of the LLM into plain text
+from langchain_core.runnables import Runnable  # Base class of the chains and tools, to attach the callbacks
+from langchain_core.rate_limiters import InMemoryRateLimiter  # Token bucket limiting the LLM requests per second
+from providers import PROVIDERS  # Shared ChatOpenAI clients and search tool, imported on first use
+from llm_cache import SQLiteLLMCache  # SQLite response cache plugged into the model
+from streaming import StreamMetrics  # Time to first token and tokens per second of the streamed output
+from instrumentation import METRICS, InstrumentationCallbackHandler  # Step latencies, LLM calls and token usage
+
+# Shared response cache: scripts generated at creativity 0 are cached, pass cache_nondeterministic=True to cache all
+LLM_CACHE = SQLiteLLMCache('../data/.llm_cache.sqlite')
+METRICS.watch("llm_cache", LLM_CACHE)
+
+# Callback recording the LLM calls and searches of the chains (also with stub models and tools)
+CALLBACKS = [InstrumentationCallbackHandler(pipeline="n5")]
+
+# Template for generating the video title
+title_template = PromptTemplate(
+     input_variables=['subject'],
+     template="Please come up with a title for a YouTube video on the topic: {subject}."
+)
+
+# Template for generating the video script based on the title and search results
+script_template = PromptTemplate(
+     input_variables=['title', 'DuckDuckGo_Search', 'duration'],
+     template="Create a script for a YouTube video titled: '{title}' with a duration of {duration} minutes, "
+               "using the following search data: {DuckDuckGo_Search}."
+)
+
+# Function to create the language model and the search tool (stubs can be passed instead, e.g. for benchmarks)
+def build_tools(creativity, api_key, llm_cache=LLM_CACHE, llm=None, search=None):
+     """
+     Creates the chains for the title and the script, and the search tool.
+
+     Args:
+     creativity (float): Creativity level (0.0 for low, 1.0 for high).
+     api_key (str): OpenAI API key for accessing the LLM.
+     llm_cache (SQLiteLLMCache): Response cache of the model (None = no caching).
+     llm (BaseLanguageModel): Model to use instead of ChatOpenAI.
+     search (BaseTool): Search tool to use instead of DuckDuckGoSearchRun.
+
+     Returns:
+     tuple: The title chain, the script chain and the search tool.
+     """
+     # Get the shared OpenAI language model of the user's specified creativity level and API key
+     if llm is None:
+          llm = PROVIDERS.chat_model(temperature=creativity, openai_api_key=api_key, model_name='gpt-3.5-turbo',
+                                     cache=llm_cache.cache_option(creativity) if llm_cache is not None else False)
+
+     # Create chains for generating the video title and the script
+     title_chain = (title_template | llm | StrOutputParser()).with_config(callbacks=CALLBACKS)
+     script_chain = (script_template | llm | StrOutputParser()).with_config(callbacks=CALLBACKS)
+
+     # Use DuckDuckGo search to gather information for script generation
+     # (the search tool reports its calls to the callbacks, plain stubs are returned as they are)
+     search = search if search is not None else PROVIDERS.search_tool()
+     if isinstance(search, Runnable):
+          search = search.with_config(callbacks=CALLBACKS)
+     return title_chain, script_chain, search
 
 # Function to generate the YouTube video script
-def script_generator(prompt, video_length, creativity, api_key):
+def script_generator(prompt, video_length, creativity, api_key, llm_cache=LLM_CACHE, llm=None, search=None):
      """
      Generates a YouTube or Twitter video title and script based on the user's prompt using OpenAI and DuckDuckGo search.
 
@@ -14,46 +70,183 @@ def script_generator(prompt, video_length, creativity, api_key):
      video_length (str): Expected length of the video in minutes.
      creativity (float): Creativity level (0.0 for low, 1.0 for high).
      api_key (str): OpenAI API key for accessing the LLM.
+     llm_cache (SQLiteLLMCache): Response cache of the model (None = no caching).
+     llm (BaseLanguageModel): Model to use instead of ChatOpenAI.
+     search (BaseTool): Search tool to use instead of DuckDuckGoSearchRun.
 
      Returns:
      tuple: Returns the search result, video title, and script.
      """
+     title_chain, script_chain, search = build_tools(creativity, api_key, llm_cache, llm, search)
 
-     # Template for generating the video title
-     title_template = PromptTemplate(
-          input_variables=['subject'],
-          template="Please come up with a title for a YouTube video on the topic: {subject}."
-     )
+     with METRICS.span("script_generator", pipeline="n5"):
+          # Generate the video title based on the prompt
+          title = title_chain.invoke({"subject": prompt})
 
-     # Template for generating the video script based on the title and search results
-     script_template = PromptTemplate(
-          input_variables=['title', 'DuckDuckGo_Search', 'duration'],
-          template="Create a script for a YouTube video titled: '{title}' with a duration of {duration} minutes, "
-                    "using the following search data: {DuckDuckGo_Search}."
-     )
+          # Conduct a DuckDuckGo search based on the prompt
+          search_result = search.invoke(prompt)
 
-     # Initialize the OpenAI language model with the user's specified creativity level and API key
-     llm = ChatOpenAI(temperature=creativity, openai_api_key=api_key, model_name='gpt-3.5-turbo')
+          # Generate the video script using the title, search results, and video duration
+          script = script_chain.invoke({"title": title, "DuckDuckGo_Search": search_result, "duration": video_length})
 
-     # Create chains for generating the video title and the script
-     title_chain = LLMChain(llm=llm, prompt=title_template, verbose=True)
-     script_chain = LLMChain(llm=llm, prompt=script_template, verbose=True)
+     # Return the search results, generated title, and the script
+     return search_result, title, script
 
-     # Use DuckDuckGo search to gather information for script generation
-     search = DuckDuckGoSearchRun()
+# Function to generate the YouTube video script with the independent steps running concurrently
+async def script_generator_async(prompt, video_length, creativity, api_key, llm_cache=LLM_CACHE, llm=None, search=None,
+                                 rate_limiter=None):
+     """
+     Async version of script_generator: the title and the DuckDuckGo search do not depend on each
+     other and run at the same time, then the script is generated from both.
 
-     # Generate the video title based on the prompt
-     title = title_chain.invoke(prompt)
+     Args:
+     prompt (str): The topic or idea for the video.
+     video_length (str): Expected length of the video in minutes.
+     creativity (float): Creativity level (0.0 for low, 1.0 for high).
+     api_key (str): OpenAI API key for accessing the LLM.
+     llm_cache (SQLiteLLMCache): Response cache of the model (None = no caching).
+     llm (BaseLanguageModel): Model to use instead of ChatOpenAI.
+     search (BaseTool): Search tool to use instead of DuckDuckGoSearchRun.
+     rate_limiter (InMemoryRateLimiter): Limits the LLM requests per second (None = no limit).
 
-     # Conduct a DuckDuckGo search based on the prompt
-     search_result = search.run(prompt)
+     Returns:
+     tuple: Returns the search result, video title, and script.
+     """
+     title_chain, script_chain, search = build_tools(creativity, api_key, llm_cache, llm, search)
 
-     # Generate the video script using the title, search results, and video duration
-     script = script_chain.run(title=title, DuckDuckGo_Search=search_result, duration=video_length)
+     # Wait for a token of the rate limiter before every LLM request
+     async def limited(chain, inputs):
+          if rate_limiter is not None:
+               await rate_limiter.aacquire()
+          return await chain.ainvoke(inputs)
+
+     with METRICS.span("script_generator", pipeline="n5", mode="async"):
+          # Generate the title and search DuckDuckGo concurrently
+          title, search_result = await asyncio.gather(limited(title_chain, {"subject": prompt}), search.ainvoke(prompt))
+
+          # Generate the video script using the title, search results, and video duration
+          script = await limited(script_chain, {"title": title, "DuckDuckGo_Search": search_result, "duration": video_length})
 
-     # Return the search results, generated title, and the script
      return search_result, title, script
 
+# Function to generate the scripts of many prompts concurrently
+async def script_generator_batch(prompts, video_length, creativity, api_key, max_concurrency=4, requests_per_second=None,
+                                 return_exceptions=False, **options):
+     """
+     Generates the scripts of many prompts, at most max_concurrency at a time and at most
+     requests_per_second LLM requests per second.
+
+     Args:
+     prompts (List[str]): The topics or ideas of the videos.
+     video_length (str): Expected length of the videos in minutes.
+     creativity (float): Creativity level (0.0 for low, 1.0 for high).
+     api_key (str): OpenAI API key for accessing the LLM.
+     max_concurrency (int): Maximum number of prompts processed at the same time.
+     requests_per_second (float): Maximum LLM requests per second (None = no limit).
+     return_exceptions (bool): Return the exception of a failed prompt in its place instead of raising it.
+     **options: llm_cache, llm and search, as for script_generator_async.
+
+     Returns:
+     List[tuple]: The (search result, title, script) of every prompt, in the order of the prompts.
+     """
+     semaphore = asyncio.Semaphore(max_concurrency)
+     rate_limiter = None
+     if requests_per_second is not None:
+          rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second, check_every_n_seconds=0.01,
+                                             max_bucket_size=max(1, max_concurrency))
+
+     async def generate(prompt):
+          async with semaphore:
+               return await script_generator_async(prompt, video_length, creativity, api_key,
+                                                   rate_limiter=rate_limiter, **options)
+
+     return await asyncio.gather(*(generate(prompt) for prompt in prompts), return_exceptions=return_exceptions)
+
+
+# Function to stream the title and the script token by token
+def script_generator_stream(prompt, video_length, creativity, api_key, llm_cache=LLM_CACHE, llm=None, search=None,
+                            metrics=None):
+     """
+     Streaming version of script_generator: yields the title and the script as they are generated.
+
+     Args:
+     prompt (str): The topic or idea for the video.
+     video_length (str): Expected length of the video in minutes.
+     creativity (float): Creativity level (0.0 for low, 1.0 for high).
+     api_key (str): OpenAI API key for accessing the LLM.
+     llm_cache (SQLiteLLMCache): Response cache of the model (None = no caching).
+     llm (BaseLanguageModel): Model to use instead of ChatOpenAI.
+     search (BaseTool): Search tool to use instead of DuckDuckGoSearchRun.
+     metrics (StreamMetrics): Filled with the time to first token and tokens per second (optional).
+
+     Yields:
+     tuple: (field, text) pairs: ("title", token)..., then ("search", search result), then ("script", token)...
+     """
+     metrics = metrics or StreamMetrics()
+     metrics.start()
+     title_chain, script_chain, search = build_tools(creativity, api_key, llm_cache, llm, search)
+
+     # Stream the title, it is needed in full before the script can start
+     title = []
+     for token in title_chain.stream({"subject": prompt}):
+          metrics.token(token)
+          title.append(token)
+          yield "title", token
+
+     # Conduct a DuckDuckGo search based on the prompt
+     search_result = search.invoke(prompt)
+     yield "search", search_result
+
+     # Stream the video script
+     for token in script_chain.stream({"title": "".join(title), "DuckDuckGo_Search": search_result, "duration": video_length}):
+          metrics.token(token)
+          yield "script", token
+     metrics.finish()
+
+# Function to stream the title and the script as an async iterator
+async def script_generator_astream(prompt, video_length, creativity, api_key, llm_cache=LLM_CACHE, llm=None, search=None,
+                                   metrics=None):
+     """
+     Async version of script_generator_stream: the DuckDuckGo search runs while the title is streamed.
+
+     Args:
+     prompt (str): The topic or idea for the video.
+     video_length (str): Expected length of the video in minutes.
+     creativity (float): Creativity level (0.0 for low, 1.0 for high).
+     api_key (str): OpenAI API key for accessing the LLM.
+     llm_cache (SQLiteLLMCache): Response cache of the model (None = no caching).
+     llm (BaseLanguageModel): Model to use instead of ChatOpenAI.
+     search (BaseTool): Search tool to use instead of DuckDuckGoSearchRun.
+     metrics (StreamMetrics): Filled with the time to first token and tokens per second (optional).
+
+     Yields:
+     tuple: (field, text) pairs: ("title", token)..., then ("search", search result), then ("script", token)...
+     """
+     metrics = metrics or StreamMetrics()
+     metrics.start()
+     title_chain, script_chain, search = build_tools(creativity, api_key, llm_cache, llm, search)
+     search_task = asyncio.ensure_future(search.ainvoke(prompt))
+
+     try:
+          # Stream the title while the search runs
+          title = []
+          async for token in title_chain.astream({"subject": prompt}):
+               metrics.token(token)
+               title.append(token)
+               yield "title", token
+
+          search_result = await search_task
+          yield "search", search_result
+
+          # Stream the video script
+          async for token in script_chain.astream({"title": "".join(title), "DuckDuckGo_Search": search_result,
+                                                   "duration": video_length}):
+               metrics.token(token)
+               yield "script", token
+          metrics.finish()
+     finally:
+          search_task.cancel()  # No-op once the search is done, stops it when the consumer leaves early
+
 
 # Hardcoded user input for terminal execution
 if __name__ == "__main__":
@@ -83,3 +276,9 @@ if __name__ == "__main__":
 
      print("\nDuckDuckGo Search Results:")
      print(search_result)
+
+     # Display the hit rate of the response cache
+     print("\nLLM cache:", LLM_CACHE.stats())
+
+     # Display the step latencies and token usage of the run
+     print("Metrics:", METRICS.snapshot())
@@ -1,10 +1,14 @@
 import os
 import asyncio
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Pinecone
-from langchain.embeddings.sentence_transformer import SentenceTransformerEmbeddings
-from pinecone import Pinecone as PineconeClient
-from langchain.document_loaders.sitemap import SitemapLoader
+from fast_text_splitter import FastRecursiveTextSplitter  # Same chunks as RecursiveCharacterTextSplitter, much less work
+from providers import PROVIDERS, lazy_import  # Pinecone and embedding backends imported on first use, clients shared
+from sitemap_crawler import SitemapCrawler, DEFAULT_VALIDATORS_PATH  # Concurrent, streaming replacement of SitemapLoader
+from batch_search import similarity_search_batch  # Many queries with one batched embedding call
+from embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_model_name  # Persistent cache so unchanged chunks are never re-embedded
+from incremental_ingest import IngestManifest, incremental_ingest  # Re-index only the pages that changed
+from vector_upsert import VectorUpserter, PineconeVectorBackend  # Batched, idempotent upserts with deterministic ids
+from lexical_index import BM25Index, HybridUpserter, hybrid_search  # Local BM25 index fused with the vector search
+from instrumentation import METRICS, InstrumentedEmbeddings  # Stage timings, counters and cache statistics of the pipeline
 
 # these variables are supposed to be in .env (here only for testing and learning purpose)
 HUGGINGFACE_API_KEY = "your_huggingface_api_key_here"  # Replace with your actual HuggingFace API key
@@ -27,13 +31,27 @@ def scrape_url(sitemap_url):
      Returns:
      List[Document]: List of documents containing the website data.
      """
-     loop = asyncio.new_event_loop()
-     asyncio.set_event_loop(loop)
-     
-     # Load the website data from the provided sitemap URL
-     loader = SitemapLoader(sitemap_url)
-     docs = loader.load()
-     return docs
+     # Collect the documents streamed by the concurrent crawler
+     async def collect():
+          return [doc async for doc in scrape_url_stream(sitemap_url)]
+
+     return asyncio.run(collect())
+
+# Function to stream the website data while it is being fetched
+def scrape_url_stream(sitemap_url, validators_path=None):
+     """
+     Crawls the sitemap concurrently and yields the pages as soon as they are fetched,
+     so splitting and embedding can start while the crawl is still going on.
+
+     Args:
+     sitemap_url (str): The URL of the sitemap to scrape.
+     validators_path (str): JSON file keeping ETag / Last-Modified validators, so unchanged pages are skipped on re-runs.
+
+     Returns:
+     AsyncIterator[Document]: The website documents.
+     """
+     crawler = SitemapCrawler(max_connections=32, per_host=8, validators_path=validators_path)
+     return crawler.crawl(sitemap_url)
 
 # Function to split the scraped website data into chunks for easier processing
 def data_splitter(docs):
@@ -46,8 +64,8 @@ def data_splitter(docs):
      Returns:
      List[Document]: List of smaller document chunks.
      """
-     # Using RecursiveCharacterTextSplitter to split the data into chunks
-     text_splitter = RecursiveCharacterTextSplitter(
+     # Using FastRecursiveTextSplitter (identical chunks to RecursiveCharacterTextSplitter) to split the data into chunks
+     text_splitter = FastRecursiveTextSplitter(
           chunk_size=1000,  # Size of each chunk
           chunk_overlap=200,  # Overlap between chunks for context
           length_function=len  # Define the function to calculate length
@@ -56,7 +74,7 @@ def data_splitter(docs):
      return docs_chunks
 
 # Function to push the processed data to Pinecone for creating a vector store
-def push_to_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_name, embeddings, docs):
+def push_to_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_name, embeddings, docs, lexical_index=None):
      """
      Pushes the website data to Pinecone by creating a vector store.
 
@@ -66,17 +84,83 @@ def push_to_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_name,
      pinecone_index_name (str): Name of the Pinecone index.
      embeddings (Embeddings): Embeddings instance to convert text into vectors.
      docs (List[Document]): List of documents to push to Pinecone.
+     lexical_index (BM25Index): Lexical index kept in sync with the vectors (optional, saved at the end).
      
      Returns:
      Index: The created Pinecone index.
      """
-     # Initialize the Pinecone client with the provided API key and environment
-     PineconeClient(api_key=pinecone_apikey, environment=pinecone_environment)
+     # Upsert layer: deterministic chunk ids, chunks already in the index are skipped, concurrent fixed-size batches
+     upserter = pinecone_upserter(pinecone_apikey, pinecone_environment, pinecone_index_name)
+     if lexical_index is not None:
+          upserter = HybridUpserter(upserter, lexical_index)
+
+     # Embed and upsert the documents batch by batch
+     for start in range(0, len(docs), upserter.batch_size):
+          batch = docs[start:start + upserter.batch_size]
+          upserter.upsert(batch, embeddings.embed_documents([doc.page_content for doc in batch]))
+     print("Upsert stats:", upserter.stats)
+     if lexical_index is not None:
+          lexical_index.save()
 
-     # Create the Pinecone index with the given documents and embeddings
-     index = Pinecone.from_documents(docs, embeddings, index_name=pinecone_index_name)
+     index = lazy_import("langchain_community.vectorstores").Pinecone.from_existing_index(pinecone_index_name, embeddings)
      return index
 
+# Function to build the upsert step of the ingest pipeline (vectors are already computed by the pipeline)
+def pinecone_upserter(pinecone_apikey, pinecone_environment, pinecone_index_name):
+     """
+     Returns the upsert layer of the Pinecone index. Chunks are stored the same way as
+     Pinecone.from_documents (chunk text under the "text" metadata key), but under
+     deterministic ids so a re-run does not upload the same chunks again.
+
+     Args:
+     pinecone_apikey (str): API key for Pinecone.
+     pinecone_environment (str): Environment for Pinecone (e.g., gcp-starter).
+     pinecone_index_name (str): Name of the Pinecone index.
+
+     Returns:
+     VectorUpserter: Callable as upsert(chunks, vectors).
+     """
+     index = PROVIDERS.pinecone(pinecone_apikey, pinecone_environment).Index(pinecone_index_name)
+     return VectorUpserter(PineconeVectorBackend(index), batch_size=100, max_concurrency=4)
+
+# Function to run the whole ingest (fetch, split, embed, upsert) as overlapping stages, for changed pages only
+def ingest_website(sitemap_url, embeddings, upserter, manifest_path='../data/.ingest_manifest.json', lexical_index=None,
+                   validators_path=DEFAULT_VALIDATORS_PATH):
+     """
+     Crawls the website and pushes it to the vector store with a staged pipeline:
+     pages are split, embedded and upserted while the crawl is still going on, and the
+     bounded queues between the stages keep memory flat whatever the size of the site.
+     A local manifest (page URL, lastmod, content hash, chunk ids) makes re-runs incremental:
+     only new or modified pages are fetched and re-indexed, and chunks of removed pages are deleted.
+
+     Args:
+     sitemap_url (str): The URL of the sitemap to scrape.
+     embeddings (Embeddings): Embeddings instance to convert text into vectors.
+     upserter (VectorUpserter): Upsert layer of the index, e.g. from pinecone_upserter.
+     manifest_path (str): JSON file of the ingest manifest.
+     lexical_index (BM25Index): Lexical index built alongside the vectors, with the same chunks and ids (optional).
+     validators_path (str): JSON file of the ETag / Last-Modified validators of the crawler.
+
+     Returns:
+     dict: Counters of the run and the throughput and queue depth of every stage.
+     """
+     crawler = SitemapCrawler(max_connections=32, per_host=8, validators_path=validators_path)
+     manifest = IngestManifest(manifest_path)
+     # A new lexical index needs every page once (chunks already in Pinecone are not uploaded again), the
+     # manifest is kept so the chunks of pages removed since the last run are still deleted
+     reindex_all = lexical_index is not None and not lexical_index.exists()
+     if lexical_index is not None:
+          upserter = HybridUpserter(upserter, lexical_index)
+     with METRICS.span("ingest_website", pipeline="n6"):
+          stats = asyncio.run(incremental_ingest(sitemap_url, manifest, data_splitter, embeddings, upserter,
+                                                 crawler=crawler, reindex_all=reindex_all, embed_batch_size=64, queue_size=8))
+     for key, value in stats.items():
+          if isinstance(value, (int, float)) and not isinstance(value, bool):
+               METRICS.inc(f"ingest_{key}_total", value, pipeline="n6")
+     if lexical_index is not None:
+          lexical_index.save()
+     return stats
+
 # Function to pull the existing index data from Pinecone
 def pull_from_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_name, embeddings):
      """
@@ -91,27 +175,50 @@ def pull_from_pinecone(pinecone_apikey, pinecone_environment, pinecone_index_nam
      Returns:
      Index: The Pinecone index for similarity search.
      """
-     # Initialize the Pinecone client and pull the existing index
-     PineconeClient(api_key=pinecone_apikey, environment=pinecone_environment)
-     index = Pinecone.from_existing_index(pinecone_index_name, embeddings)
+     # Initialize the shared Pinecone client and pull the existing index
+     PROVIDERS.pinecone(pinecone_apikey, pinecone_environment)
+     index = lazy_import("langchain_community.vectorstores").Pinecone.from_existing_index(pinecone_index_name, embeddings)
      return index
 
 # Function to perform a similarity search on the Pinecone index
-def get_similar_docs(index, query, k=2):
+def get_similar_docs(index, query, k=2, lexical_index=None, mode="auto"):
      """
      Fetches the most relevant documents from Pinecone using similarity search.
+     With a lexical index, BM25 and vector results are fused (reciprocal rank fusion), and
+     short exact-term queries (product names, codes) are answered without any embedding call.
 
      Args:
      index (Index): The Pinecone index to search.
      query (str): The user's query or prompt for similarity search.
      k (int): Number of top relevant documents to return.
+     lexical_index (BM25Index): The lexical index of the same chunks (None = vector search only).
+     mode (str): "auto", "hybrid", "lexical" or "vector" (with a lexical index).
 
      Returns:
      List[Document]: List of the most relevant documents.
      """
-     # Perform similarity search on the index based on the user's query
-     similar_docs = index.similarity_search(query, k=k)
-     return similar_docs
+     with METRICS.span("get_similar_docs", pipeline="n6", mode=mode if lexical_index is not None else "vector"):
+          if lexical_index is not None:
+               return hybrid_search(index, lexical_index, query, k=k, mode=mode)
+
+          # Perform similarity search on the index based on the user's query
+          similar_docs = index.similarity_search(query, k=k)
+          return similar_docs
+
+# Function to perform similarity searches for many queries at once
+def get_similar_docs_batch(index, queries, k=2):
+     """
+     Fetches the most relevant documents for several queries, embedding all of them in one call.
+
+     Args:
+     index (Index): The Pinecone (or FAISS) index to search.
+     queries (List[str]): The user queries.
+     k (int): Number of top relevant documents to return per query.
+
+     Returns:
+     List[List[Tuple[Document, float]]]: For every query, the most relevant documents with their scores.
+     """
+     return similarity_search_batch(index, queries, k=k, symmetric=True)  # all-MiniLM-L6-v2 embeds queries like documents
 
 # Main function to run the entire process
 if __name__ == "__main__":
@@ -122,28 +229,32 @@ if __name__ == "__main__":
      print(f"User Prompt: {prompt}")
      print(f"Number of Documents to Retrieve: {document_count}")
 
-     # Step 1: Fetch website data by scraping the given sitemap URL
-     site_data = scrape_url(WEBSITE_URL)
-     print("Website data retrieval done...")
-
-     # Step 2: Split the website data into smaller chunks
-     chunks_data = data_splitter(site_data)
-     print("Data splitting done...")
-
-     # Step 3: Create an embeddings instance for vector representation of text
-     embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+     # Step 1: Create an embeddings instance for vector representation of text (backed by the on-disk embedding cache)
+     # (the model weights are loaded once per process by the provider pool)
+     model = PROVIDERS.embeddings("sentence_transformer", model_name="all-MiniLM-L6-v2")
+     embeddings = CachedEmbeddings(InstrumentedEmbeddings(model, pipeline="n6"),
+                                   EmbeddingCache('../data/.embedding_cache', model_name=embedding_model_name(model)))
+     METRICS.watch("n6_embedding_cache", embeddings.cache)
      print("Embeddings instance creation done...")
 
-     # Step 4: Push the document chunks to Pinecone for indexing
-     push_to_pinecone(PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX, embeddings, chunks_data)
+     # Steps 2-4: Fetch the changed pages, split them, embed the chunks and push them to Pinecone as overlapping stages
+     # (the local BM25 index is built alongside the vectors, with the same chunks)
+     upserter = pinecone_upserter(PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX)
+     METRICS.watch("upsert", upserter)
+     lexical_index = BM25Index.load('../data/.lexical_index')
+     ingest_stats = ingest_website(WEBSITE_URL, embeddings, upserter, lexical_index=lexical_index)
+     for stats in ingest_stats.pop("stages"):
+          print(stats)
+     print("Ingest stats:", ingest_stats)
+     print("Upsert stats:", upserter.stats)
      print("Data pushed to Pinecone successfully...")
 
      # Step 5: Retrieve the existing Pinecone index
      index = pull_from_pinecone(PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX, embeddings)
      print("Pinecone index retrieval done...")
 
-     # Step 6: Perform similarity search on the Pinecone index with the user's prompt
-     relevant_docs = get_similar_docs(index, prompt, document_count)
+     # Step 6: Perform hybrid (BM25 + vector) search on the indexes with the user's prompt
+     relevant_docs = get_similar_docs(index, prompt, document_count, lexical_index=lexical_index)
      print("Relevant documents retrieved...")
 
      # Step 7: Display the search results (relevant documents)
@@ -151,3 +262,6 @@ if __name__ == "__main__":
           print(f"\nResult {i}:")
           print(f"Document Content: {doc.page_content}")
           print(f"Source Link: {doc.metadata['source']}")
+
+     # Step 8: Display the stage timings and counters of the run
+     print("\nMetrics:", METRICS.snapshot())
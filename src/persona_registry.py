@@ -0,0 +1,105 @@
+import re
+import json
+
+# Default location of the persona definitions, in the 'data' folder outside the 'src' folder
+DEFAULT_PERSONAS_PATH = '../data/personas.json'
+
+# Same word count as the default length function of LangChain's LengthBasedExampleSelector
+WORD_SPLIT = re.compile("\n| ")
+
+# Function to measure a text the way LengthBasedExampleSelector does
+def text_length(text):
+     """
+     Counts the words of a text (split on spaces and new lines).
+
+     Args:
+     text (str): The text to measure.
+
+     Returns:
+     int: The number of words.
+     """
+     return len(WORD_SPLIT.split(text))
+
+
+class Persona:
+     """
+     One persona of the registry, with its examples rendered and measured once.
+     """
+
+     def __init__(self, name, description, examples, example_template):
+          self.name = name
+          self.description = description
+          self.examples = examples
+          # What PromptTemplate(example_template).format(**example) returns, and its length for the selector
+          self.example_strings = [example_template.format(**example) for example in examples]
+          self.example_lengths = [text_length(text) for text in self.example_strings]
+
+     def select_examples(self, remaining_length):
+          """
+          Selects examples like LengthBasedExampleSelector: in order, while they fit in the remaining length.
+
+          Args:
+          remaining_length (int): max_length minus the length of the inputs.
+
+          Returns:
+          List[str]: The rendered examples to include in the prompt.
+          """
+          count = 0
+          for length in self.example_lengths:
+               if remaining_length <= 0 or remaining_length - length < 0:
+                    break
+               remaining_length -= length
+               count += 1
+          return self.example_strings[:count]
+
+
+class PersonaRegistry:
+     """
+     Persona prompts loaded once from a JSON file. Formatting a prompt gives the same text as
+     a FewShotPromptTemplate with a LengthBasedExampleSelector, without rebuilding templates,
+     re-rendering examples or re-measuring their lengths on every request.
+     """
+
+     def __init__(self, path=DEFAULT_PERSONAS_PATH):
+          """
+          Args:
+          path (str): JSON file with the prefix, suffix and example templates, max_length and the personas.
+          """
+          with open(path, encoding="utf-8") as f:
+               config = json.load(f)
+          self.prefix = config["prefix"]
+          self.suffix = config["suffix"]
+          self.example_separator = config["example_separator"]
+          self.max_length = config["max_length"]
+          self.personas = {
+               name: Persona(name, persona["description"], persona["examples"], config["example_template"])
+               for name, persona in config["personas"].items()
+          }
+
+     def names(self):
+          """
+          Returns:
+          List[str]: The names of the personas, in file order.
+          """
+          return list(self.personas)
+
+     def format_prompt(self, persona, query, tasktype_option):
+          """
+          Builds the few-shot prompt of a persona.
+
+          Args:
+          persona (str): The name of the persona (e.g. 'Artist', 'Chef', 'Scientist').
+          query (str): The user's question.
+          tasktype_option (str): The task to perform (e.g. 'Write a project report').
+
+          Returns:
+          str: The formatted prompt.
+          """
+          if persona not in self.personas:
+               raise ValueError(f"Unknown persona {persona!r}, expected one of {self.names()}")
+          variables = {"template_userInput": query, "template_ageoption": persona, "template_tasktype_option": tasktype_option}
+          # The selector measures all input values joined with spaces
+          examples = self.personas[persona].select_examples(self.max_length - text_length(" ".join(variables.values())))
+          pieces = [self.prefix, *examples, self.suffix]
+          template = self.example_separator.join(piece for piece in pieces if piece)
+          return template.format(**variables)
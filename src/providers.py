@@ -0,0 +1,158 @@
+import threading
+import importlib
+
+# Limits of the HTTP connection pool shared by the (synchronous) OpenAI clients
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Function to import a module on first use, so scripts only pay for the backends they call
+def lazy_import(name):
+     """
+     Imports a module when it is first needed (later calls get it from sys.modules).
+
+     Args:
+     name (str): Dotted name of the module (e.g. "langchain_experimental.agents").
+
+     Returns:
+     module: The imported module.
+     """
+     return importlib.import_module(name)
+
+# Key of a set of constructor arguments (unhashable values such as caches are keyed by identity,
+# the pool keeps them alive with the instance so their id can not be reused by another object)
+def _key(kind, params):
+     def hashable(value):
+          try:
+               hash(value)
+               return value
+          except TypeError:
+               return ("id", id(value))
+     return (kind,) + tuple(sorted((name, hashable(value)) for name, value in params.items()))
+
+
+class ProviderPool:
+     """
+     Process-wide cache of the clients of the external services: OpenAI and ChatOpenAI clients
+     (one per set of arguments, the synchronous ones sharing one pooled HTTP connection pool),
+     embedding models (weights loaded once) and Pinecone clients. Backends are imported on first use only.
+     """
+
+     def __init__(self):
+          self._instances = {}  # key -> (instance, constructor arguments kept alive for the id() in the key)
+          self._creating = {}  # key -> lock held while the instance of the key is created
+          self._lock = threading.Lock()
+          self._http_client = None
+          self.stats = {"created": 0, "reused": 0}
+
+     # Get the instance of a key, creating it once (also with concurrent callers); only callers of
+     # the same key wait for a slow creation (e.g. loading model weights), the pool lock is not held meanwhile
+     def _get(self, key, create, params=None):
+          with self._lock:
+               if key in self._instances:
+                    self.stats["reused"] += 1
+                    return self._instances[key][0]
+               key_lock = self._creating.setdefault(key, threading.Lock())
+          with key_lock:
+               with self._lock:
+                    if key in self._instances:
+                         self.stats["reused"] += 1
+                         return self._instances[key][0]
+               instance = create()
+               with self._lock:
+                    self._instances[key] = (instance, params)
+                    self._creating.pop(key, None)
+                    self.stats["created"] += 1
+               return instance
+
+     def http_client(self):
+          """
+          Returns:
+          httpx.Client: The HTTP client shared by the synchronous OpenAI calls (keep-alive connections).
+          The async calls keep the default client of langchain_openai: the connections of an
+          httpx.AsyncClient belong to the event loop that opened them, and every asyncio.run() has a new one.
+          """
+          with self._lock:
+               if self._http_client is None:
+                    httpx = lazy_import("httpx")
+                    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+                    self._http_client = httpx.Client(limits=limits)
+               return self._http_client
+
+     # Create an OpenAI client of langchain_openai on the shared connection pool
+     def _openai(self, class_name, params):
+          model_class = getattr(lazy_import("langchain_openai"), class_name)
+          return model_class(http_client=self.http_client(), **params)
+
+     def llm(self, **params):
+          """
+          Returns the shared OpenAI (completion) client of the given arguments.
+
+          Args:
+          **params: Arguments of langchain_openai.OpenAI (model, temperature, cache, callbacks...).
+
+          Returns:
+          OpenAI: The language model.
+          """
+          return self._get(_key("llm", params), lambda: self._openai("OpenAI", params), params)
+
+     def chat_model(self, **params):
+          """
+          Returns the shared ChatOpenAI client of the given arguments.
+
+          Args:
+          **params: Arguments of langchain_openai.ChatOpenAI (model_name, temperature, cache, callbacks...).
+
+          Returns:
+          ChatOpenAI: The chat model.
+          """
+          return self._get(_key("chat_model", params), lambda: self._openai("ChatOpenAI", params), params)
+
+     def embeddings(self, provider="openai", **params):
+          """
+          Returns the shared embedding model of the given arguments (local models are loaded once).
+
+          Args:
+          provider (str): "openai" (OpenAIEmbeddings) or "sentence_transformer" (SentenceTransformerEmbeddings).
+          **params: Arguments of the embeddings class (e.g. model_name="all-MiniLM-L6-v2").
+
+          Returns:
+          Embeddings: The embedding model.
+          """
+          if provider == "openai":
+               return self._get(_key("openai_embeddings", params), lambda: self._openai("OpenAIEmbeddings", params), params)
+          if provider == "sentence_transformer":
+               return self._get(_key("sentence_transformer", params), lambda: lazy_import(
+                    "langchain_community.embeddings").SentenceTransformerEmbeddings(**params), params)
+          raise ValueError(f"Unknown embeddings provider: {provider}")
+
+     def pinecone(self, api_key, environment=None):
+          """
+          Returns the shared Pinecone client of an API key.
+
+          Args:
+          api_key (str): API key for Pinecone.
+          environment (str): Environment for Pinecone (e.g., gcp-starter).
+
+          Returns:
+          pinecone.Pinecone: The Pinecone client.
+          """
+          return self._get(_key("pinecone", {"api_key": api_key, "environment": environment}),
+                           lambda: lazy_import("pinecone").Pinecone(api_key=api_key, environment=environment))
+
+     def search_tool(self):
+          """
+          Returns:
+          DuckDuckGoSearchRun: The shared web search tool.
+          """
+          return self._get(("search_tool",), lambda: lazy_import("langchain_community.tools").DuckDuckGoSearchRun())
+
+     def clear(self):
+          """
+          Drops the cached clients and models (e.g. after changing the API keys).
+          """
+          with self._lock:
+               self._instances.clear()
+
+
+# Pool shared by all the scripts of the process
+PROVIDERS = ProviderPool()
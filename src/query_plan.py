@@ -0,0 +1,298 @@
+import re
+import time
+
+import pandas as pd
+
+# Aggregates of a query plan, and the words that ask for them
+AGGREGATE_WORDS = {
+     "mean": ["average", "avg", "mean"],
+     "sum": ["total", "sum of", "sum"],
+     "max": ["maximum", "max", "highest", "largest", "top"],
+     "min": ["minimum", "min", "lowest", "smallest"],
+     "median": ["median"],
+     "count": ["how many", "number of", "count of", "count"],
+}
+
+# Comparison operators of the filters, and the words that ask for them (longest first when matching)
+OPERATOR_WORDS = {
+     ">=": [">=", "at least"],
+     "<=": ["<=", "at most"],
+     "!=": ["!=", "is not", "not equal to"],
+     ">": [">", "greater than", "more than", "above", "over"],
+     "<": ["<", "less than", "below", "under"],
+     "==": ["==", "=", "equals", "equal to", "is"],
+}
+
+# Vectorized pandas comparison of every operator
+OPERATORS = {
+     "==": lambda values, value: values == value,
+     "!=": lambda values, value: values != value,
+     ">": lambda values, value: values > value,
+     ">=": lambda values, value: values >= value,
+     "<": lambda values, value: values < value,
+     "<=": lambda values, value: values <= value,
+}
+
+
+class QueryPlanError(ValueError):
+     """
+     Raised when a query plan does not fit the DataFrame (unknown column, non-numeric aggregate, bad value...).
+     """
+
+
+class QueryPlan:
+     """
+     A small aggregate query: aggregate(column) over the rows matching every filter,
+     optionally per group of group_by.
+     """
+
+     def __init__(self, aggregate, column=None, group_by=None, filters=None):
+          """
+          Args:
+          aggregate (str): One of "count", "sum", "mean", "min", "max", "median".
+          column (str): The aggregated column (None for a row count).
+          group_by (str): The column to group by (None = a single value).
+          filters (List[tuple]): (column, operator, value) conditions, all of them must hold.
+          """
+          self.aggregate = aggregate
+          self.column = column
+          self.group_by = group_by
+          self.filters = filters or []
+
+     def as_dict(self):
+          return {"aggregate": self.aggregate, "column": self.column, "group_by": self.group_by,
+                  "filters": [list(condition) for condition in self.filters]}
+
+     def __repr__(self):
+          return f"QueryPlan({self.as_dict()})"
+
+     def validate(self, df):
+          """
+          Checks the plan against the DataFrame and converts the filter values to the column types.
+
+          Args:
+          df (pd.DataFrame): The DataFrame the plan runs on.
+
+          Returns:
+          QueryPlan: The validated plan, with typed filter values.
+
+          Raises:
+          QueryPlanError: When the plan cannot run on the DataFrame.
+          """
+          if self.aggregate not in AGGREGATE_WORDS:
+               raise QueryPlanError(f"Unknown aggregate {self.aggregate!r}")
+          for column in [self.column, self.group_by] + [condition[0] for condition in self.filters]:
+               if column is not None and column not in df.columns:
+                    raise QueryPlanError(f"Unknown column {column!r}")
+          if self.aggregate != "count":
+               if self.column is None:
+                    raise QueryPlanError(f"{self.aggregate} needs a column")
+               values = df[self.column]
+               numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+               dates = pd.api.types.is_datetime64_any_dtype(values)
+               if not numeric and not (dates and self.aggregate in ("min", "max", "median")):
+                    raise QueryPlanError(f"Cannot compute the {self.aggregate} of column {self.column!r}")
+          filters = []
+          for column, operator, value in self.filters:
+               if operator not in OPERATORS:
+                    raise QueryPlanError(f"Unknown operator {operator!r}")
+               filters.append((column, operator, typed_value(df[column], operator, value)))
+          return QueryPlan(self.aggregate, self.column, self.group_by, filters)
+
+     def columns(self):
+          """
+          Returns:
+          List[str]: The columns the plan reads.
+          """
+          columns = [self.column, self.group_by] + [condition[0] for condition in self.filters]
+          return list(dict.fromkeys(column for column in columns if column is not None))
+
+     def mask(self, df):
+          """
+          Returns:
+          pd.Series: True for the rows of df matching every filter.
+          """
+          mask = pd.Series(True, index=df.index)
+          for column, operator, value in self.filters:
+               mask &= OPERATORS[operator](df[column], value).fillna(False).astype(bool)
+          return mask
+
+     def execute(self, df):
+          """
+          Runs the plan with vectorized pandas operations (validate it first).
+
+          Args:
+          df (pd.DataFrame): The DataFrame to query.
+
+          Returns:
+          scalar or pd.Series: The aggregate, per group when group_by is set.
+          """
+          rows = df[self.mask(df)] if self.filters else df
+          if self.group_by is not None:
+               groups = rows.groupby(self.group_by, observed=True, sort=True)
+               if self.aggregate == "count":
+                    # Rows per group, or the non-null values of the column per group (like the ungrouped count)
+                    return groups.size() if self.column is None else groups[self.column].count()
+               return groups[self.column].agg(self.aggregate)
+          if self.aggregate == "count":
+               return int(len(rows)) if self.column is None else int(rows[self.column].count())
+          return rows[self.column].agg(self.aggregate)
+
+# Function to convert a filter value written in the question to the type of its column
+def typed_value(values, operator, value):
+     try:
+          if pd.api.types.is_datetime64_any_dtype(values):
+               return pd.Timestamp(value)
+          if pd.api.types.is_numeric_dtype(values):
+               return float(value)
+     except (ValueError, TypeError):
+          raise QueryPlanError(f"{value!r} is not a valid value of column {values.name!r}")
+     if operator not in ("==", "!="):
+          raise QueryPlanError(f"Cannot compare text column {values.name!r} with {operator}")
+     # Text and categories: match the stored spelling of the value, ignoring case
+     for stored in pd.unique(values.dropna()):
+          if str(stored).lower() == str(value).lower():
+               return stored
+     return value
+
+# Function to find the column named in a piece of the question (JOB_ID, "job id", "salary"...)
+def match_column(text, columns):
+     wanted = re.sub(r"[\s_]+", " ", text.strip().lower())
+     for column in columns:
+          if re.sub(r"[\s_]+", " ", str(column).lower()) == wanted:
+               return column
+     return None
+
+# Regular expression matching any of the words of a table
+def words_pattern(table):
+     words = sorted((word for words in table.values() for word in words), key=len, reverse=True)
+     return "|".join(re.escape(word) for word in words)
+
+
+AGGREGATE_PATTERN = words_pattern(AGGREGATE_WORDS)
+OPERATOR_PATTERN = words_pattern(OPERATOR_WORDS)
+
+# Words meaning "rows" in a count question
+ROW_NOUNS = r"(?:rows|records|entries|lines|employees|people|items)(?: are there| in the data| in the file)?"
+
+# Names of the aggregates in the answers
+AGGREGATE_NAMES = {"mean": "average", "sum": "total", "max": "maximum", "min": "minimum", "median": "median"}
+
+# Function to compile a question into a query plan, when it matches a supported intent
+def parse_query(query, columns):
+     """
+     Recognizes aggregate / filter / group-by questions, e.g. "average SALARY by DEPARTMENT_ID",
+     "how many employees where JOB_ID is SH_CLERK", "max SALARY per JOB_ID where DEPARTMENT_ID = 50".
+
+     Args:
+     query (str): The question in natural language.
+     columns (List[str]): The columns of the DataFrame.
+
+     Returns:
+     QueryPlan: The plan (not validated yet), or None when the question is not a supported intent.
+     """
+     text = query.strip().rstrip("?.!").strip()
+     # Columns can be written with spaces instead of underscores ("department id"), longest names first
+     column_names = "|".join(re.escape(str(c)).replace("_", "[ _]") for c in sorted(columns, key=lambda c: len(str(c)), reverse=True))
+     column_pattern = rf"(?:the\s+)?({column_names})"
+
+     # Filters: "where COLUMN OPERATOR VALUE [and ...]" at the end of the question
+     filters = []
+     where = re.search(r"\s+(?:where|with|for rows where)\s+(.+)$", text, re.IGNORECASE)
+     if where:
+          for condition in re.split(r"\s+and\s+", where.group(1), flags=re.IGNORECASE):
+               match = re.fullmatch(rf"{column_pattern}\s*({OPERATOR_PATTERN})\s*['\"]?(.+?)['\"]?", condition.strip(),
+                                    re.IGNORECASE)
+               if match is None:
+                    return None
+               operator = next(op for op, words in OPERATOR_WORDS.items() if match.group(2).lower() in words)
+               filters.append((match_column(match.group(1), columns), operator, match.group(3).strip()))
+          text = text[:where.start()]
+
+     # Grouping: "by / per / for each COLUMN" at the end of what is left
+     group_by = None
+     group = re.search(rf"\s+(?:grouped by|group by|by|per|for each|for every|in each)\s+{column_pattern}$", text, re.IGNORECASE)
+     if group:
+          group_by = match_column(group.group(1), columns)
+          text = text[:group.start()]
+
+     # Aggregate: "AGGREGATE [of] [the] COLUMN", or a row count
+     match = re.fullmatch(rf"(?:what is|what's|show|give me|find|compute)?\s*(?:the\s+)?({AGGREGATE_PATTERN})\s+(?:of\s+)?"
+                          rf"(?:the\s+)?(.+?)", text.strip(), re.IGNORECASE)
+     if match is None:
+          return None
+     aggregate = next(name for name, words in AGGREGATE_WORDS.items() if match.group(1).lower() in words)
+     column = match_column(match.group(2), columns)
+     if column is None:
+          # "how many employees / rows / records" counts rows ("how many departments" is left to the agent)
+          if aggregate != "count" or not re.fullmatch(ROW_NOUNS, match.group(2), re.IGNORECASE):
+               return None
+     return QueryPlan(aggregate, column, group_by, filters)
+
+# Function to write the answer of a plan in plain text
+def format_answer(plan, result, approximate=False, rows=None):
+     """
+     Args:
+     plan (QueryPlan): The executed plan.
+     result (scalar or pd.Series): Its result.
+     approximate (bool): The result is an estimate (quantiles of the chunked mode).
+     rows (int): Number of rows selected by the filters, tells "no rows" from "only null values" when result is NaN.
+
+     Returns:
+     str: The answer.
+     """
+     if plan.aggregate == "count":
+          subject = "number of rows" if plan.column is None else f"number of {plan.column} values"
+     else:
+          subject = f"{AGGREGATE_NAMES[plan.aggregate]} {plan.column}"
+     if approximate:
+          subject = f"approximate {subject}"
+     conditions = " and ".join(f"{column} {operator} {display_value(value)}" for column, operator, value in plan.filters)
+     where = f" where {conditions}" if conditions else ""
+     if isinstance(result, pd.Series):
+          if result.empty:
+               return f"No rows match{where}."
+          return f"The {subject} by {plan.group_by}{where} is:\n{result.to_string()}"
+     if pd.isna(result):
+          if rows:
+               return f"The {subject}{where} is undefined: the {rows} matching rows have no non-null {plan.column} values."
+          return f"No rows match{where}."
+     return f"The {subject}{where} is {display_value(result)}."
+
+# Function to print a value without float noise (50.0 -> 50, 6182.3200000001 -> 6182.32)
+def display_value(value):
+     if isinstance(value, float) or (hasattr(value, "dtype") and pd.api.types.is_float_dtype(value.dtype)):
+          value = float(value)
+          if value.is_integer():
+               return str(int(value))
+          return f"{value:.6g}" if abs(value) < 1e6 else f"{value:.2f}"
+     if isinstance(value, pd.Timestamp):
+          return value.strftime("%Y-%m-%d")
+     return str(value)
+
+# Function to answer a question with the fast path, or tell the caller to use the agent
+def answer_query(df, query):
+     """
+     Compiles, validates and runs a question without any LLM call.
+
+     Args:
+     df (pd.DataFrame): The DataFrame to query.
+     query (str): The question in natural language.
+
+     Returns:
+     dict: {"input", "output", "plan", "result", "seconds"}, or None when the question needs the agent.
+     """
+     start = time.perf_counter()
+     plan = parse_query(query, list(df.columns))
+     if plan is None:
+          return None
+     try:
+          plan = plan.validate(df)
+     except QueryPlanError:
+          return None
+     result = plan.execute(df)
+     rows = None
+     if not isinstance(result, pd.Series) and pd.isna(result):
+          rows = int(plan.mask(df).sum()) if plan.filters else len(df)  # Rows matched, but maybe only null values
+     return {"input": query, "output": format_answer(plan, result, rows=rows), "plan": plan.as_dict(), "result": result,
+             "seconds": time.perf_counter() - start}
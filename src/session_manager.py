@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from streaming import StreamMetrics, chunk_text
+
+logger = logging.getLogger(__name__)
+
+# Default folder of the sessions spilled to disk, next to the 'data' folder outside the 'src' folder
+DEFAULT_SESSIONS_DIR = '../data/.sessions'
+
+# Default prompt of LangChain's ConversationChain
+CONVERSATION_TEMPLATE = (
+     "The following is a friendly conversation between a human and an AI. The AI is talkative and provides lots of "
+     "specific details from its context. If the AI does not know the answer to a question, it truthfully says it "
+     "does not know.\n\nCurrent conversation:\n{history}\nHuman: {input}\nAI:"
+)
+
+# Progressive summarization prompt of LangChain's ConversationSummaryMemory
+SUMMARY_TEMPLATE = (
+     "Progressively summarize the lines of conversation provided, adding onto the previous summary returning a new "
+     "summary.\n\nEXAMPLE\nCurrent summary:\nThe human asks what the AI thinks of artificial intelligence. The AI "
+     "thinks artificial intelligence is a force for good.\n\nNew lines of conversation:\nHuman: Why do you think "
+     "artificial intelligence is a force for good?\nAI: Because artificial intelligence will help humans reach their "
+     "full potential.\n\nNew summary:\nThe human asks what the AI thinks of artificial intelligence. The AI thinks "
+     "artificial intelligence is a force for good because it will help humans reach their full potential.\nEND OF "
+     "EXAMPLE\n\nCurrent summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:"
+)
+
+# Function to format turns like LangChain's get_buffer_string
+def format_turns(turns):
+     return "\n".join(f"Human: {human}\nAI: {ai}" for human, ai in turns)
+
+
+class Session:
+     """
+     Hybrid memory of one conversation: a running summary of the old turns, and the
+     recent turns kept verbatim (including turns waiting to be summarized).
+     """
+
+     def __init__(self, session_id, summary="", turns=None, last_access=None):
+          self.session_id = session_id
+          self.summary = summary
+          self.turns = [tuple(turn) for turn in turns or []]  # (human, ai) pairs not yet in the summary
+          self.last_access = last_access or time.time()
+          self.summarizing = None  # Future of the summary being computed in the background
+          self.lock = threading.Lock()
+
+     def history(self):
+          """
+          Returns:
+          str: The history of the conversation prompt: the summary, then the verbatim turns.
+          """
+          with self.lock:
+               lines = [f"System: {self.summary}"] if self.summary else []
+               if self.turns:
+                    lines.append(format_turns(self.turns))
+          return "\n".join(lines)
+
+     def memory_bytes(self):
+          """
+          Returns:
+          int: Size in bytes of the text held by the session.
+          """
+          with self.lock:
+               return len(self.summary.encode("utf-8")) + sum(len(h.encode("utf-8")) + len(a.encode("utf-8"))
+                                                              for h, a in self.turns)
+
+     def to_dict(self):
+          with self.lock:
+               return {"session_id": self.session_id, "summary": self.summary, "turns": self.turns,
+                       "last_access": self.last_access}
+
+
+class SessionManager:
+     """
+     Conversations of many users, keyed by session id.
+
+     At most max_live_sessions sessions are kept in memory: the least recently used ones, and the
+     ones idle for more than ttl seconds, are spilled to disk and loaded back on their next turn.
+     Each session keeps its last `window` turns verbatim; once `summarize_every` older turns have
+     piled up, they are folded into the summary by a background worker, off the request path.
+     Evicted sessions are written to disk by another background worker, once their summary is done.
+     """
+
+     def __init__(self, llm, max_live_sessions=1000, ttl=3600, spill_dir=DEFAULT_SESSIONS_DIR, window=4,
+                  summarize_every=4, summary_workers=2):
+          """
+          Args:
+          llm (BaseLanguageModel): The model answering the users (and writing the summaries).
+          max_live_sessions (int): Maximum number of sessions kept in memory.
+          ttl (float): Seconds of inactivity before a session is spilled to disk (None = only on LRU eviction).
+          spill_dir (str): Folder of the spilled sessions (None = evicted sessions are dropped).
+          window (int): Number of recent turns always kept verbatim.
+          summarize_every (int): Number of turns beyond the window that trigger a background summary.
+          summary_workers (int): Number of background summarization threads.
+          """
+          self.llm = llm
+          self.max_live_sessions = max_live_sessions
+          self.ttl = ttl
+          self.spill_dir = spill_dir
+          self.window = window
+          self.summarize_every = summarize_every
+          self.stats = {"turns": 0, "summaries": 0, "spilled": 0, "loaded": 0, "created": 0}
+          self._sessions = OrderedDict()  # session_id -> Session, least recently used first
+          self._spilling = {}  # session_id -> Session evicted but not yet written to disk
+          self._lock = threading.Lock()
+          self._executor = ThreadPoolExecutor(max_workers=summary_workers)
+          # Spills wait for summaries, so they get a worker of their own (they would deadlock the summary pool)
+          self._spill_executor = ThreadPoolExecutor(max_workers=1)
+          if spill_dir:
+               os.makedirs(spill_dir, exist_ok=True)
+
+     # File of a spilled session (the id is hashed, it can contain any character)
+     def _path(self, session_id):
+          return os.path.join(self.spill_dir, hashlib.sha256(session_id.encode("utf-8")).hexdigest() + ".json")
+
+     # Increment a counter (turns and summaries are counted from several threads)
+     def _count(self, key, n=1):
+          with self._lock:
+               self.stats[key] += n
+
+     # Write an evicted session to disk, once its background summaries are done
+     def _spill(self, session):
+          while (summarizing := session.summarizing) is not None:
+               summarizing.result()  # _summarize logs its errors, the future never raises
+          path = self._path(session.session_id) if self.spill_dir else None
+          if path:
+               with open(path + ".tmp", "w") as f:
+                    json.dump(session.to_dict(), f)
+               os.replace(path + ".tmp", path)
+          with self._lock:
+               if self._spilling.get(session.session_id) is session:
+                    del self._spilling[session.session_id]
+                    self.stats["spilled"] += 1
+               elif path and self._sessions.get(session.session_id) is session:
+                    os.remove(path)  # The session came back meanwhile, it is live again
+
+     def get(self, session_id):
+          """
+          Returns the session of an id: live, loaded back from disk, or new.
+
+          Args:
+          session_id (str): The id of the session (e.g. a user id).
+
+          Returns:
+          Session: The session.
+          """
+          spill = []
+          with self._lock:
+               session = self._sessions.get(session_id)
+               if session is not None:
+                    self._sessions.move_to_end(session_id)
+               elif session_id in self._spilling:
+                    session = self._spilling.pop(session_id)  # Evicted while being written, take it back
+                    self._sessions[session_id] = session
+               else:
+                    path = self._path(session_id) if self.spill_dir else None
+                    if path and os.path.exists(path):
+                         with open(path) as f:
+                              session = Session(**json.load(f))
+                         os.remove(path)
+                         self.stats["loaded"] += 1
+                    else:
+                         session = Session(session_id)
+                         self.stats["created"] += 1
+                    self._sessions[session_id] = session
+               session.last_access = time.time()
+
+               # Evict the least recently used sessions, and the idle ones
+               now = time.time()
+               while len(self._sessions) > self.max_live_sessions:
+                    spill.append(self._sessions.popitem(last=False)[1])
+               while self.ttl is not None and self._sessions:
+                    oldest = next(iter(self._sessions.values()))
+                    if now - oldest.last_access <= self.ttl:
+                         break
+                    spill.append(self._sessions.popitem(last=False)[1])
+               for evicted in spill:
+                    self._spilling[evicted.session_id] = evicted
+          for evicted in spill:
+               self._spill_executor.submit(self._spill, evicted)  # Off the request path of this user
+          return session
+
+     # Fold the turns beyond the window into the summary, in the background
+     def _maybe_summarize(self, session):
+          with session.lock:
+               overflow = session.turns[:max(0, len(session.turns) - self.window)]
+               if session.summarizing is not None or len(overflow) < self.summarize_every:
+                    return
+               summary = session.summary
+               session.summarizing = self._executor.submit(self._summarize, session, summary, overflow)
+
+     def _summarize(self, session, summary, overflow):
+          try:
+               new_summary = chunk_text(self.llm.invoke(SUMMARY_TEMPLATE.format(summary=summary, new_lines=format_turns(overflow))))
+               with session.lock:
+                    session.summary = new_summary.strip()
+                    session.turns = session.turns[len(overflow):]  # Turns are only appended meanwhile
+               self._count("summaries")
+          except Exception:
+               # The turns stay verbatim and the summary is tried again on the next turn of the session
+               logger.exception("Summary of session %r failed", session.session_id)
+               return
+          finally:
+               with session.lock:
+                    session.summarizing = None
+          self._maybe_summarize(session)  # More turns may have piled up during the summary
+
+     def _prompt(self, session, user_input):
+          return CONVERSATION_TEMPLATE.format(history=session.history(), input=user_input)
+
+     # Record a finished turn
+     def _add_turn(self, session, user_input, response):
+          with session.lock:
+               session.turns.append((user_input, response.strip()))
+          self._count("turns")
+          self._maybe_summarize(session)
+
+     def predict(self, session_id, user_input):
+          """
+          Answers a message in the conversation of a session (like conversation.predict(input=...)).
+
+          Args:
+          session_id (str): The id of the session.
+          user_input (str): The user's message.
+
+          Returns:
+          str: The response of the model.
+          """
+          session = self.get(session_id)
+          response = chunk_text(self.llm.invoke(self._prompt(session, user_input)))
+          self._add_turn(session, user_input, response)
+          return response
+
+     def stream(self, session_id, user_input, metrics=None):
+          """
+          Streaming version of predict, the turn is recorded once the stream ends.
+
+          Args:
+          session_id (str): The id of the session.
+          user_input (str): The user's message.
+          metrics (StreamMetrics): Filled with the time to first token and tokens per second (optional).
+
+          Yields:
+          str: The tokens of the response.
+          """
+          metrics = metrics or StreamMetrics()
+          metrics.start()
+          session = self.get(session_id)
+          pieces = []
+          for chunk in self.llm.stream(self._prompt(session, user_input)):
+               text = chunk_text(chunk)
+               metrics.token(text)
+               pieces.append(text)
+               yield text
+          metrics.finish()
+          self._add_turn(session, user_input, "".join(pieces))
+
+     def memory_report(self):
+          """
+          Returns:
+          dict: Number of live and spilled sessions, and the text held in memory per live session.
+          """
+          with self._lock:
+               sessions = list(self._sessions.values())
+          sizes = [session.memory_bytes() for session in sessions]
+          spilled = sum(name.endswith(".json") for name in os.listdir(self.spill_dir)) if self.spill_dir else 0
+          return {"live_sessions": len(sessions), "spilled_sessions": spilled,
+                  "mean_bytes_per_session": sum(sizes) / len(sizes) if sizes else 0, "max_bytes_per_session": max(sizes, default=0)}
+
+     def close(self):
+          """
+          Waits for the background summaries and spills every live session to disk.
+          """
+          with self._lock:
+               sessions = list(self._sessions.values())
+               self._sessions.clear()
+               for session in sessions:
+                    self._spilling[session.session_id] = session
+          for session in sessions:
+               self._spill(session)
+          self._spill_executor.shutdown(wait=True)
+          self._executor.shutdown(wait=True)
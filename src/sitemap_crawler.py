@@ -0,0 +1,265 @@
+import os
+import json
+import random
+import asyncio
+import xml.etree.ElementTree as ET
+
+import aiohttp  # Async HTTP client with a bounded connection pool
+from bs4 import BeautifulSoup  # Same HTML to text extraction as SitemapLoader
+from langchain_core.documents import Document
+
+# Default location of the stored ETag / Last-Modified validators, next to the 'data' folder outside the 'src' folder
+DEFAULT_VALIDATORS_PATH = '../data/.crawler_validators.json'
+
+# HTTP statuses worth retrying (rate limiting and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Function to extract the text of a web page, like the default parsing function of SitemapLoader
+def html_to_text(html):
+     """
+     Extracts the visible text of an HTML page.
+
+     Args:
+     html (str): The HTML content of the page.
+
+     Returns:
+     str: The text of the page.
+     """
+     return str(BeautifulSoup(html, "html.parser").get_text())
+
+# Function to parse a sitemap (or sitemap index) XML document
+def parse_sitemap(xml_text):
+     """
+     Parses the <url> and <sitemap> entries of a sitemap XML document.
+
+     Args:
+     xml_text (str): The sitemap XML.
+
+     Returns:
+     Tuple[List[dict], List[str]]: The page entries ({"loc", "lastmod"}) and the URLs of nested sitemaps.
+     """
+     root = ET.fromstring(xml_text)
+     pages, sitemaps = [], []
+     for element in root:
+          tag = element.tag.rsplit("}", 1)[-1]  # Drop the XML namespace
+          fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in element}
+          if not fields.get("loc"):
+               continue
+          if tag == "url":
+               pages.append({"loc": fields["loc"], "lastmod": fields.get("lastmod")})
+          elif tag == "sitemap":
+               sitemaps.append(fields["loc"])
+     return pages, sitemaps
+
+
+class SitemapCrawler:
+     """
+     Asyncio crawler for the pages listed in a sitemap.
+
+     Pages are fetched through a bounded connection pool with a per-host limit, transient
+     failures are retried with exponential backoff, and pages fetched before are requested
+     conditionally (If-None-Match / If-Modified-Since) so unchanged pages cost a 304.
+     Documents are yielded as soon as they are fetched, so downstream work can start early.
+     """
+
+     def __init__(self, max_connections=32, per_host=8, max_retries=3, backoff=0.5, timeout=30,
+                  validators_path=None, queue_size=64):
+          """
+          Args:
+          max_connections (int): Size of the connection pool (and number of fetch workers).
+          per_host (int): Maximum number of concurrent connections to a single host.
+          max_retries (int): Retries of a page after a network error or a retryable status.
+          backoff (float): Base delay in seconds of the exponential backoff.
+          timeout (float): Total timeout in seconds of a single request.
+          validators_path (str): JSON file where ETag / Last-Modified validators are kept between runs (None = in memory only).
+          queue_size (int): Maximum number of fetched documents waiting for the consumer.
+          """
+          self.max_connections = max_connections
+          self.per_host = per_host
+          self.max_retries = max_retries
+          self.backoff = backoff
+          self.timeout = timeout
+          self.validators_path = validators_path
+          self.queue_size = queue_size
+          self.validators = self._load_validators()
+          self.stats = {"fetched": 0, "not_modified": 0, "failed": 0, "retries": 0}
+          self.not_modified_urls = []  # Pages that answered 304, so callers can refresh what they know of them
+
+     def _load_validators(self):
+          if self.validators_path and os.path.exists(self.validators_path):
+               with open(self.validators_path) as f:
+                    return json.load(f)
+          return {}
+
+     def save_validators(self):
+          """
+          Writes the ETag / Last-Modified validators to validators_path (if set).
+          """
+          if not self.validators_path:
+               return
+          with open(self.validators_path + ".tmp", "w") as f:
+               json.dump(self.validators, f)
+          os.replace(self.validators_path + ".tmp", self.validators_path)
+
+     def session(self):
+          """
+          Opens an HTTP session with the bounded connection pool of the crawler.
+
+          Returns:
+          aiohttp.ClientSession: The session (use it as an async context manager).
+          """
+          connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host)
+          return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+     # GET a URL with retries; returns (status, text, headers), status None when every attempt failed
+     async def _get(self, session, url, headers=None):
+          for attempt in range(self.max_retries + 1):
+               try:
+                    async with session.get(url, headers=headers) as response:
+                         if response.status not in RETRY_STATUSES:
+                              text = await response.text() if response.status == 200 else ""
+                              return response.status, text, response.headers
+                         retry_after = response.headers.get("Retry-After", "")
+               except (aiohttp.ClientError, asyncio.TimeoutError):
+                    retry_after = ""
+               if attempt == self.max_retries:
+                    break
+               self.stats["retries"] += 1
+               delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+               await asyncio.sleep(delay * (0.5 + random.random() / 2))  # Jitter spreads out the retries
+          return None, "", {}
+
+     async def sitemap_entries(self, session, sitemap_url, visited=None):
+          """
+          Lists the pages of a sitemap, following nested sitemap indexes (each sitemap is read once,
+          so indexes listing each other do not loop).
+
+          Args:
+          session (aiohttp.ClientSession): The HTTP session.
+          sitemap_url (str): URL of the sitemap.
+          visited (Set[str]): Sitemaps already read, shared by the nested calls.
+
+          Returns:
+          List[dict]: The page entries ({"loc", "lastmod"}).
+          """
+          visited = set() if visited is None else visited
+          visited.add(sitemap_url)
+          status, text, _ = await self._get(session, sitemap_url)
+          if status != 200:
+               raise RuntimeError(f"Could not fetch sitemap {sitemap_url} (status {status})")
+          pages, sitemaps = parse_sitemap(text)
+          sitemaps = [url for url in dict.fromkeys(sitemaps) if url not in visited]
+          visited.update(sitemaps)  # Before the gather, so sibling indexes do not read the same sitemap twice
+          nested = await asyncio.gather(*(self.sitemap_entries(session, url, visited) for url in sitemaps))
+          for entries in nested:
+               pages.extend(entries)
+          return pages
+
+     async def list_entries(self, sitemap_url):
+          """
+          Lists the pages of a sitemap in a session of its own.
+
+          Args:
+          sitemap_url (str): URL of the sitemap.
+
+          Returns:
+          List[dict]: The page entries ({"loc", "lastmod"}).
+          """
+          async with self.session() as session:
+               return await self.sitemap_entries(session, sitemap_url)
+
+     # Fetch a single page conditionally and turn it into a Document (None when unchanged or failed)
+     async def _fetch_page(self, session, entry):
+          url = entry["loc"]
+          headers = {}
+          validator = self.validators.get(url, {})
+          if validator.get("etag"):
+               headers["If-None-Match"] = validator["etag"]
+          if validator.get("last_modified"):
+               headers["If-Modified-Since"] = validator["last_modified"]
+
+          try:
+               status, html, response_headers = await self._get(session, url, headers)
+               if status == 304:
+                    self.stats["not_modified"] += 1
+                    self.not_modified_urls.append(url)
+                    return None
+               if status != 200:
+                    self.stats["failed"] += 1
+                    return None
+               # HTML parsing is CPU work, keep it off the event loop so fetching continues meanwhile
+               text = await asyncio.to_thread(html_to_text, html)
+          except Exception:
+               # A broken page (undecodable body, unparsable HTML) must not stop the crawl
+               self.stats["failed"] += 1
+               return None
+
+          self.stats["fetched"] += 1
+          self.validators[url] = {"etag": response_headers.get("ETag"),
+                                  "last_modified": response_headers.get("Last-Modified")}
+          return Document(page_content=text, metadata={"source": url, "loc": url, "lastmod": entry.get("lastmod")})
+
+     async def crawl(self, sitemap_url, entries=None, save_validators=True):
+          """
+          Fetches the pages of a sitemap and yields them as documents while the crawl goes on.
+
+          Args:
+          sitemap_url (str): URL of the sitemap.
+          entries (List[dict]): Page entries to fetch instead of the full sitemap (e.g. only changed pages).
+          save_validators (bool): Save the validators when the crawl ends. Pass False when the pages still have
+          to be processed, and call save_validators() once they are (or a failed run would skip them next time).
+
+          Yields:
+          Document: One document per fetched (and modified) page.
+          """
+          async with self.session() as session:
+               if entries is None:
+                    entries = await self.sitemap_entries(session, sitemap_url)
+
+               pending = asyncio.Queue()
+               for entry in entries:
+                    pending.put_nowait(entry)
+               results = asyncio.Queue(maxsize=self.queue_size)  # Bounded: slow consumers pause the workers
+               done = object()
+
+               async def worker():
+                    try:
+                         while not pending.empty():
+                              entry = pending.get_nowait()
+                              doc = await self._fetch_page(session, entry)
+                              if doc is not None:
+                                   await results.put(doc)
+                    except Exception:  # Not CancelledError: a cancelled worker must not put to a queue nobody reads
+                         self.stats["failed"] += 1
+                    # Signal the end, or the consumer would wait for this worker forever
+                    await results.put(done)
+
+               workers = [asyncio.create_task(worker()) for _ in range(min(self.max_connections, max(1, len(entries))))]
+               try:
+                    remaining = len(workers)
+                    while remaining:
+                         doc = await results.get()
+                         if doc is done:
+                              remaining -= 1
+                         else:
+                              yield doc
+               finally:
+                    for task in workers:
+                         task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    if save_validators:
+                         self.save_validators()
+
+# Function to crawl a sitemap as an async generator of documents
+def crawl_sitemap(sitemap_url, **crawler_options):
+     """
+     Shortcut for SitemapCrawler(**crawler_options).crawl(sitemap_url).
+
+     Args:
+     sitemap_url (str): URL of the sitemap.
+     **crawler_options: Options of SitemapCrawler.
+
+     Returns:
+     AsyncIterator[Document]: The fetched documents.
+     """
+     return SitemapCrawler(**crawler_options).crawl(sitemap_url)
@@ -0,0 +1,102 @@
+import time
+import asyncio
+
+
+class StreamMetrics:
+     """
+     Time-to-first-token and throughput of a streamed completion.
+     Every streamed chunk counts as one token (OpenAI streams about one token per chunk).
+     """
+
+     def __init__(self):
+          self.started = None
+          self.first_token = None
+          self.finished = None
+          self.tokens = 0
+
+     def start(self):
+          self.started = time.perf_counter()
+
+     def token(self, text):
+          if self.first_token is None:
+               self.first_token = time.perf_counter()
+          self.tokens += 1
+
+     def finish(self):
+          self.finished = time.perf_counter()
+
+     def as_dict(self):
+          """
+          Returns:
+          dict: Time to first token and total time in milliseconds, number of tokens and tokens per second.
+          """
+          end = self.finished if self.finished is not None else time.perf_counter()
+          generating = end - self.first_token if self.first_token is not None else 0.0
+          return {
+               "ttft_ms": (self.first_token - self.started) * 1000 if self.first_token is not None else None,
+               "total_ms": (end - self.started) * 1000 if self.started is not None else None,
+               "tokens": self.tokens,
+               # Rate of the tokens after the first one, the first token pays for the prompt processing
+               "tokens_per_second": (self.tokens - 1) / generating if self.tokens > 1 and generating > 0 else None,
+          }
+
+# Function to get the text of a streamed chunk (LLMs stream strings, chat models stream message chunks)
+def chunk_text(chunk):
+     return chunk if isinstance(chunk, str) else chunk.content
+
+# Function to build the prompt of a conversation chain, with the history loaded from its memory
+def _conversation_prompt(conversation, inputs):
+     return conversation.prompt.format_prompt(**{key: inputs[key] for key in conversation.prompt.input_variables})
+
+# Function to stream the answer of a ConversationChain token by token
+def stream_conversation(conversation, user_input, metrics=None):
+     """
+     Streams the answer of a ConversationChain (what conversation.predict(input=...) returns, piece by piece).
+     The memory is updated once, after the last token.
+
+     Args:
+     conversation (ConversationChain): The conversation, with its LLM and memory.
+     user_input (str): The user's message.
+     metrics (StreamMetrics): Filled with the time to first token and tokens per second (optional).
+
+     Yields:
+     str: The tokens of the answer.
+     """
+     metrics = metrics or StreamMetrics()
+     metrics.start()
+     inputs = conversation.prep_inputs({conversation.input_key: user_input})
+     pieces = []
+     for chunk in conversation.llm.stream(_conversation_prompt(conversation, inputs)):
+          text = chunk_text(chunk)
+          metrics.token(text)
+          pieces.append(text)
+          yield text
+     metrics.finish()
+     # Save the exchange to memory once (a summary memory calls the LLM here)
+     conversation.prep_outputs(inputs, {conversation.output_key: "".join(pieces)})
+
+# Function to stream the answer of a ConversationChain as an async iterator
+async def astream_conversation(conversation, user_input, metrics=None):
+     """
+     Async version of stream_conversation.
+
+     Args:
+     conversation (ConversationChain): The conversation, with its LLM and memory.
+     user_input (str): The user's message.
+     metrics (StreamMetrics): Filled with the time to first token and tokens per second (optional).
+
+     Yields:
+     str: The tokens of the answer.
+     """
+     metrics = metrics or StreamMetrics()
+     metrics.start()
+     inputs = await conversation.aprep_inputs({conversation.input_key: user_input})
+     pieces = []
+     async for chunk in conversation.llm.astream(_conversation_prompt(conversation, inputs)):
+          text = chunk_text(chunk)
+          metrics.token(text)
+          pieces.append(text)
+          yield text
+     metrics.finish()
+     # The sync save in a thread: some memories (e.g. ConversationSummaryMemory) only summarize in save_context
+     await asyncio.to_thread(conversation.prep_outputs, inputs, {conversation.output_key: "".join(pieces)})
@@ -0,0 +1,222 @@
+import math
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Function to build the deterministic id of a chunk, so a re-run upserts the same ids instead of new ones
+def chunk_id(source, text):
+     """
+     Hashes the source URL and the text of a chunk.
+
+     Args:
+     source (str): The source URL of the chunk.
+     text (str): The text of the chunk.
+
+     Returns:
+     str: Hex sha256 id of the chunk.
+     """
+     digest = hashlib.sha256()
+     digest.update((source or "").encode("utf-8"))
+     digest.update(b"\0")
+     digest.update(text.encode("utf-8"))
+     return digest.hexdigest()
+
+
+class InMemoryVectorBackend:
+     """
+     In-process stand-in for a Pinecone index with the same small interface
+     (upsert / fetch_ids / delete / query), for testing without network.
+     A latency per request and a share of failing requests can be simulated.
+     """
+
+     def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+          self.latency = latency
+          self.failure_rate = failure_rate
+          self.vectors = {}  # id -> (values, metadata)
+          self.requests = 0
+          self._rng = random.Random(seed)
+          self._lock = threading.Lock()
+
+     # Simulate the round trip (and transient failures) of a remote index
+     def _request(self):
+          with self._lock:
+               self.requests += 1
+               fail = self._rng.random() < self.failure_rate
+          time.sleep(self.latency)
+          if fail:
+               raise ConnectionError("Simulated transient vector store failure")
+
+     def upsert(self, vectors):
+          self._request()
+          with self._lock:
+               for id_, values, metadata in vectors:
+                    self.vectors[id_] = (list(values), dict(metadata))
+
+     def fetch_ids(self, ids):
+          self._request()
+          with self._lock:
+               return {id_ for id_ in ids if id_ in self.vectors}
+
+     def delete(self, ids):
+          self._request()
+          with self._lock:
+               for id_ in ids:
+                    self.vectors.pop(id_, None)
+
+     def query(self, vector, top_k=4):
+          self._request()
+          with self._lock:
+               items = list(self.vectors.items())
+          # Cosine similarity, like a Pinecone index created with the cosine metric
+          norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+          scored = []
+          for id_, (values, metadata) in items:
+               values_norm = math.sqrt(sum(x * x for x in values)) or 1.0
+               score = sum(a * b for a, b in zip(vector, values)) / (norm * values_norm)
+               scored.append((id_, score, metadata))
+          scored.sort(key=lambda item: item[1], reverse=True)
+          return scored[:top_k]
+
+
+class PineconeVectorBackend:
+     """
+     Adapter exposing a Pinecone index through the InMemoryVectorBackend interface.
+     """
+
+     def __init__(self, index):
+          """
+          Args:
+          index (pinecone.Index): The Pinecone index, e.g. PineconeClient(api_key=...).Index(name).
+          """
+          self.index = index
+
+     def upsert(self, vectors):
+          # Pinecone rejects null metadata values
+          self.index.upsert(vectors=[
+               (id_, list(values), {k: v for k, v in metadata.items() if v is not None})
+               for id_, values, metadata in vectors
+          ])
+
+     def fetch_ids(self, ids):
+          return set(self.index.fetch(ids=list(ids)).vectors.keys())
+
+     def delete(self, ids):
+          self.index.delete(ids=list(ids))
+
+     def query(self, vector, top_k=4):
+          response = self.index.query(vector=list(vector), top_k=top_k, include_metadata=True)
+          return [(match.id, match.score, match.metadata) for match in response.matches]
+
+
+class VectorUpserter:
+     """
+     Batched, idempotent upserts: chunks get deterministic ids, ids already in the
+     index are skipped, and the remaining vectors are sent in fixed-size batches
+     concurrently, each batch retried with exponential backoff.
+     Instances are callable as upsert(chunks, vectors), the upsert step of IngestPipeline.
+     """
+
+     def __init__(self, backend, batch_size=100, max_concurrency=4, max_retries=3, backoff=0.5, text_key="text"):
+          """
+          Args:
+          backend (InMemoryVectorBackend or PineconeVectorBackend): Where the vectors are stored.
+          batch_size (int): Number of vectors per upsert request (and ids per existence check).
+          max_concurrency (int): Number of requests in flight at the same time.
+          max_retries (int): Retries of a failed request.
+          backoff (float): Base delay in seconds of the exponential backoff.
+          text_key (str): Metadata key of the chunk text (LangChain's Pinecone store reads "text").
+          """
+          self.backend = backend
+          self.batch_size = batch_size
+          self.max_concurrency = max_concurrency
+          self.max_retries = max_retries
+          self.backoff = backoff
+          self.text_key = text_key
+          self.stats = {"upserted": 0, "skipped": 0, "deleted": 0, "requests": 0, "retries": 0}
+          self._known_ids = set()  # Ids known to be in the index, saves existence checks
+          self._lock = threading.Lock()
+          self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+     # Run a backend call, retrying transient failures with exponential backoff
+     def _with_retries(self, fn, *args):
+          for attempt in range(self.max_retries + 1):
+               try:
+                    with self._lock:
+                         self.stats["requests"] += 1
+                    return fn(*args)
+               except Exception:
+                    if attempt == self.max_retries:
+                         raise
+                    with self._lock:
+                         self.stats["retries"] += 1
+                    time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random() / 2))
+
+     # Split a list into fixed-size batches
+     def _batches(self, items):
+          return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+     def existing_ids(self, ids):
+          """
+          Returns the ids that are already stored, checking the backend in concurrent batches.
+
+          Args:
+          ids (List[str]): Chunk ids.
+
+          Returns:
+          Set[str]: The ids already stored.
+          """
+          with self._lock:
+               unknown = [id_ for id_ in ids if id_ not in self._known_ids]
+          found = set(ids) - set(unknown)
+          for batch_found in self._executor.map(lambda batch: self._with_retries(self.backend.fetch_ids, batch),
+                                                self._batches(unknown)):
+               found |= batch_found
+          with self._lock:  # Upserts and deletes of other threads update the same set
+               self._known_ids |= found
+          return found
+
+     def upsert(self, chunks, vectors):
+          """
+          Upserts embedded chunks, skipping the ones already stored.
+
+          Args:
+          chunks (List[Document]): The chunks, their "source" metadata is part of the id.
+          vectors (List[List[float]]): The embedding of every chunk.
+
+          Returns:
+          List[str]: The ids of all chunks (stored before or now).
+          """
+          ids = [chunk_id(chunk.metadata.get("source"), chunk.page_content) for chunk in chunks]
+
+          # Drop duplicates within the call and chunks already in the index
+          records = {}
+          for id_, chunk, vector in zip(ids, chunks, vectors):
+               records.setdefault(id_, (id_, vector, {self.text_key: chunk.page_content, **chunk.metadata}))
+          existing = self.existing_ids(list(records))
+          missing = [record for id_, record in records.items() if id_ not in existing]
+
+          # Send the missing vectors in fixed-size batches, max_concurrency requests at a time
+          list(self._executor.map(lambda batch: self._with_retries(self.backend.upsert, batch), self._batches(missing)))
+
+          with self._lock:
+               self.stats["upserted"] += len(missing)
+               self.stats["skipped"] += len(ids) - len(missing)
+               self._known_ids.update(record[0] for record in missing)
+          return ids
+
+     __call__ = upsert
+
+     def delete(self, ids):
+          """
+          Deletes vectors by id, in concurrent batches.
+
+          Args:
+          ids (List[str]): The ids to delete.
+          """
+          ids = list(ids)
+          list(self._executor.map(lambda batch: self._with_retries(self.backend.delete, batch), self._batches(ids)))
+          with self._lock:
+               self.stats["deleted"] += len(ids)
+               self._known_ids.difference_update(ids)
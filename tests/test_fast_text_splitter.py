@@ -0,0 +1,96 @@
+"""
+Parity tests: FastRecursiveTextSplitter must produce the same chunks as RecursiveCharacterTextSplitter.
+
+Run from the repository root:
+python -m pytest -q tests
+"""
+import random
+import logging
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from fast_text_splitter import FastRecursiveTextSplitter
+
+# RecursiveCharacterTextSplitter logs a warning for every oversized chunk of the random texts
+logging.getLogger("langchain_text_splitters.base").setLevel(logging.ERROR)
+
+# Pieces of the random texts: words, runs of every separator and a token longer than the small chunks
+ALPHABET = ["a", "bb", "word", " ", "  ", "\n", "\n\n", "\n\n\n", "\t", "y" * 40]
+
+# Configurations used in the repo: n6 data_splitter (1000/200) and the quiz notebook split_docs (1000/20)
+CONFIGS = [{"chunk_size": 1000, "chunk_overlap": 200}, {"chunk_size": 1000, "chunk_overlap": 20}]
+
+# Function to build random texts with their splitter arguments
+def random_cases(trials, seed, sizes=(3, 10, 25, 100, 1000)):
+     rng = random.Random(seed)
+     for _ in range(trials):
+          text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 300)))
+          chunk_size = rng.choice(sizes)
+          yield text, {"chunk_size": chunk_size, "chunk_overlap": rng.randint(0, chunk_size)}
+
+# Function to build page-like documents with paragraphs, lines and a few very long tokens
+def page_documents(count=5, words=3000, seed=1):
+     rng = random.Random(seed)
+     vocabulary = ["the", "model", "recruitment", "economy", "data", "is", "growing", "and", "India's", "AI", "pages"]
+     documents = []
+     for i in range(count):
+          parts = []
+          for _ in range(words):
+               roll = rng.random()
+               if roll < 0.01:
+                    parts.append("\n\n")
+               elif roll < 0.04:
+                    parts.append("\n")
+               elif roll < 0.0405:
+                    parts.append("x" * rng.randint(500, 2500) + " ")
+               else:
+                    parts.append(rng.choice(vocabulary) + " ")
+          documents.append(Document(page_content="".join(parts), metadata={"source": f"page-{i}"}))
+     return documents
+
+# Length in words: a stand-in for a tokenizer, so the non-len path runs without tiktoken
+def word_count(text):
+     return len(text.split())
+
+
+def test_random_texts_match():
+     for text, kwargs in random_cases(2000, seed=0):
+          expected = RecursiveCharacterTextSplitter(**kwargs).split_text(text)
+          assert FastRecursiveTextSplitter(**kwargs).split_text(text) == expected, (text, kwargs)
+
+
+@pytest.mark.parametrize("kwargs", CONFIGS)
+def test_documents_match(kwargs):
+     corpus = page_documents()
+     expected = RecursiveCharacterTextSplitter(**kwargs).split_documents(corpus)
+     assert FastRecursiveTextSplitter(**kwargs).split_documents(corpus) == expected
+
+
+@pytest.mark.parametrize("kwargs", CONFIGS)
+def test_start_index_is_the_chunk_offset(kwargs):
+     corpus = page_documents()
+     texts = {doc.metadata["source"]: doc.page_content for doc in corpus}
+     for chunk in FastRecursiveTextSplitter(add_start_index=True, **kwargs).split_documents(corpus):
+          start = chunk.metadata["start_index"]
+          assert texts[chunk.metadata["source"]][start:start + len(chunk.page_content)] == chunk.page_content
+
+
+def test_custom_length_function_matches():
+     for text, kwargs in random_cases(500, seed=2, sizes=(1, 2, 5, 20)):
+          expected = RecursiveCharacterTextSplitter(length_function=word_count, **kwargs).split_text(text)
+          assert FastRecursiveTextSplitter(length_function=word_count, **kwargs).split_text(text) == expected, (text, kwargs)
+
+
+def test_tiktoken_encoder_matches():
+     pytest.importorskip("tiktoken")
+     try:
+          expected_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=50, chunk_overlap=10)
+     except Exception as error:  # The encoding is downloaded on first use
+          pytest.skip(f"tiktoken encoding unavailable: {error}")
+     splitter = FastRecursiveTextSplitter.from_tiktoken_encoder(chunk_size=50, chunk_overlap=10)
+     for doc in page_documents(count=2, words=1500):
+          assert splitter.split_text(doc.page_content) == expected_splitter.split_text(doc.page_content)
+     for text, _ in random_cases(200, seed=3):
+          assert splitter.split_text(text) == expected_splitter.split_text(text), text